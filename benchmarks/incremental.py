@@ -0,0 +1,107 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Incremental benchmark: time to reparse a large document after small edits.
+
+A document of numbered records is parsed once, then edited at random
+places, changing, inserting and deleting records, and reparsed after each
+edit.  Exits with status 1 when the slowest edit takes longer than the
+budget or a reparse differs from a fresh parse of the edited text.
+
+    python benchmarks/incremental.py [--size MB] [--edits N] [--budget MS]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from booze import gin
+
+EDIT_BUDGET_MS = 100
+
+
+def grammar():
+    record = gin.Rule()
+    record %= gin.as_string[gin.lexeme[+gin.digit]] << ';'
+    document = gin.Rule()
+    document %= +record << gin.eoi
+    return document
+
+
+def document(size):
+    lines = []
+    length = 0
+    while length < size:
+        line = '{};\n'.format(len(lines))
+        lines.append(line)
+        length += len(line)
+    return ''.join(lines)
+
+
+def edit(text, rng):
+    """A random edit of text as (offset, removed, inserted)."""
+    start = text.rfind('\n', 0, rng.randrange(len(text))) + 1
+    end = text.index('\n', start) + 1
+    choice = rng.randrange(3)
+    if choice == 0:
+        return start, end - start - 2, str(rng.randrange(1000))
+    elif choice == 1:
+        return start, 0, '{};\n'.format(rng.randrange(1000))
+    return start, end - start, ''
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arguments.add_argument('--size', type=float, default=5, help='document size in megabytes')
+    arguments.add_argument('--edits', type=int, default=20)
+    arguments.add_argument('--budget', type=float, default=EDIT_BUDGET_MS,
+                           help='time budget for each edit in milliseconds')
+    arguments.add_argument('--seed', type=int, default=0)
+    options = arguments.parse_args()
+
+    rng = random.Random(options.seed)
+    document_grammar = grammar()
+    text = document(int(options.size * 1000000))
+    parser = gin.IncrementalParser(document_grammar, text, ' \n')
+    start = time.perf_counter()
+    if not parser.parse()[0]:
+        raise AssertionError('Parse failed')
+    print('parse {:.1f} MB: {:.0f} ms'.format(len(text) / 1000000, (time.perf_counter() - start) * 1000))
+
+    edit_times = []
+    for _ in range(options.edits):
+        offset, removed, inserted = edit(parser.text, rng)
+        start = time.perf_counter()
+        result = parser.edit(offset, removed, inserted)
+        edit_times.append((time.perf_counter() - start) * 1000)
+    print('edit and reparse: {:.1f} ms median, {:.1f} ms slowest (budget {:.0f} ms)'.format(
+        sorted(edit_times)[len(edit_times) // 2], max(edit_times), options.budget))
+
+    failed = False
+    if result != document_grammar.parse(parser.text, ' \n'):
+        print('reparse differs from a fresh parse')
+        failed = True
+    if max(edit_times) > options.budget:
+        print('edit time over budget')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
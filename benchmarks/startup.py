@@ -0,0 +1,97 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Startup benchmark: time to import booze.gin and to build the example grammars.
+
+Every measurement runs in a fresh interpreter and the fastest of several
+runs is reported.  Exits with status 1 when importing takes longer than the
+budget or pulls in a module that should only be imported on demand.
+
+    python benchmarks/startup.py [--budget MS] [--runs N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, 'src')
+EXAMPLES = os.path.join(ROOT, 'examples')
+
+IMPORT_BUDGET_MS = 50
+
+# Modules only some features need, imported when those features are used.
+DEFERRED_MODULES = ('inspect', 'hashlib', 'pickle', 'asyncio', 'concurrent.futures',
+                    'booze.gin.backtracking', 'booze.gin.cache', 'booze.gin.incremental', 'booze.gin.memo',
+                    'booze.gin.memory', 'booze.gin.optimize', 'booze.gin.parallel', 'booze.gin.tree')
+
+IMPORT_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import booze.gin, booze.whiskey
+elapsed = time.perf_counter() - start
+print(elapsed, ' '.join(m for m in {deferred!r} if m in sys.modules))
+'''
+
+BUILD_SCRIPT = '''
+import runpy, time
+import booze.gin, booze.whiskey
+start = time.perf_counter()
+runpy.run_path({path!r}, run_name='startup')
+print(time.perf_counter() - start)
+'''
+
+
+def run(script):
+    env = dict(os.environ, PYTHONPATH=SOURCE)
+    output = subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return output.split(' ', 1)
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arguments.add_argument('--budget', type=float, default=IMPORT_BUDGET_MS,
+                           help='import time budget in milliseconds')
+    arguments.add_argument('--runs', type=int, default=5)
+    options = arguments.parse_args()
+
+    import_times = []
+    imported = set()
+    for _ in range(options.runs):
+        elapsed, modules = run(IMPORT_SCRIPT.format(deferred=DEFERRED_MODULES))
+        import_times.append(float(elapsed) * 1000)
+        imported.update(modules.split())
+    import_time = min(import_times)
+    print('import booze.gin, booze.whiskey: {:.1f} ms (budget {:.0f} ms)'.format(import_time, options.budget))
+
+    for name in sorted(os.listdir(EXAMPLES)):
+        if name.endswith('.py'):
+            path = os.path.join(EXAMPLES, name)
+            build_time = min(float(run(BUILD_SCRIPT.format(path=path))[0]) for _ in range(options.runs)) * 1000
+            print('build {}: {:.1f} ms'.format(name, build_time))
+
+    failed = False
+    if imported:
+        print('imported on startup: {}'.format(', '.join(sorted(imported))))
+        failed = True
+    if import_time > options.budget:
+        print('import time over budget')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
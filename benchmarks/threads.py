@@ -0,0 +1,83 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Thread scaling benchmark: parse throughput of one frozen grammar shared by threads.
+
+The calculator example grammar is frozen and parses the same batch of
+expressions on 1, 2, 4 and more threads.  Throughput only grows with the
+thread count on free-threaded builds of CPython; with the GIL enabled the
+numbers show the cost of sharing the grammar instead.
+
+    python benchmarks/threads.py [--threads N] [--parses N]
+"""
+
+import argparse
+import concurrent.futures
+import os
+import runpy
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from booze import gin
+
+EXPRESSION = '2 * (3 + 4) * 5 + 6 / 3 - 1'
+
+
+def parse_batch(grammar, parses):
+    for _ in range(parses):
+        result = grammar.parse(EXPRESSION, ' ')
+        if not result[0]:
+            raise AssertionError('Parse failed')
+
+
+def measure(grammar, threads, parses):
+    """Parses per second with parses split between threads."""
+    per_thread = parses // threads
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        futures = [executor.submit(parse_batch, grammar, per_thread) for _ in range(threads)]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def main():
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arguments.add_argument('--threads', type=int, default=os.cpu_count() or 1,
+                           help='largest number of threads')
+    arguments.add_argument('--parses', type=int, default=1000)
+    options = arguments.parse_args()
+
+    calculator = runpy.run_path(os.path.join(ROOT, 'examples', 'calculator.py'), run_name='threads')
+    grammar = gin.freeze(calculator['calc'])
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('{} ({})'.format(sys.version.split()[0], 'GIL enabled' if gil else 'free-threaded'))
+    counts = [1]
+    while counts[-1] * 2 <= options.threads:
+        counts.append(counts[-1] * 2)
+    base = None
+    for threads in counts:
+        rate = measure(grammar, threads, options.parses)
+        base = base or rate
+        print('{:3d} threads: {:8.0f} parses/s ({:.2f}x)'.format(threads, rate, rate / base))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
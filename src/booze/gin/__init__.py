@@ -12,8 +12,44 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import importlib
+
 from booze.gin.aux import *
 from booze.gin.chars import *
 from booze.gin.local_vars import *
 from booze.gin.parser import *
 from booze.gin.rule import *
+
+# Names of the modules only some features need, imported on first use.
+_LAZY_NAMES = {
+    'backtracking': ('SIZES', 'MAX_STEPS', 'GROWTH_LIMIT', 'MAX_TOKENS', 'Finding', 'sketch', 'tokens',
+                     'brackets', 'families', 'steps', 'check_backtracking'),
+    'cache': ('CACHE_FORMAT', 'fingerprint', 'source_key', 'save_grammar', 'load_grammar', 'cached_grammar'),
+    'incremental': ('IncrementalParser',),
+    'memo': ('THRESHOLD', 'MIN_CALLS', 'BLOCK_SIZE', 'RUN_LENGTH', 'MemoEntry', 'RunEntry', 'Memo',
+             'RuleInvocations', 'AdaptiveMemo', 'select_rules', 'rule_names'),
+    'memory': ('RuleMemory', 'MemoryProfile', 'profile_memory'),
+    'optimize': ('INLINE_SIZE', 'walk', 'size', 'recursive_rules', 'Transform', 'Inline', 'inline', 'Factored',
+                 'LeftFactor', 'left_factor', 'Flatten', 'flatten', 'CollapseOmit', 'collapse_omit',
+                 'FuseLiterals', 'fuse_literals', 'LiteralSymbols', 'literal_symbols', 'DEFAULT_PASSES',
+                 'Pipeline', 'optimized'),
+    'parallel': ('split_ranges', 'parse_parallel'),
+    'tree': ('TreeBuilder', 'Tree', 'Node', 'node', 'build_tree'),
+}
+
+_LAZY = {name: module for module, names in _LAZY_NAMES.items() for name in names}
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        return importlib.import_module('{}.{}'.format(__name__, name))
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = globals()[name] = getattr(importlib.import_module('{}.{}'.format(__name__, module)), name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -21,6 +21,8 @@ class Attr(parser.Parser):
     def __init__(self, value, attr_type=None):
         if value in (None, parser.UNUSED):
             raise TypeError('May not assign {} to Attr()'.format(value))
+        if isinstance(value, (parser.deferred, parser.Pending)):
+            raise TypeError('Attr values may not be deferred')
         if attr_type is parser.AttrType.UNUSED:
             raise ValueError('Attr may not be UNUSED')
         self.__value = value
@@ -43,6 +45,10 @@ class Attr(parser.Parser):
     def value(self):
         return self.__value
 
+    @property
+    def uses_scope(self):
+        return False
+
     def _parse(self, state):
         state.commit(self.__value)
 
@@ -54,9 +60,15 @@ class eoi(parser.Parser):
     def attr_type(self):
         return parser.AttrType.UNUSED
 
+    @property
+    def uses_scope(self):
+        return False
+
     def _parse(self, state):
-        if state.read(1) == '':
+        if not state.read(1):
             state.commit()
+        else:
+            state.fail(self, state.input.tell() - 1)
 
 
 @util.singleton
@@ -66,6 +78,10 @@ class eps(parser.Parser):
     def attr_type(self):
         return parser.AttrType.UNUSED
 
+    @property
+    def uses_scope(self):
+        return False
+
     def _parse(self, state):
         state.succeed()
 
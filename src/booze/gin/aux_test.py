@@ -34,6 +34,10 @@ class AttrTestCase(unittest.TestCase):
         with self.assertRaises(TypeError):
             aux.Attr(parser.UNUSED)
 
+    def test_deferred(self):
+        with self.assertRaises(TypeError):
+            aux.Attr(parser.deferred(str))
+
     def test_unused_attr_type(self):
         with self.assertRaises(ValueError):
             aux.Attr(10, parser.AttrType.UNUSED)
@@ -69,6 +73,10 @@ class EoiTest(unittest.TestCase):
     def test_parse_fail(self):
         self.assertEqual((False, None), aux.eoi.parse('anything'))
 
+    def test_parse_bytes(self):
+        self.assertEqual((True, parser.UNUSED), aux.eoi.parse(b' ', b' '))
+        self.assertEqual((False, None), aux.eoi.parse(b'anything'))
+
     def test_attr_type(self):
         self.assertEqual(parser.AttrType.UNUSED, aux.eoi.attr_type)
 
@@ -0,0 +1,323 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import string
+
+from . import optimize
+from . import parser
+from . import rule
+
+SIZES = (1, 2, 4, 8, 16, 32)
+MAX_STEPS = 20000
+GROWTH_LIMIT = 1.5
+MAX_TOKENS = 12
+
+# Characters tried on character classes to find one they match.
+_SAMPLE_CHARS = string.ascii_letters + string.digits + string.punctuation + ' \t\n'
+
+# Appended to inputs to make them fail at the end.
+_FAIL_TAIL = '\x00'
+
+
+class Finding:
+    """Inputs on which a grammar takes superlinear time to parse.
+
+    text is the shortest generated input on which the growth was seen and
+    steps pairs the lengths of the inputs measured with their parser
+    invocations.  rules names the rules invoked superlinearly more often,
+    parser describes the Alt or Repeat most often parsed again at the same
+    position and nesting the rules, Alts and Repeats it was invoked through,
+    outermost first.
+    """
+
+    def __init__(self, text, steps, rules, parser, nesting):
+        self.text = text
+        self.steps = steps
+        self.rules = rules
+        self.parser = parser
+        self.nesting = nesting
+
+    def __str__(self):
+        lines = ['Superlinear parse of {!r}: {} steps for {} characters'.format(
+            self.text,
+            ', '.join(str(steps) for _, steps in self.steps),
+            ', '.join(str(length) for length, _ in self.steps))]
+        if self.rules:
+            lines.append('  rules: {}'.format(', '.join(self.rules)))
+        if self.parser:
+            lines.append('  reparsed: {}'.format(self.parser))
+            lines.extend('    in {}'.format(outer) for outer in reversed(self.nesting))
+        return '\n'.join(lines)
+
+
+def _rule_name(r):
+    return r.name if r.name is not None else '<Rule {:#x}>'.format(id(r))
+
+
+def sketch(parser_, depth=2):
+    """Short description of parser_, showing depth levels of the parsers it is made of."""
+    if isinstance(parser_, rule.Rule):
+        return _rule_name(parser_)
+    elif isinstance(parser_, _Counted):
+        return sketch(parser_.parser, depth)
+    elif isinstance(parser_, parser.String):
+        return repr(parser_.string)
+    elif isinstance(parser_, parser.Symbols):
+        return '{' + '|'.join(repr(symbol) for symbol in parser_.symbols) + '}'
+    elif isinstance(parser_, parser.FuncDirectiveParser) and parser_.func is parser.omit.func:
+        return sketch(parser_.parser, depth)
+    elif depth <= 0:
+        return '...'
+    elif isinstance(parser_, parser.Alt):
+        return '(' + ' | '.join(sketch(p, depth - 1) for p in parser_.parsers) + ')'
+    elif isinstance(parser_, parser.Seq):
+        return '(' + ' << '.join(sketch(p, depth - 1) for p in parser_.parsers) + ')'
+    elif isinstance(parser_, parser.Repeat.__parser_type__):
+        prefix = {(0, None): '*', (1, None): '+', (0, 1): '-'}.get((parser_.minimum, parser_.maximum))
+        if prefix is None:
+            prefix = 'Repeat({}, {})'.format(parser_.minimum, parser_.maximum)
+        return prefix + sketch(parser_.parser, depth - 1)
+    elif isinstance(parser_, parser.SemanticAction):
+        return sketch(parser_.parser, depth) + '[...]'
+    elif isinstance(parser_, parser.FuncDirectiveParser):
+        return '{}[{}]'.format(parser_.func.__name__, sketch(parser_.parser, depth - 1))
+    elif parser_.children:
+        return '{}({})'.format(type(parser_).__name__,
+                               ', '.join(sketch(p, depth - 1) for p in parser_.children))
+    return type(parser_).__name__
+
+
+def tokens(grammar, max_tokens=MAX_TOKENS):
+    """Strings the grammar matches as literals, and a character each class matches."""
+    found = []
+    for p in optimize.walk(grammar):
+        if isinstance(p, parser.String) and isinstance(p.string, str):
+            candidates = [p.string]
+        elif isinstance(p, parser.Symbols):
+            candidates = [symbol for symbol in p.symbols if isinstance(symbol, str)]
+        elif isinstance(p, parser.CharParser):
+            candidates = [c for c in _SAMPLE_CHARS if _matches(p, c)][:1]
+        else:
+            continue
+        for candidate in candidates:
+            if candidate and candidate not in found:
+                found.append(candidate)
+    return found[:max_tokens]
+
+
+def _matches(char_parser, c):
+    try:
+        return char_parser.parse(c)[0]
+    except Exception:
+        # Classes defined by actions may need a rule scope.
+        return False
+
+
+def brackets(grammar):
+    """Literals that open and close the same sequence, such as '(' and ')'."""
+    found = []
+    for p in optimize.walk(grammar):
+        if isinstance(p, parser.Seq) and len(p.parsers) > 2:
+            first, last = (_literal(p.parsers[0]), _literal(p.parsers[-1]))
+            if first and last and (first, last) not in found:
+                found.append((first, last))
+    return found
+
+
+def _literal(parser_):
+    if isinstance(parser_, parser.FuncDirectiveParser) and parser_.func is parser.omit.func:
+        parser_ = parser_.parser
+    if isinstance(parser_, parser.String) and isinstance(parser_.string, str):
+        return parser_.string
+    return None
+
+
+def families(grammar, max_tokens=MAX_TOKENS):
+    """Functions making inputs of a size, each repeating part of what the grammar matches."""
+    found = tokens(grammar, max_tokens)
+    pumps = []
+    for first in found:
+        pumps.append(lambda size, first=first: first * size)
+        for second in found:
+            if second != first:
+                pumps.append(lambda size, pair=first + second: pair * size)
+    for opening, closing in brackets(grammar):
+        for middle in found:
+            pumps.append(lambda size, o=opening, m=middle, c=closing: o * size + m + c * size)
+    for pump in pumps:
+        yield pump
+        yield lambda size, pump=pump: pump(size) + _FAIL_TAIL
+
+
+def steps(grammar, text, skipper=None, max_steps=MAX_STEPS):
+    """Parser invocations to parse text, more than max_steps if it gives up, None on errors."""
+    limits = parser.Limits(steps=max_steps)
+    for recognize in (True, False):
+        state = parser.ParserState(text, skipper, recognize=recognize, limits=limits)
+        try:
+            grammar.parse(state)
+        except parser.StepLimitExceeded:
+            return max_steps + 1
+        except Exception:
+            # Grammars that need attributes cannot be recognized, and
+            # actions may not accept every input.
+            continue
+        return state.steps
+    return None
+
+
+class _Counter:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = {}
+        self.repeats = {}
+        self.nesting = {}
+        self.stack = []
+        self.positions = {}
+
+    def enter(self, counted, position):
+        self.calls[counted] = self.calls.get(counted, 0) + 1
+        key = (counted, position)
+        count = self.positions[key] = self.positions.get(key, 0) + 1
+        if count > self.repeats.get(counted, 1):
+            self.repeats[counted] = count
+            self.nesting.setdefault(counted, tuple(self.stack))
+        self.stack.append(counted)
+
+    def exit(self):
+        self.stack.pop()
+
+
+class _Counted(parser.Unary):
+    """Counts the invocations of a rule body, Alt or Repeat for the detector."""
+
+    def __init__(self, parser_, original, counter):
+        super(_Counted, self).__init__(parser_)
+        self.__original = original
+        self.__counter = counter
+
+    @property
+    def original(self):
+        return self.__original
+
+    def _parse(self, state):
+        counter = self.__counter
+        counter.enter(self, state.input.tell())
+        try:
+            self.parser._parse(state)
+        finally:
+            counter.exit()
+
+
+class _Instrument(optimize.Transform):
+
+    def __init__(self, counter):
+        super(_Instrument, self).__init__()
+        self.__counter = counter
+
+    def rewrite_rule(self, original):
+        copy = self.copy_rule(original)
+        try:
+            body = copy.parser
+        except AttributeError:
+            return copy
+        copy.parser = _Counted(body, original, self.__counter)
+        return copy
+
+    def rewrite(self, parser_):
+        if isinstance(parser_, (parser.Alt, parser.Repeat.__parser_type__, parser.List)):
+            return _Counted(parser_, parser_, self.__counter)
+        return parser_
+
+
+def _count(instrumented, counter, text, skipper, max_steps):
+    counter.reset()
+    steps(instrumented, text, skipper, max_steps)
+    return counter.calls, counter.repeats, counter.nesting
+
+
+def check_backtracking(grammar, skipper=None, sizes=SIZES, max_steps=MAX_STEPS,
+                       growth_limit=GROWTH_LIMIT, max_tokens=MAX_TOKENS):
+    """Findings of inputs on which grammar takes superlinear time.
+
+    Inputs are generated from the literals and character classes of the
+    grammar, repeating them, pairs of them and the literals around nested
+    sequences at each of sizes.  Growth is flagged when the parser invocations
+    for each additional character of input grow more than growth_limit times
+    from one size to the next, or the invocations go over max_steps.  Findings
+    are returned with the shortest input first, one for each Alt or Repeat
+    found parsed again.
+    """
+    counter = _Counter()
+    instrumented = _Instrument(counter)(grammar)
+    findings = {}
+    for family in families(grammar, max_tokens):
+        measured = []
+        marginal = None
+        previous_text = None
+        for size in sizes:
+            text = family(size)
+            count = steps(grammar, text, skipper, max_steps)
+            if count is None:
+                break
+            if measured:
+                previous_length, previous_count = measured[-1]
+                if len(text) <= previous_length:
+                    break
+                cost = (count - previous_count) / (len(text) - previous_length)
+            measured.append((len(text), count))
+            if len(measured) < 2:
+                previous_text = text
+                continue
+            if count > max_steps or marginal is not None and cost > growth_limit * max(marginal, 1):
+                finding = _explain(instrumented, counter, previous_text, text, skipper, max_steps,
+                                   measured, growth_limit)
+                key = finding.parser
+                if key not in findings or len(text) < len(findings[key].text):
+                    findings[key] = finding
+                break
+            marginal = cost
+            previous_text = text
+    return sorted(findings.values(), key=lambda finding: (len(finding.text), finding.text))
+
+
+def _explain(instrumented, counter, previous_text, text, skipper, max_steps, measured, growth_limit):
+    before, _, _ = _count(instrumented, counter, previous_text, skipper, max_steps)
+    before = dict(before)
+    calls, repeats, nesting = _count(instrumented, counter, text, skipper, max_steps)
+    rules = []
+    # Rules invoked a fixed number of times per character grow with the input alone.
+    growth = growth_limit * len(text) / len(previous_text)
+    for counted, count in calls.items():
+        original = counted.original
+        if isinstance(original, rule.Rule) and count > growth * before.get(counted, 0):
+            rules.append(_rule_name(original))
+    parser_description = None
+    outer = ()
+    candidates = [(count, counted) for counted, count in repeats.items()
+                  if not isinstance(counted.original, rule.Rule)]
+    if candidates:
+        _, worst = max(candidates, key=lambda candidate: candidate[0])
+        parser_description = sketch(worst.original)
+        # Only the innermost cycle of recursive rules is shown.
+        path = []
+        for counted in reversed(nesting[worst]):
+            if counted is worst or counted in path:
+                break
+            path.append(counted)
+        outer = tuple(sketch(counted.original, 1) for counted in reversed(path))
+    return Finding(text, tuple(measured), tuple(sorted(rules)), parser_description, outer)
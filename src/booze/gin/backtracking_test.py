@@ -0,0 +1,104 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from booze.gin import backtracking
+from booze.gin import parser
+from booze.gin import rule
+
+
+class BacktrackingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.a = parser.Char('a')
+
+    def exponential(self):
+        self.value = rule.Rule(name='value')
+        self.sum = rule.Rule(name='sum')
+        self.value %= (parser.lit('(') << self.sum << parser.lit(')')) | self.a
+        self.sum %= (self.value << parser.lit('+') << self.sum) | self.value
+        return self.sum
+
+    def test_tokens(self):
+        grammar = (parser.String('if') << parser.Char('0123456789')) | parser.Symbols({'x': 1, 'y': 2})
+        self.assertEqual(['if', '0', 'x', 'y'], backtracking.tokens(grammar))
+        self.assertEqual(['if', '0'], backtracking.tokens(grammar, 2))
+
+    def test_brackets(self):
+        grammar = (parser.lit('[') << self.a << parser.lit(']')) | (parser.String('<') << self.a)
+        self.assertEqual([('[', ']')], backtracking.brackets(grammar))
+
+    def test_sketch(self):
+        r = rule.Rule(name='r')
+        r %= +(parser.String('x') | self.a) << parser.lit(';')
+        self.assertEqual('r', backtracking.sketch(r))
+        self.assertEqual("(+('x' | Char) << ';')", backtracking.sketch(r.parser, 4))
+        self.assertEqual("(+... << ';')", backtracking.sketch(r.parser))
+        self.assertEqual("(... << ';')", backtracking.sketch(r.parser, 1))
+
+    def test_steps(self):
+        grammar = +self.a
+        self.assertEqual(backtracking.steps(grammar, 'a'), backtracking.steps(grammar, 'aaaa'))
+        self.assertEqual(11, backtracking.steps(self.exponential(), '((((((', max_steps=10))
+
+    def test_linear(self):
+        item = rule.Rule(name='item')
+        item %= (self.a << parser.lit(',')) | parser.String('b')
+        self.assertEqual([], backtracking.check_backtracking(+item))
+
+    def test_quadratic(self):
+        grammar = +((+parser.Seq(self.a) << parser.lit('b')) | self.a)
+        findings = backtracking.check_backtracking(grammar)
+        self.assertEqual(1, len(findings))
+        finding = findings[0]
+        self.assertEqual('a' * 16, finding.text)
+        self.assertEqual((1, 2, 4, 8, 16), tuple(length for length, _ in finding.steps))
+        # Each position is scanned to the end once, never parsed again.
+        self.assertIsNone(finding.parser)
+        self.assertEqual((), finding.rules)
+
+    def test_linear_rule_beside_quadratic(self):
+        lead = rule.Rule(name='lead')
+        lead %= -parser.Char('x')
+        quad = rule.Rule(name='quad')
+        quad %= self.a
+        grammar = +(lead << ((+quad << parser.lit('b')) | quad))
+        findings = backtracking.check_backtracking(grammar)
+        self.assertEqual(1, len(findings))
+        self.assertEqual(('quad',), findings[0].rules)
+
+    def test_exponential(self):
+        findings = backtracking.check_backtracking(self.exponential())
+        self.assertTrue(findings)
+        finding = findings[0]
+        self.assertTrue(finding.text.startswith('(('))
+        self.assertEqual(('sum', 'value'), finding.rules)
+        self.assertEqual("(('(' << sum << ')') | Char)", finding.parser)
+        self.assertIn('sum', finding.nesting)
+        self.assertEqual(finding.steps[-1][1], backtracking.steps(self.exponential(), finding.text))
+
+    def test_str(self):
+        finding = backtracking.Finding('((', ((1, 5), (2, 40)), ('sum',), "('(' | Char)", ('sum', '(...)'))
+        self.assertEqual(
+            "Superlinear parse of '((': 5, 40 steps for 1, 2 characters\n"
+            "  rules: sum\n"
+            "  reparsed: ('(' | Char)\n"
+            "    in (...)\n"
+            "    in sum",
+            str(finding))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import enum
+import os
+import sys
+import types
+
+from . import parser
+
+CACHE_FORMAT = 1
+
+_CLOSE = object()
+
+_SCALAR_TYPES = (type(None), bool, int, float, complex, str, bytes, enum.Enum)
+
+
+def _token(value, ids):
+    """Bytes describing value without its parts, and the parts to describe after it."""
+    if isinstance(value, _SCALAR_TYPES):
+        return '{}:{!r}'.format(type(value).__name__, value).encode(), None
+    elif isinstance(value, (tuple, list)):
+        return type(value).__name__.encode(), value
+    elif isinstance(value, (set, frozenset)):
+        return b'set', sorted(value, key=repr)
+    elif isinstance(value, dict):
+        return b'dict', [part for item in value.items() for part in item]
+    elif isinstance(value, types.CodeType):
+        return value.co_code, [value.co_consts, value.co_names]
+    elif isinstance(value, (type, types.BuiltinFunctionType, types.MethodType)):
+        name = '{}.{}'.format(getattr(value, '__module__', None), value.__qualname__).encode()
+        self = getattr(value, '__self__', None)
+        return name, None if self is None or isinstance(self, types.ModuleType) else [self]
+
+    # Other values are described once each, so recursive rules and closures
+    # terminate.
+    key = id(value)
+    if key in ids:
+        return '@{}'.format(ids[key]).encode(), None
+    ids[key] = len(ids)
+    if isinstance(value, types.FunctionType):
+        name = '{}.{}'.format(value.__module__, value.__qualname__).encode()
+        return name, [value.__code__, value.__defaults__, value.__closure__ or ()]
+    elif isinstance(value, types.CellType):
+        try:
+            return b'cell', [value.cell_contents]
+        except ValueError:
+            # Not yet assigned.
+            return b'cell', None
+    cls = type(value)
+    name = '{}.{}'.format(cls.__module__, cls.__qualname__).encode()
+    try:
+        attributes = vars(value)
+    except TypeError:
+        return name + repr(value).encode(), None
+    # Calculated properties are derived from the other attributes, and
+    # freezing a grammar does not change what it parses.
+    return name, [part for attribute, part_value in sorted(attributes.items())
+                  if not attribute.startswith('_cached_') and attribute != '_Parser__frozen'
+                  for part in (attribute, part_value)]
+
+
+def fingerprint(grammar):
+    """Hex digest of the structure of grammar.
+
+    Grammars built the same way from the same definitions have the same
+    fingerprint.  Functions are described by name and code, so changing a
+    semantic action changes the fingerprint.
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    ids = {}
+    stack = [grammar]
+    while stack:
+        value = stack.pop()
+        if value is _CLOSE:
+            digest.update(b')')
+            continue
+        token, parts = _token(value, ids)
+        digest.update(token)
+        if parts is not None:
+            digest.update(b'(')
+            stack.append(_CLOSE)
+            stack.extend(reversed(parts))
+    return digest.hexdigest()
+
+
+def _package_paths():
+    package = os.path.dirname(os.path.dirname(parser.__file__))
+    return sorted(os.path.join(directory, name)
+                  for directory, _, names in os.walk(package)
+                  for name in names
+                  if name.endswith('.py') and not name.endswith('_test.py'))
+
+
+def source_key(*paths):
+    """Hex digest of the contents of source files and of every module of the booze package."""
+    import hashlib
+    digest = hashlib.sha256('{}:{}'.format(CACHE_FORMAT, sys.implementation.cache_tag).encode())
+    for path in list(paths) + _package_paths():
+        with open(path, 'rb') as source:
+            digest.update(hashlib.sha256(source.read()).digest())
+    return digest.hexdigest()
+
+
+def save_grammar(grammar, path, key):
+    """Write grammar to the cache file at path under key.
+
+    The file is replaced atomically, so concurrent processes never read a
+    partly written cache.  Grammars must be picklable: semantic actions must
+    be module level functions or whiskey actions rather than lambdas.
+    """
+    import pickle
+    directory = os.path.dirname(os.path.abspath(path))
+    temporary = os.path.join(directory, '.{}.{}.tmp'.format(os.path.basename(path), os.getpid()))
+    try:
+        with open(temporary, 'wb') as cache_file:
+            pickle.dump((CACHE_FORMAT, key, grammar), cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def load_grammar(path, key):
+    """Grammar cached at path under key, or None when missing, stale or unreadable."""
+    import pickle
+    try:
+        with open(path, 'rb') as cache_file:
+            cache_format, cached_key, grammar = pickle.load(cache_file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+        return None
+    if cache_format != CACHE_FORMAT or cached_key != key:
+        return None
+    return grammar
+
+
+def cached_grammar(build, path, sources=None):
+    """Grammar returned by build, loaded from the cache at path when up to date.
+
+    The cache is keyed by the contents of sources, by default the module
+    defining build, so it is rebuilt whenever the grammar definition changes.
+    build may return any picklable value, such as a tuple of rules or an
+    optimized grammar.
+    """
+    if sources is None:
+        sources = [sys.modules[build.__module__].__file__]
+    key = source_key(*sources)
+    grammar = load_grammar(path, key)
+    if grammar is None:
+        grammar = build()
+        save_grammar(grammar, path, key)
+    return grammar
@@ -0,0 +1,179 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+
+from booze import whiskey
+from booze.gin import cache
+from booze.gin import chars
+from booze.gin import parser
+from booze.gin import rule
+
+builds = 0
+
+
+def to_list(*items):
+    return list(items)
+
+
+def recursive_action():
+
+    def action(value):
+        return action(value)
+    return action
+
+
+def build_grammar():
+    global builds
+    builds += 1
+    value = rule.Rule()
+    number = parser.lexeme[+chars.digit][whiskey.func(int)(whiskey.p[0])]
+    keyword = parser.Symbols({'true': True, 'false': False})
+    items = '[' << -(value % ',') << ']'
+    value %= number | keyword | items[to_list]
+    return value
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def test_same_structure(self):
+        self.assertEqual(cache.fingerprint(build_grammar()), cache.fingerprint(build_grammar()))
+
+    def test_different_structure(self):
+        self.assertNotEqual(cache.fingerprint(parser.Char('a-z', ranges=True)),
+                            cache.fingerprint(parser.Char('a-y', ranges=True)))
+        self.assertNotEqual(cache.fingerprint(parser.String('a')), cache.fingerprint(parser.Char('a')))
+        self.assertNotEqual(cache.fingerprint(parser.Repeat(1)[parser.Char('a')]),
+                            cache.fingerprint(parser.Repeat(2)[parser.Char('a')]))
+
+    def test_actions(self):
+        self.assertNotEqual(cache.fingerprint(parser.Char('a')[lambda v: v + 'a']),
+                            cache.fingerprint(parser.Char('a')[lambda v: v + 'b']))
+
+    def test_recursive(self):
+        r = rule.Rule()
+        r %= parser.Char('a') << -r
+        self.assertEqual(64, len(cache.fingerprint(r)))
+
+    def test_recursive_closure(self):
+        self.assertEqual(cache.fingerprint(parser.Char('a')[recursive_action()]),
+                         cache.fingerprint(parser.Char('a')[recursive_action()]))
+
+    def test_closures(self):
+        def action(suffix):
+            return lambda value: value + suffix
+        self.assertNotEqual(cache.fingerprint(parser.Char('a')[action('a')]),
+                            cache.fingerprint(parser.Char('a')[action('b')]))
+
+    def test_calculated_properties_ignored(self):
+        p = parser.lexeme[+parser.Char('a-z', ranges=True)]
+        before = cache.fingerprint(p)
+        p.parse('abc')
+        self.assertEqual(before, cache.fingerprint(p))
+
+    def test_parsed_rules(self):
+        grammar = build_grammar()
+        before = cache.fingerprint(grammar)
+        self.assertEqual((True, [1, [2]]), grammar.parse('[1, [2]]', ' '))
+        self.assertEqual(before, cache.fingerprint(grammar))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'grammar.cache')
+            cache.save_grammar(grammar, path, 'key')
+            self.assertEqual(before, cache.fingerprint(cache.load_grammar(path, 'key')))
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        global builds
+        builds = 0
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'grammar.cache')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cached_grammar(self):
+        grammar = cache.cached_grammar(build_grammar, self.path)
+        self.assertEqual((True, [1, True, [2]]), grammar.parse('[1, true, [2]]', ' '))
+        loaded = cache.cached_grammar(build_grammar, self.path)
+        self.assertEqual(1, builds)
+        self.assertIsNot(grammar, loaded)
+        self.assertEqual((True, [1, True, [2]]), loaded.parse('[1, true, [2]]', ' '))
+        self.assertEqual(cache.fingerprint(grammar), cache.fingerprint(loaded))
+
+    def test_simplexml(self):
+        examples = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'examples')
+        sys.path.insert(0, examples)
+        try:
+            simplexml = importlib.import_module('simplexml')
+            cache.save_grammar(simplexml.document, self.path, 'key')
+            loaded = cache.load_grammar(self.path, 'key')
+        finally:
+            sys.path.remove(examples)
+        self.assertIsNot(simplexml.document, loaded)
+        self.assertEqual((True, ('doc', (('a',), ('b', (('c',),))))),
+                         loaded.parse('<doc><a/><b><c/></b></doc>', ' '))
+        self.assertEqual(cache.fingerprint(simplexml.document), cache.fingerprint(loaded))
+
+    def test_source_changed(self):
+        source = os.path.join(self.directory.name, 'grammar.py')
+        with open(source, 'w') as source_file:
+            source_file.write('a = 1\n')
+        cache.cached_grammar(build_grammar, self.path, [source])
+        cache.cached_grammar(build_grammar, self.path, [source])
+        self.assertEqual(1, builds)
+        with open(source, 'w') as source_file:
+            source_file.write('a = 2\n')
+        cache.cached_grammar(build_grammar, self.path, [source])
+        self.assertEqual(2, builds)
+
+    def test_source_key_modules(self):
+        paths = cache._package_paths()
+        package = os.path.dirname(os.path.dirname(cache.__file__))
+        self.assertIn(os.path.join(package, 'util.py'), paths)
+        self.assertIn(os.path.join(package, 'gin', 'parser.py'), paths)
+        self.assertFalse([path for path in paths if path.endswith('_test.py')])
+
+    def test_load_missing(self):
+        self.assertIsNone(cache.load_grammar(self.path, 'key'))
+
+    def test_load_stale(self):
+        cache.save_grammar(parser.Char('a'), self.path, 'old')
+        self.assertIsNone(cache.load_grammar(self.path, 'new'))
+        self.assertEqual((True, 'a'), cache.load_grammar(self.path, 'old').parse('a'))
+
+    def test_load_corrupt(self):
+        with open(self.path, 'wb') as cache_file:
+            cache_file.write(b'not a pickle')
+        self.assertIsNone(cache.load_grammar(self.path, 'key'))
+
+    def test_save_unpicklable(self):
+        with self.assertRaises(Exception):
+            cache.save_grammar(parser.Char('a')[lambda v: v], self.path, 'key')
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_directives(self):
+        p = (parser.raw[+parser.Char('a-z', ranges=True)] << parser.lit(';')
+             << parser.as_string[parser.Char('0-9', ranges=True)])
+        cache.save_grammar(p, self.path, 'key')
+        self.assertEqual((True, ('ab', '1')), cache.load_grammar(self.path, 'key').parse('ab;1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
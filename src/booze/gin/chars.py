@@ -17,33 +17,67 @@ import string
 from . import parser
 
 
-class PredicateChar(parser.Parser):
-    """Character parser that determines character inclusion using predicate."""
+class PredicateChar(parser.CharParser):
+    """Character parser that determines character inclusion using predicate.
 
-    def __init__(self, func):
-        self.__func = func
+    Bytes input is tested with bytes_func when provided, otherwise each byte is
+    passed to func as the latin-1 character of the same value.
+    """
 
-    @property
-    def attr_type(self):
-        return parser.AttrType.STRING
+    def __init__(self, func, bytes_func=None):
+        self.__func = func
+        self.__bytes_func = bytes_func
 
     @property
     def predicate(self):
         return self.__func
 
+    @property
+    def bytes_predicate(self):
+        return self.__bytes_func
+
     def _parse(self, state):
         c = state.read(1)
-        if self.__func(c):
+        if isinstance(c, bytes):
+            if self.__bytes_func is None:
+                matched = self.__func(c.decode('latin-1'))
+            else:
+                matched = self.__bytes_func(c)
+        else:
+            matched = self.__func(c)
+        if matched:
             state.commit(c)
+        else:
+            state.fail(self, state.input.tell() - len(c))
+
+    def _scan(self, text, start, stop):
+        end = start
+        if isinstance(text, str):
+            func = self.__func
+            while end < stop and func(text[end]):
+                end += 1
+        elif self.__bytes_func is None:
+            func = self.__func
+            while end < stop and func(chr(text[end])):
+                end += 1
+        else:
+            func = self.__bytes_func
+            while end < stop and func(text[end:end + 1].tobytes()):
+                end += 1
+        return end
+
+
+def _isprintable_bytes(c):
+    return b' ' <= c <= b'~'
 
 
-alnum = PredicateChar(str.isalnum)
-alpha = PredicateChar(str.isalpha)
+alnum = PredicateChar(str.isalnum, bytes.isalnum)
+alpha = PredicateChar(str.isalpha, bytes.isalpha)
 blank = parser.Char(' \t')
-digit = PredicateChar(str.isdigit)
-lower = PredicateChar(str.islower)
-printable = PredicateChar(str.isprintable)
+digit = PredicateChar(str.isdigit, bytes.isdigit)
+lower = PredicateChar(str.islower, bytes.islower)
+printable = PredicateChar(str.isprintable, _isprintable_bytes)
 print_ = printable
-space = PredicateChar(str.isspace)
-upper = PredicateChar(str.isupper)
+space = PredicateChar(str.isspace, bytes.isspace)
+upper = PredicateChar(str.isupper, bytes.isupper)
 xdigit = parser.Char(string.hexdigits)
@@ -41,6 +41,22 @@ class PredicateCharTestCase(unittest.TestCase):
     def test_predicate(self):
         self.assertEqual(self.predicate, self.parser.predicate)
 
+    def test_parse_bytes(self):
+        self.assertEqual((True, b'a'), self.parser.parse(b'a'))
+        self.assertEqual((False, None), self.parser.parse(b'b'))
+
+    def test_parse_run(self):
+        self.assertEqual((True, tuple('aca')), (+self.parser).parse('acab'))
+        self.assertEqual((True, (b'a', b'c')), (+self.parser).parse(b'acb'))
+        self.assertEqual((True, (b'1', b'2')), (+chars.digit).parse(b'12a'))
+
+    def test_bytes_predicate(self):
+        p = chars.PredicateChar(str.isupper, bytes.islower)
+        self.assertEqual(bytes.islower, p.bytes_predicate)
+        self.assertEqual((True, b'a'), p.parse(b'a'))
+        self.assertEqual((False, None), p.parse(b'A'))
+        self.assertIsNone(self.parser.bytes_predicate)
+
 
 class CharClassTestCase(unittest.TestCase):
 
@@ -48,10 +64,12 @@ class CharClassTestCase(unittest.TestCase):
         for c in good:
             s = c + c
             self.assertEqual((True, c), test_parser.parse(s))
+            self.assertEqual((True, c.encode()), test_parser.parse(s.encode()))
 
         for c in bad:
             s = c + c
             self.assertEqual((False, None), test_parser.parse(s))
+            self.assertEqual((False, None), test_parser.parse(s.encode()))
 
     def test_alnum(self):
         self.do_test(chars.alnum, 'aA0', '_->')
@@ -0,0 +1,58 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import memo
+from . import parser
+
+
+class IncrementalParser:
+    """Reparses a document after edits, reusing memoized rule results.
+
+    Rule results that examined only text before an edit are reused as they
+    are, results after it are shifted, and only rules overlapping the edit are
+    parsed again.  Repeats skip over runs of iterations the edit did not
+    touch, so the work after an edit grows with the size of the edit rather
+    than of the document.  Grammars benefit to the degree they are factored
+    in to rules.
+    """
+
+    def __init__(self, grammar, text, skipper=None):
+        self.__parser = grammar
+        self.__text = text
+        # Memo entries are keyed by skipper, so it is converted only once.
+        self.__skipper = parser.as_skipper(skipper)
+        self.__memo = memo.Memo(runs=True)
+
+    @property
+    def parser(self):
+        return self.__parser
+
+    @property
+    def text(self):
+        return self.__text
+
+    @property
+    def memo(self):
+        return self.__memo
+
+    def parse(self):
+        return self.__parser.parse(parser.ParserState(self.__text, self.__skipper, self.__memo))
+
+    def edit(self, offset, removed, inserted=''):
+        """Replace removed characters at offset with inserted text and reparse."""
+        if offset < 0 or removed < 0 or offset + removed > len(self.__text):
+            raise ValueError('Edit out of range')
+        self.__text = self.__text[:offset] + inserted + self.__text[offset + removed:]
+        self.__memo.edit(offset, removed, len(inserted))
+        return self.parse()
@@ -0,0 +1,77 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from booze.gin import aux
+from booze.gin import chars
+from booze.gin import incremental
+from booze.gin import parser
+from booze.gin import rule
+
+
+class IncrementalParserTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+        def count(value):
+            self.calls += 1
+            return int(value)
+
+        self.record = rule.Rule()
+        self.record %= parser.lexeme[+chars.digit][count] << ';'
+        self.document = rule.Rule()
+        self.document %= +self.record << aux.eoi
+        self.text = ''.join('{};\n'.format(i) for i in range(100))
+        self.parser = incremental.IncrementalParser(self.document, self.text, ' \n')
+
+    def test_parse(self):
+        self.assertEqual((True, tuple(range(100))), self.parser.parse())
+        self.assertEqual(100, self.calls)
+
+    def test_edit(self):
+        self.parser.parse()
+        self.calls = 0
+        offset = self.text.index('50;')
+        expected = tuple(range(50)) + (5,) + tuple(range(51, 100))
+        self.assertEqual((True, expected), self.parser.edit(offset, 2, '5'))
+        self.assertEqual(1, self.calls)
+        self.assertEqual(self.parser.text, self.text[:offset] + '5' + self.text[offset + 2:])
+        self.assertEqual((True, expected), self.document.parse(self.parser.text, ' \n'))
+
+    def test_insert_record(self):
+        self.parser.parse()
+        self.calls = 0
+        offset = self.text.index('10;')
+        result = self.parser.edit(offset, 0, '7;')
+        self.assertEqual((True, tuple(range(10)) + (7,) + tuple(range(10, 100))), result)
+        self.assertEqual(2, self.calls)
+
+    def test_edit_fails(self):
+        self.parser.parse()
+        self.assertEqual((False, None), self.parser.edit(0, 1, 'x'))
+        self.assertEqual((True, tuple(range(100))), self.parser.edit(0, 1, '0'))
+
+    def test_edit_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.parser.edit(len(self.text), 1)
+
+    def test_properties(self):
+        self.assertIs(self.document, self.parser.parser)
+        self.assertEqual(self.text, self.parser.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+class IncompleteInput(Exception):
+    """Raised when a parser reads past the end of input that is still arriving."""
+
+
+class ChunkedInput:
+    """Parser input that is fed in chunks.
+
+    Reading past the end of the buffered data raises IncompleteInput until the
+    input is closed, after which reads behave as they would at end of file.
+    Positions are absolute, even after the front of the buffer is discarded.
+    """
+
+    def __init__(self, data=''):
+        self.__buffer = data
+        self.__chunks = []
+        self.__offset = 0
+        self.__position = 0
+        self.__end = len(data)
+        self.__closed = False
+
+    @property
+    def closed(self):
+        return self.__closed
+
+    @property
+    def end(self):
+        """Position just past the data fed so far."""
+        return self.__end
+
+    def feed(self, data):
+        if self.__closed:
+            raise ValueError('Input is closed')
+        if data:
+            self.__chunks.append(data)
+            self.__end += len(data)
+
+    def close(self):
+        self.__closed = True
+
+    def discard(self, position):
+        """Release buffered data before position."""
+        if position > self.__offset:
+            self.__join()
+            self.__buffer = self.__buffer[position - self.__offset:]
+            self.__offset = position
+
+    def __join(self):
+        if self.__chunks:
+            parts = [self.__buffer] + self.__chunks if self.__buffer else self.__chunks
+            self.__buffer = parts[0][:0].join(parts)
+            del self.__chunks[:]
+
+    def read(self, size=-1):
+        self.__join()
+        start = self.__position - self.__offset
+        if size is None or size < 0:
+            if not self.__closed:
+                raise IncompleteInput()
+            result = self.__buffer[start:]
+        else:
+            if start + size > len(self.__buffer) and not self.__closed:
+                raise IncompleteInput()
+            result = self.__buffer[start:start + size]
+        self.__position += len(result)
+        return result
+
+    def tell(self):
+        return self.__position
+
+    def seek(self, position):
+        if position < self.__offset:
+            raise ValueError('Position {} has been discarded'.format(position))
+        self.__position = position
+        return position
+
+
+class BufferInput:
+    """Input over a bytes-like object, read as bytes without copying the buffer."""
+
+    def __init__(self, buffer):
+        self.__buffer = memoryview(buffer).cast('B')
+        self.__position = 0
+
+    @property
+    def buffer(self):
+        return self.__buffer
+
+    def read(self, size=-1):
+        start = self.__position
+        if size is None or size < 0:
+            self.__position = len(self.__buffer)
+        else:
+            self.__position = min(start + size, len(self.__buffer))
+        return self.__buffer[start:self.__position].tobytes()
+
+    def tell(self):
+        return self.__position
+
+    def seek(self, position):
+        self.__position = position
+        return position
+
+
+class TrackedInput:
+    """Input wrapper that records the furthest position examined by any read."""
+
+    def __init__(self, parser_input):
+        self.__input = parser_input
+        self.extent = 0
+
+    @property
+    def input(self):
+        return self.__input
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            result = self.__input.read()
+            self.extent = max(self.extent, self.__input.tell() + 1)
+        else:
+            start = self.__input.tell()
+            result = self.__input.read(size)
+            self.extent = max(self.extent, start + size)
+        return result
+
+    def tell(self):
+        return self.__input.tell()
+
+    def seek(self, position):
+        return self.__input.seek(position)
@@ -0,0 +1,100 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from booze.gin import inputs
+
+
+class ChunkedInputTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.input = inputs.ChunkedInput()
+
+    def test_read(self):
+        self.input.feed('ab')
+        self.input.feed('cd')
+        self.assertEqual('abc', self.input.read(3))
+        self.assertEqual(3, self.input.tell())
+
+    def test_end(self):
+        self.assertEqual(2, inputs.ChunkedInput('ab').end)
+        self.input.feed('ab')
+        self.input.feed('cd')
+        self.input.read(3)
+        self.input.discard(3)
+        self.assertEqual(4, self.input.end)
+
+    def test_read_past_end(self):
+        self.input.feed('ab')
+        with self.assertRaises(inputs.IncompleteInput):
+            self.input.read(3)
+        self.assertEqual(0, self.input.tell())
+        with self.assertRaises(inputs.IncompleteInput):
+            self.input.read()
+
+    def test_read_closed(self):
+        self.input.feed('ab')
+        self.input.close()
+        self.assertEqual('ab', self.input.read(3))
+        self.assertEqual('', self.input.read(1))
+        self.assertTrue(self.input.closed)
+
+    def test_feed_closed(self):
+        self.input.close()
+        with self.assertRaises(ValueError):
+            self.input.feed('a')
+
+    def test_seek(self):
+        self.input.feed('abcd')
+        self.input.read(3)
+        self.input.seek(1)
+        self.assertEqual('bc', self.input.read(2))
+
+    def test_discard(self):
+        self.input.feed('abcd')
+        self.input.discard(2)
+        self.input.seek(2)
+        self.assertEqual('cd', self.input.read(2))
+        self.assertEqual(4, self.input.tell())
+        with self.assertRaises(ValueError):
+            self.input.seek(1)
+
+    def test_bytes(self):
+        self.input.feed(b'ab')
+        self.input.feed(b'c')
+        self.assertEqual(b'abc', self.input.read(3))
+
+
+class BufferInputTestCase(unittest.TestCase):
+
+    def test_read(self):
+        buffer = bytearray(b'abcd')
+        buffer_input = inputs.BufferInput(buffer)
+        self.assertEqual(b'ab', buffer_input.read(2))
+        self.assertEqual(2, buffer_input.tell())
+        self.assertEqual(b'cd', buffer_input.read(3))
+        self.assertEqual(b'', buffer_input.read(1))
+        buffer_input.seek(1)
+        self.assertEqual(b'bcd', buffer_input.read())
+
+    def test_buffer(self):
+        buffer = bytearray(b'abcd')
+        buffer_input = inputs.BufferInput(memoryview(buffer))
+        buffer[0] = ord('x')
+        self.assertEqual(b'xbcd', buffer_input.buffer.tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -100,10 +100,12 @@ class Vars:
 
 class LocalScope:
 
+    __slots__ = ('__args', '__kwargs', '__vars')
+
     def __init__(self, *args, **kwargs):
         self.__args = args
         self.__kwargs = kwargs
-        self.__vars = Vars()
+        self.__vars = None
 
     @property
     def args(self):
@@ -115,4 +117,30 @@ class LocalScope:
 
     @property
     def vars(self):
+        if self.__vars is None:
+            self.__vars = Vars()
         return self.__vars
+
+    def invoke(self, value):
+        """Invoke value with the arguments and variables of this scope."""
+        return whiskey.invoke(value, *self.__args, vars=self.vars, **self.__kwargs)
+
+
+def uses_scope(value, arguments=True):
+    """Whether invoking value may read or write the arguments or variables of a scope.
+
+    Arguments are only those of the scope when arguments is True; semantic
+    actions are instead invoked with the values of their parser.  Actions
+    other than those of whiskey and this module are assumed to use the scope.
+    """
+    if not isinstance(value, whiskey.Action):
+        return False
+    elif isinstance(value, (GetVarAttr, SetVarAttr)):
+        return True
+    elif isinstance(value, (whiskey.Arg, whiskey.KwArg)):
+        return arguments
+    elif isinstance(value, whiskey.Call):
+        return (uses_scope(value.func, arguments)
+                or any(uses_scope(arg, arguments) for arg in value.args)
+                or any(uses_scope(arg, arguments) for arg in value.kwargs.values()))
+    return True
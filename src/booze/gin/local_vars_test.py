@@ -194,6 +194,37 @@ class LocalScopeTest(unittest.TestCase):
     def test_vars(self):
         scope = local_vars.LocalScope()
         self.assertIsInstance(scope.vars, local_vars.Vars)
+        self.assertIs(scope.vars, scope.vars)
+
+    def test_invoke(self):
+        scope = local_vars.LocalScope(1, b=2)
+        self.assertEqual(3, scope.invoke(local_vars.l.x[whiskey.p[0] + whiskey.p.b]))
+        self.assertEqual(3, scope.vars.x)
+        self.assertEqual('a', scope.invoke('a'))
+
+
+class UsesScopeTestCase(unittest.TestCase):
+
+    def test_values(self):
+        self.assertFalse(local_vars.uses_scope('a'))
+        self.assertFalse(local_vars.uses_scope(None))
+
+    def test_vars(self):
+        self.assertTrue(local_vars.uses_scope(local_vars.l.a))
+        self.assertTrue(local_vars.uses_scope(local_vars.l.a[1]))
+
+    def test_arguments(self):
+        self.assertTrue(local_vars.uses_scope(whiskey.p[0]))
+        self.assertTrue(local_vars.uses_scope(whiskey.p.a))
+        self.assertFalse(local_vars.uses_scope(whiskey.p[0], arguments=False))
+
+    def test_calls(self):
+        self.assertFalse(local_vars.uses_scope(whiskey.p[1](whiskey.p[0], 1), arguments=False))
+        self.assertTrue(local_vars.uses_scope(whiskey.p[0] + local_vars.l.a, arguments=False))
+        self.assertTrue(local_vars.uses_scope(action.Call(max, key=local_vars.l.key), arguments=False))
+
+    def test_other_actions(self):
+        self.assertTrue(local_vars.uses_scope(MyNameAction()))
 
 
 if __name__ == '__main__':
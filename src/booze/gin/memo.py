@@ -0,0 +1,476 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+
+from . import parser
+
+# Share of invocations of a rule that must repeat a position before
+# AdaptiveMemo memoizes it, and the invocations in each window it counts.
+THRESHOLD = 0.1
+MIN_CALLS = 16
+
+# Input positions in each block of a memo table, and the iterations, or
+# shorter runs, in each run that repeats record.
+BLOCK_SIZE = 4096
+RUN_LENGTH = 64
+
+
+class MemoEntry:
+
+    __slots__ = ('end', 'extent', 'successful', 'committed', 'value')
+
+    def __init__(self, end, extent, successful, committed, value):
+        self.end = end
+        self.extent = extent
+        self.successful = successful
+        self.committed = committed
+        self.value = value
+
+
+class RunEntry:
+    """Successful iterations of a repeat, recorded so they can be skipped together."""
+
+    __slots__ = ('end', 'extent', 'count', 'values')
+
+    def __init__(self, end, extent, count, values):
+        self.end = end
+        self.extent = extent
+        self.count = count
+        self.values = values
+
+
+class _Block:
+    """Entries by position for the input from one block start to the next.
+
+    Positions, ends and extents are stored less shift, so an edit shifts the
+    blocks after it rather than every entry.  reach is the furthest stored
+    extent of any entry but the long ones, which examined more than
+    BLOCK_SIZE characters and are listed by position and key instead.
+    """
+
+    __slots__ = ('shift', 'reach', 'long', 'entries')
+
+    def __init__(self, shift):
+        self.shift = shift
+        self.reach = 0
+        self.long = set()
+        self.entries = {}
+
+    def add(self, position, key, entry):
+        self.entries.setdefault(position, {})[key] = entry
+        if entry.extent - position > BLOCK_SIZE:
+            self.long.add((position, key))
+        else:
+            self.reach = max(self.reach, entry.extent)
+
+
+class Memo:
+    """Packrat memo table of rule results keyed by input position.
+
+    Only rules invoked without arguments are memoized.  Every entry records the
+    extent of input examined while it was parsed, so entries can be kept or
+    shifted when the input is edited.  Semantic actions of memoized rules are
+    assumed to have no side effects outside the rule.
+
+    When rules is given, only those rules are memoized and the rest are parsed
+    every time they are invoked.  Rules may also be given by name (see
+    rule_names), selecting them in any copy of the grammar, such as one
+    loaded from a cache.  With runs, repeats of parsers that do not
+    use the rule scope also record runs of their iterations, nested RUN_LENGTH
+    to a run, so a reparse after an edit skips over the unchanged ones rather
+    than taking each iteration from the table.
+    """
+
+    def __init__(self, rules=None, runs=False):
+        # Blocks in input order and their start positions.
+        self.__starts = []
+        self.__blocks = []
+        if rules is None:
+            self.__rules = None
+            self.__names = frozenset()
+        else:
+            rules = set(rules)
+            self.__names = frozenset(r for r in rules if isinstance(r, str))
+            self.__rules = rules - self.__names
+        self.__runs = runs
+        self.__run_levels = 0
+
+    @property
+    def rules(self):
+        """Rules and names of rules memoized, or None when every rule is."""
+        return None if self.__rules is None else frozenset(self.__rules) | self.__names
+
+    @property
+    def runs(self):
+        return self.__runs
+
+    def memoizes(self, rule):
+        rules = self.__rules
+        if rules is None or rule in rules:
+            return True
+        if rule.name is not None and rule.name in self.__names:
+            rules.add(rule)
+            return True
+        return False
+
+    def select(self, rule):
+        """Memoize rule from now on."""
+        if self.__rules is not None:
+            self.__rules.add(rule)
+
+    def __len__(self):
+        return sum(len(entries) for block in self.__blocks for entries in block.entries.values())
+
+    def clear(self):
+        self.__starts = []
+        self.__blocks = []
+
+    def __entries(self, position):
+        """Block holding position and its entries at position, if any."""
+        index = bisect.bisect_right(self.__starts, position) - 1
+        if index < 0:
+            return None, None
+        block = self.__blocks[index]
+        return block, block.entries.get(position - block.shift)
+
+    def __block(self, position):
+        """Block to add entries at position to, starting a new one past BLOCK_SIZE."""
+        index = bisect.bisect_right(self.__starts, position) - 1
+        if index >= 0 and position - self.__starts[index] < BLOCK_SIZE:
+            return self.__blocks[index]
+        return self.__split(index + 1, position)
+
+    def __split(self, index, position):
+        """Start a block at position before the block at index, taking later entries from the one before."""
+        block = _Block(0)
+        if index > 0:
+            previous = self.__blocks[index - 1]
+            block.shift = previous.shift
+            stored = position - previous.shift
+            for at in [at for at in previous.entries if at >= stored]:
+                for key, entry in previous.entries.pop(at).items():
+                    block.add(at, key, entry)
+            previous.long = {(at, key) for at, key in previous.long if at < stored}
+        self.__starts.insert(index, position)
+        self.__blocks.insert(index, block)
+        return block
+
+    def __add(self, position, key, entry_type, end, extent, *args):
+        block = self.__block(position)
+        shift = block.shift
+        block.add(position - shift, key, entry_type(end - shift, extent - shift, *args))
+
+    def parse(self, state, rule, parse_rule):
+        rules = self.__rules
+        if rules is not None and rule not in rules and not self.memoizes(rule):
+            parse_rule(state)
+            return
+        parser_input = state.input
+        position = parser_input.tell()
+        key = (rule, state.skipper, state.recognizing)
+        block, entries = self.__entries(position)
+        entry = entries.get(key) if entries else None
+        if entry is None:
+            outer_extent = parser_input.extent
+            parser_input.extent = position
+            parse_rule(state)
+            successful = state.successful
+            extent = parser_input.extent
+            self.__add(position, key, MemoEntry, parser_input.tell(), extent,
+                       successful, state.committed, state.value if successful else None)
+            parser_input.extent = max(outer_extent, extent)
+        else:
+            shift = block.shift
+            parser_input.extent = max(parser_input.extent, entry.extent + shift)
+            if entry.successful:
+                parser_input.seek(entry.end + shift)
+                if entry.committed:
+                    state.commit(entry.value)
+                else:
+                    state.succeed(entry.value)
+
+    def open_runs(self, state, repeat, collects):
+        """Runs recorder for a parse of repeat, collecting iteration values if collects."""
+        return _Runs(self, state, repeat, collects)
+
+    def _run(self, position, key):
+        """Longest run of key recorded at position, as (level, end, extent, entry), or None."""
+        block, entries = self.__entries(position)
+        if not entries:
+            return None
+        for level in range(self.__run_levels - 1, -1, -1):
+            entry = entries.get(key + (level,))
+            if entry is not None:
+                return level, entry.end + block.shift, entry.extent + block.shift, entry
+        return None
+
+    def _add_run(self, position, key, level, end, extent, count, values):
+        self.__add(position, key + (level,), RunEntry, end, extent, count, values)
+        self.__run_levels = max(self.__run_levels, level + 1)
+
+    def edit(self, offset, removed, inserted):
+        """Adjust entries for replacing removed characters at offset with inserted ones.
+
+        Entries that examined only input before the edit are kept, entries that
+        begin after it are shifted and the rest are dropped.  Only the blocks
+        holding entries that reach the edit are examined.
+        """
+        removed_end = offset + removed
+        delta = inserted - removed
+        starts = self.__starts
+        blocks = self.__blocks
+        index = bisect.bisect_right(starts, removed_end) - 1
+        if index >= 0 and starts[index] < removed_end:
+            stored = removed_end - blocks[index].shift
+            if any(position >= stored for position in blocks[index].entries):
+                self.__split(index + 1, removed_end)
+        after = bisect.bisect_left(starts, removed_end)
+        emptied = False
+        for index in range(after):
+            block = blocks[index]
+            limit = offset - block.shift
+            if block.reach > limit or starts[index] >= offset:
+                entries = block.entries
+                block.entries = {}
+                block.reach = 0
+                block.long = set()
+                for position, at in entries.items():
+                    if position < limit:
+                        for key, entry in at.items():
+                            if entry.extent <= limit:
+                                block.add(position, key, entry)
+                emptied = emptied or not block.entries
+            elif block.long:
+                # Only long entries can reach the edit.
+                for position, key in [(position, key) for position, key in block.long
+                                      if block.entries[position][key].extent > limit]:
+                    block.long.remove((position, key))
+                    at = block.entries[position]
+                    del at[key]
+                    if not at:
+                        del block.entries[position]
+        for index in range(after, len(starts)):
+            starts[index] += delta
+            blocks[index].shift += delta
+        if emptied:
+            self.__starts, self.__blocks = [], []
+            for start, block in zip(starts, blocks):
+                if block.entries:
+                    self.__starts.append(start)
+                    self.__blocks.append(block)
+
+
+class _Partial:
+    """Run being recorded: parts of the level below it, the iterations in them and their values."""
+
+    __slots__ = ('start', 'end', 'extent', 'parts', 'count', 'values')
+
+    def __init__(self, start, collects):
+        self.start = start
+        self.end = start
+        self.extent = start
+        self.parts = 0
+        self.count = 0
+        self.values = [] if collects else None
+
+
+class _Runs:
+    """Records the iterations of a parse of a repeat in runs, and skips runs recorded before.
+
+    Runs of level 0 are made of iterations and runs of each level above of
+    runs of the level below.  A run ends after RUN_LENGTH parts, or where a
+    recorded run of the same or a higher level is skipped, so runs recorded
+    after an edit line up again with those recorded before it.
+    """
+
+    def __init__(self, memo, state, repeat, collects):
+        self.__memo = memo
+        self.__input = state.input
+        self.__key = (repeat, state.skipper, state.recognizing)
+        self.__collects = collects
+        self.__partials = []
+        self.__start = None
+        # Furthest input examined by the repeat outside the current iteration.
+        self.__extent = self.__input.extent
+
+    def skip(self):
+        """Skip the longest run recorded at the current position, returning its count and values."""
+        parser_input = self.__input
+        start = parser_input.tell()
+        found = self.__memo._run(start, self.__key)
+        if found is None:
+            return None
+        level, end, extent, entry = found
+        for lower in range(level + 1):
+            self.__flush(lower, True)
+        self.__append(level + 1, start, end, extent, entry.count, entry.values)
+        self.__extent = max(self.__extent, extent)
+        parser_input.seek(end)
+        return entry.count, entry.values
+
+    def begin(self):
+        """Start an iteration at the current position."""
+        parser_input = self.__input
+        self.__start = parser_input.tell()
+        self.__extent = max(self.__extent, parser_input.extent)
+        parser_input.extent = self.__start
+
+    def add(self, value):
+        """Record the iteration begun last, which succeeded with value."""
+        parser_input = self.__input
+        self.__append(0, self.__start, parser_input.tell(), parser_input.extent, 1, (value,))
+
+    def close(self):
+        """Record the runs begun, and restore the extent of the input to include the whole repeat."""
+        partials = self.__partials
+        top = max((level for level, partial in enumerate(partials) if partial is not None), default=-1)
+        for level in range(top + 1):
+            self.__flush(level, level < top)
+        self.__input.extent = max(self.__extent, self.__input.extent)
+
+    def __append(self, level, start, end, extent, count, values):
+        partials = self.__partials
+        while len(partials) <= level:
+            partials.append(None)
+        partial = partials[level]
+        if partial is None:
+            partial = partials[level] = _Partial(start, self.__collects)
+        partial.end = end
+        partial.extent = max(partial.extent, extent)
+        partial.parts += 1
+        partial.count += count
+        if partial.values is not None:
+            partial.values.extend(values)
+        if partial.parts == RUN_LENGTH:
+            self.__flush(level, True)
+
+    def __flush(self, level, carry):
+        partials = self.__partials
+        partial = partials[level] if level < len(partials) else None
+        if partial is None:
+            return
+        partials[level] = None
+        values = None if partial.values is None else tuple(partial.values)
+        if partial.parts > 1:
+            # A run of one part would only repeat that part.
+            self.__memo._add_run(partial.start, self.__key, level, partial.end, partial.extent,
+                                 partial.count, values)
+        if carry:
+            self.__append(level + 1, partial.start, partial.end, partial.extent, partial.count, values)
+
+
+class RuleInvocations:
+
+    __slots__ = ('calls', 'repeats', 'window_calls', 'window_repeats', 'positions')
+
+    def __init__(self):
+        self.calls = 0
+        self.repeats = 0
+        # Counts and positions of the invocations in the current window.
+        self.window_calls = 0
+        self.window_repeats = 0
+        self.positions = set()
+
+    def __repr__(self):
+        return 'RuleInvocations(calls={}, repeats={})'.format(self.calls, self.repeats)
+
+
+class AdaptiveMemo(Memo):
+    """Memo that selects the rules to memoize from how they are invoked.
+
+    Rules start out unmemoized and their invocations are counted by position
+    in windows of min_calls invocations.  When at least threshold of the
+    invocations in a window were at a position where the rule had been
+    invoked earlier in the window, it is memoized from then on.  Otherwise
+    the positions are forgotten and a new window starts, so counting never
+    keeps more than min_calls positions for a rule.  Rules in pinned are
+    memoized from the start.  The rules selected by a warm-up parse can be
+    passed to Memo to memoize the same rules without counting.
+    """
+
+    def __init__(self, threshold=THRESHOLD, min_calls=MIN_CALLS, pinned=()):
+        super(AdaptiveMemo, self).__init__(pinned)
+        self.__threshold = threshold
+        self.__min_calls = min_calls
+        self.__invocations = {}
+
+    @property
+    def threshold(self):
+        return self.__threshold
+
+    @property
+    def min_calls(self):
+        return self.__min_calls
+
+    @property
+    def invocations(self):
+        """RuleInvocations of each rule, counted until it was selected."""
+        return dict(self.__invocations)
+
+    def parse(self, state, rule, parse_rule):
+        if not self.memoizes(rule):
+            invocations = self.__invocations.get(rule)
+            if invocations is None:
+                invocations = self.__invocations[rule] = RuleInvocations()
+            invocations.calls += 1
+            invocations.window_calls += 1
+            key = (state.input.tell(), state.skipper, state.recognizing)
+            if key in invocations.positions:
+                invocations.repeats += 1
+                invocations.window_repeats += 1
+            else:
+                invocations.positions.add(key)
+            if invocations.window_calls < self.__min_calls:
+                parse_rule(state)
+                return
+            selected = invocations.window_repeats >= self.__threshold * invocations.window_calls
+            invocations.window_calls = invocations.window_repeats = 0
+            invocations.positions = set()
+            if not selected:
+                parse_rule(state)
+                return
+            self.select(rule)
+        super(AdaptiveMemo, self).parse(state, rule, parse_rule)
+
+    def edit(self, offset, removed, inserted):
+        super(AdaptiveMemo, self).edit(offset, removed, inserted)
+        self.__forget_positions()
+
+    def clear(self):
+        super(AdaptiveMemo, self).clear()
+        self.__forget_positions()
+
+    def __forget_positions(self):
+        for invocations in self.__invocations.values():
+            invocations.window_calls = invocations.window_repeats = 0
+            invocations.positions.clear()
+
+
+def select_rules(grammar, parser_input, skipper=None, threshold=THRESHOLD, min_calls=MIN_CALLS):
+    """Rules an AdaptiveMemo selects for memoizing in a warm-up parse of parser_input."""
+    adaptive = AdaptiveMemo(threshold, min_calls)
+    grammar.parse(parser.ParserState(parser_input, skipper, adaptive))
+    return adaptive.rules
+
+
+def rule_names(rules):
+    """Names of rules, to select the same rules in another copy of the grammar."""
+    names = set()
+    for r in rules:
+        name = r if isinstance(r, str) else r.name
+        if name is None:
+            raise ValueError('Rule has no name: {!r}'.format(r))
+        names.add(name)
+    return frozenset(names)
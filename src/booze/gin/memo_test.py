@@ -0,0 +1,272 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+import unittest
+
+from booze import whiskey
+from booze.gin import memo
+from booze.gin import parser
+from booze.gin import rule
+
+
+class MemoTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+        def count(value):
+            self.calls += 1
+            return value
+
+        self.word = rule.Rule()
+        self.word %= parser.as_string[+parser.Char('abc')][count]
+        self.memo = memo.Memo()
+        self.skipper = parser.Char(' ')
+
+    def parse(self, p, text, m=None):
+        return p.parse(parser.ParserState(text, self.skipper, self.memo if m is None else m))
+
+    def test_reuse(self):
+        p = (self.word << '!') | (self.word << '?')
+        self.assertEqual((True, 'abc'), self.parse(p, 'abc?'))
+        self.assertEqual(1, self.calls)
+        self.assertEqual(1, len(self.memo))
+
+    def test_failure(self):
+        p = (self.word << '!') | self.word | parser.String('x')
+        self.assertEqual((True, 'x'), self.parse(p, 'x'))
+        self.assertEqual(0, self.calls)
+        self.assertEqual(1, len(self.memo))
+
+    def test_uncommitted_success(self):
+        r = rule.Rule()
+        r %= parser.predicate[parser.Char('a')]
+        p = (r << 'b') | (r << parser.String('a'))
+        self.assertEqual((True, 'a'), self.parse(p, 'a'))
+
+    def test_rule_with_args_not_memoized(self):
+        r = rule.Rule()
+        r %= parser.String(whiskey.p[0])
+        self.assertEqual((True, ('a', 'b')), self.parse(r('a') << r('b'), 'ab'))
+        self.assertEqual(0, len(self.memo))
+
+    def test_edit(self):
+        p = +(self.word << ';')
+        self.assertEqual((True, ('ab', 'cc', 'ba')), self.parse(p, 'ab; cc; ba;'))
+        self.memo.edit(4, 2, 3)
+        self.assertEqual(3, len(self.memo))
+        self.calls = 0
+        self.assertEqual((True, ('ab', 'abc', 'ba')), self.parse(p, 'ab; abc; ba;'))
+        self.assertEqual(1, self.calls)
+
+    def test_edit_at_end(self):
+        p = +self.word
+        self.assertEqual((True, ('ab',)), self.parse(p, 'ab'))
+        self.memo.edit(2, 0, 1)
+        self.assertEqual((True, ('abc',)), self.parse(p, 'abc'))
+
+    def test_edit_after_run(self):
+        p = +self.word
+        self.assertEqual((True, ('ab',)), self.parse(p, 'abd'))
+        self.memo.edit(2, 1, 1)
+        self.assertEqual((True, ('abc',)), self.parse(p, 'abc'))
+
+    def test_edit_blocks(self):
+        p = +(self.word << ';')
+        words = ['ab', 'ba', 'cc'] * (memo.BLOCK_SIZE // 2)
+        text = ';'.join(words) + ';'
+        self.assertEqual((True, tuple(words)), self.parse(p, text))
+        offset = text.index(';', len(text) // 2) + 1
+        self.memo.edit(offset, 0, 2)
+        text = text[:offset] + 'c;' + text[offset:]
+        words.insert(text.count(';', 0, offset), 'c')
+        self.calls = 0
+        self.assertEqual((True, tuple(words)), self.parse(p, text))
+        self.assertEqual(1, self.calls)
+        self.memo.edit(0, offset, 0)
+        self.assertEqual((True, tuple(words[text.count(';', 0, offset):])), self.parse(p, text[offset:]))
+        self.assertEqual(1, self.calls)
+
+    def test_runs(self):
+        lookups = []
+
+        class CountingMemo(memo.Memo):
+
+            def parse(self, state, rule, parse_rule):
+                lookups.append(rule)
+                super(CountingMemo, self).parse(state, rule, parse_rule)
+
+        m = CountingMemo(runs=True)
+        self.assertTrue(m.runs)
+        self.assertFalse(self.memo.runs)
+        p = +(self.word << ';')
+        words = ['ab', 'ba', 'cc'] * 2000
+        text = ';'.join(words) + ';'
+        self.assertEqual((True, tuple(words)), self.parse(p, text, m))
+        self.assertEqual(len(words) + 1, len(lookups))
+        offset = text.index(';', len(text) // 2) + 1
+        m.edit(offset, 2, 1)
+        text = text[:offset] + 'a' + text[offset + 2:]
+        words[text.count(';', 0, offset)] = 'a'
+        del lookups[:]
+        self.calls = 0
+        self.assertEqual((True, tuple(words)), self.parse(p, text, m))
+        self.assertEqual(1, self.calls)
+        # Only the iterations near the edit are taken from the table one by one.
+        self.assertLess(len(lookups), 2 * memo.RUN_LENGTH)
+
+    def test_clear(self):
+        self.parse(self.word, 'a')
+        self.memo.clear()
+        self.assertEqual(0, len(self.memo))
+
+
+class SelectedRulesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.word = rule.Rule()
+        self.word %= parser.as_string[+parser.Char('abc')]
+        self.number = rule.Rule()
+        self.number %= parser.as_string[+parser.Char('0123456789')]
+        self.item = (self.word << '!') | (self.word << '?') | self.number
+        self.skipper = parser.Char(' ')
+
+    def parse(self, p, text, m):
+        return p.parse(parser.ParserState(text, self.skipper, m))
+
+    def test_rules(self):
+        m = memo.Memo([self.word])
+        self.assertEqual(frozenset([self.word]), m.rules)
+        self.assertTrue(m.memoizes(self.word))
+        self.assertFalse(m.memoizes(self.number))
+        self.assertEqual((True, ('ab', 'c', '12')), self.parse(+self.item, 'ab? c! 12', m))
+        self.assertEqual(4, len(m))
+
+    def test_all_rules(self):
+        m = memo.Memo()
+        self.assertIsNone(m.rules)
+        self.assertTrue(m.memoizes(self.number))
+        m.select(self.number)
+        self.assertIsNone(m.rules)
+
+    def test_select(self):
+        m = memo.Memo(())
+        self.parse(self.item, 'ab?', m)
+        self.assertEqual(0, len(m))
+        m.select(self.word)
+        self.parse(self.item, 'ab?', m)
+        self.assertEqual(1, len(m))
+
+    def test_rule_names(self):
+        self.word.name = 'word'
+        items = +self.item
+        rules = memo.select_rules(items, ' '.join(['a?', '1'] * 10), self.skipper, min_calls=4)
+        names = memo.rule_names(rules)
+        self.assertEqual(frozenset(['word']), names)
+        # Rules of a loaded copy of the grammar are selected by name.
+        loaded = pickle.loads(pickle.dumps(items))
+        m = memo.Memo(pickle.loads(pickle.dumps(names)))
+        self.assertEqual((True, ('b', '2')), self.parse(loaded, 'b? 2', m))
+        self.assertEqual(3, len(m))
+        self.assertEqual(1, len([r for r in m.rules if isinstance(r, rule.Rule)]))
+        with self.assertRaises(ValueError):
+            memo.rule_names([self.number])
+
+
+class AdaptiveMemoTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+        def count(value):
+            self.calls += 1
+            return value
+
+        self.word = rule.Rule()
+        self.word %= parser.as_string[+parser.Char('abc')][count]
+        self.number = rule.Rule()
+        self.number %= parser.as_string[+parser.Char('0123456789')]
+        self.items = +((self.word << '!') | (self.word << '?') | self.number)
+        self.skipper = parser.Char(' ')
+
+    def parse(self, p, text, m):
+        return p.parse(parser.ParserState(text, self.skipper, m))
+
+    def test_selects_reinvoked_rules(self):
+        m = memo.AdaptiveMemo(min_calls=4)
+        text = ' '.join(['a?', '1'] * 10)
+        self.assertEqual((True, ('a', '1') * 10), self.parse(self.items, text, m))
+        self.assertEqual(frozenset([self.word]), m.rules)
+        invocations = m.invocations
+        self.assertEqual(4, invocations[self.word].calls)
+        self.assertEqual(2, invocations[self.word].repeats)
+        self.assertEqual(11, invocations[self.number].calls)
+        self.assertEqual(0, invocations[self.number].repeats)
+        # Once memoized, each word is parsed only once.
+        self.assertEqual(2 + 9, self.calls)
+        self.assertEqual(20, len(m))
+
+    def test_min_calls(self):
+        m = memo.AdaptiveMemo(min_calls=100)
+        self.parse(self.items, ' '.join(['a?'] * 10), m)
+        self.assertEqual(frozenset(), m.rules)
+        self.assertEqual(0, len(m))
+        self.assertEqual(20, self.calls)
+
+    def test_threshold(self):
+        m = memo.AdaptiveMemo(threshold=0.6, min_calls=4)
+        self.parse(self.items, ' '.join(['a?'] * 10), m)
+        self.assertEqual(frozenset(), m.rules)
+
+    def test_positions_bounded(self):
+        m = memo.AdaptiveMemo(min_calls=4)
+        text = '1,' * 99 + '1'
+        self.assertEqual((True, ('1',) * 100), self.parse(self.number % ',', text, m))
+        invocations = m.invocations[self.number]
+        self.assertEqual(100, invocations.calls)
+        # Positions are kept only for the invocations of the current window.
+        self.assertLess(len(invocations.positions), 4)
+        self.assertEqual(frozenset(), m.rules)
+
+    def test_selected_in_later_window(self):
+        m = memo.AdaptiveMemo(min_calls=4)
+        text = ' '.join(['1'] * 8 + ['a?'] * 4)
+        self.parse(+(self.number | (self.word << '!') | (self.word << '?')), text, m)
+        self.assertEqual(frozenset([self.word]), m.rules)
+
+    def test_pinned(self):
+        m = memo.AdaptiveMemo(min_calls=100, pinned=[self.word])
+        self.parse(self.items, ' '.join(['a?'] * 10), m)
+        self.assertEqual(frozenset([self.word]), m.rules)
+        self.assertEqual(10, self.calls)
+        self.assertNotIn(self.word, m.invocations)
+
+    def test_select_rules(self):
+        rules = memo.select_rules(self.items, ' '.join(['a?', '1'] * 10), self.skipper, min_calls=4)
+        self.assertEqual(frozenset([self.word]), rules)
+        m = memo.Memo(rules)
+        self.assertEqual((True, ('b', '2')), self.parse(self.items, 'b? 2', m))
+        self.assertEqual(3, len(m))
+
+    def test_edit(self):
+        m = memo.AdaptiveMemo(min_calls=2)
+        self.assertEqual((True, ('ab',)), self.parse(self.items, 'ab?', m))
+        m.edit(0, 2, 1)
+        self.assertEqual((True, ('c',)), self.parse(self.items, 'c?', m))
+        self.assertEqual(frozenset([self.word]), m.rules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import array
+import sys
+
+from . import optimize
+from . import parser
+
+# Slots of the measurements kept for an invocation.
+_SIZE, _BLOCKS, _PEAK, _CHILD_SIZE, _CHILD_BLOCKS, _END_SIZE, _END_PEAK, _END_BLOCKS = range(8)
+_FRAME = (0,) * 8
+
+
+class RuleMemory:
+    """Memory used by the invocations of one rule or directive.
+
+    Sizes are in bytes and blocks are counts of allocated memory blocks,
+    both for what is still allocated when an invocation returns, such as its
+    value and anything else it keeps alive.  Inclusive figures count
+    everything allocated during the invocation, and self figures leave out
+    what is attributed to the rules and directives it invoked.  Recursive
+    invocations are only included in the figures of the outermost one.
+    Peak is the most memory in use during an invocation above what was in use
+    when it started.
+    """
+
+    __slots__ = ('name', 'calls', 'size', 'self_size', 'blocks', 'self_blocks', 'peak')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.size = 0
+        self.self_size = 0
+        self.blocks = 0
+        self.self_blocks = 0
+        self.peak = 0
+
+    def __repr__(self):
+        return ('RuleMemory({!r}, calls={}, size={}, self_size={}, blocks={}, self_blocks={}, peak={})'
+                .format(self.name, self.calls, self.size, self.self_size,
+                        self.blocks, self.self_blocks, self.peak))
+
+
+def _label(parser_):
+    if isinstance(parser_, parser.FuncDirectiveParser):
+        return parser_.func.__name__
+    name = getattr(parser_, 'name', None)
+    if name is not None:
+        return name
+    return '<{} {:#x}>'.format(type(parser_).__name__, id(parser_))
+
+
+class MemoryProfile:
+    """Attributes memory allocated while parsing to the rules and directives responsible.
+
+    Set as the profiler of a ParserState while tracemalloc is tracing.  Rules
+    are reported by name (see Rule.name and name_rules), directives by the
+    name of their function.  Memory allocated by other parsers, such as the
+    tuples of Seq and lists of Repeat, is attributed to the innermost rule or
+    directive that invoked them.  The optimizer keeps named rules, but
+    rules it inlines are attributed to the rule they were inlined in to.
+    """
+
+    def __init__(self):
+        import tracemalloc
+        self.__tracemalloc = tracemalloc
+        self.__stats = {}
+        self.__active = {}
+        # Labels and measurements of the invocations in progress.
+        self.__stack = []
+        self.__start = None
+        # Most traced memory seen, as resetting the peak for each invocation
+        # forgets the peaks before it.
+        self.__top = 0
+        self.__peak = 0
+
+    @property
+    def stats(self):
+        """RuleMemory of each rule and directive by name."""
+        return dict(self.__stats)
+
+    @property
+    def peak(self):
+        """Most memory in use during the profiled parses above what was in use before."""
+        return self.__peak
+
+    def start(self):
+        self.__tracemalloc.reset_peak()
+        self.__start = self.__top = self.__tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        self.__top = max(self.__top, self.__tracemalloc.get_traced_memory()[1])
+        self.__peak = max(self.__peak, self.__top - self.__start)
+
+    def call(self, parser_, parse, *args, **kwargs):
+        """Call parse(*args, **kwargs), attributing what it allocates to parser_."""
+        tracemalloc = self.__tracemalloc
+        label = _label(parser_)
+        stack = self.__stack
+        frame = array.array('q', _FRAME)
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        self.__top = max(self.__top, traced_peak)
+        if stack:
+            parent = stack[-1][1]
+            parent[_PEAK] = max(parent[_PEAK], traced_peak)
+        stack.append((label, frame))
+        self.__active[label] = self.__active.get(label, 0) + 1
+        tracemalloc.reset_peak()
+        # Measurements go straight in to the frame, so the objects holding
+        # them are freed before the next one and never counted.
+        frame[_BLOCKS] = sys.getallocatedblocks()
+        frame[_SIZE] = tracemalloc.get_traced_memory()[0]
+        frame[_PEAK] = frame[_SIZE]
+        try:
+            parse(*args, **kwargs)
+        finally:
+            frame[_END_SIZE], frame[_END_PEAK] = tracemalloc.get_traced_memory()
+            frame[_END_BLOCKS] = sys.getallocatedblocks()
+            stack.pop()
+            self.__active[label] -= 1
+            size = frame[_END_SIZE] - frame[_SIZE]
+            blocks = frame[_END_BLOCKS] - frame[_BLOCKS]
+            peak = max(frame[_PEAK], frame[_END_PEAK])
+            self.__top = max(self.__top, peak)
+
+            stats = self.__stats.get(label)
+            if stats is None:
+                stats = self.__stats[label] = RuleMemory(label)
+            stats.calls += 1
+            stats.self_size += size - frame[_CHILD_SIZE]
+            stats.self_blocks += blocks - frame[_CHILD_BLOCKS]
+            stats.peak = max(stats.peak, peak - frame[_SIZE])
+            if not self.__active[label]:
+                stats.size += size
+                stats.blocks += blocks
+            if stack:
+                parent = stack[-1][1]
+                parent[_PEAK] = max(parent[_PEAK], peak)
+                parent[_CHILD_SIZE] += size
+                parent[_CHILD_BLOCKS] += blocks
+
+    def report(self, limit=None):
+        """Table of the rules and directives with the most memory of their own."""
+        stats = sorted(self.__stats.values(), key=lambda s: (s.self_size, s.size), reverse=True)
+        lines = ['peak {} bytes'.format(self.__peak),
+                 '{:>10} {:>12} {:>12} {:>10} {:>10} {:>12}  {}'.format(
+                     'calls', 'self bytes', 'bytes', 'self blks', 'blocks', 'peak', 'name')]
+        for s in stats[:limit]:
+            lines.append('{:>10} {:>12} {:>12} {:>10} {:>10} {:>12}  {}'.format(
+                s.calls, s.self_size, s.size, s.self_blocks, s.blocks, s.peak, s.name))
+        return '\n'.join(lines)
+
+
+def profile_memory(grammar, parser_input, skipper=None, memo=None):
+    """Parse with a MemoryProfile, returning the result and the profile.
+
+    Starts tracemalloc for the parse if it is not already tracing.  The
+    values grammar caches on first use, such as the signatures of actions,
+    are calculated before, so are not counted in the profile.
+    """
+    import tracemalloc
+    for parser_ in optimize.walk(grammar):
+        parser_._precompute()
+    state = parser_input if isinstance(parser_input, parser.ParserState) else parser.ParserState(
+        parser_input, skipper, memo)
+    profile = MemoryProfile()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    state.profiler = profile
+    try:
+        profile.start()
+        try:
+            result = grammar.parse(state)
+        finally:
+            profile.stop()
+    finally:
+        state.profiler = None
+        if not tracing:
+            tracemalloc.stop()
+    return result, profile
@@ -0,0 +1,118 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tracemalloc
+import unittest
+
+from booze.gin import memory
+from booze.gin import parser
+from booze.gin import rule
+
+
+class MemoryProfileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.item = rule.Rule(name='item')
+        self.item %= parser.as_string[+parser.Char('a-z', ranges=True)][lambda s: [s] * 1000]
+        self.items = rule.Rule(name='items')
+        self.items %= parser.Repeat()[self.item << ',']
+
+    def test_attribution(self):
+        result, profile = memory.profile_memory(self.items, 'abc, def, ghi,', ' ')
+        self.assertTrue(result[0])
+        stats = profile.stats
+        self.assertEqual({'items', 'item', 'as_string', 'omit'}, set(stats))
+        self.assertEqual(1, stats['items'].calls)
+        self.assertEqual(4, stats['item'].calls)
+        self.assertEqual(4, stats['as_string'].calls)
+        # Each item keeps a list of 1000 references alive.
+        self.assertGreater(stats['item'].self_size, 3 * 8000)
+        self.assertGreaterEqual(stats['items'].size, stats['item'].size)
+        self.assertLess(stats['items'].self_size, 2000)
+        self.assertGreater(profile.peak, 3 * 8000)
+
+    def test_repeated(self):
+        # The first profile of a grammar does not count the values it caches.
+        profiles = [memory.profile_memory(self.items, 'abc, def, ghi,', ' ')[1] for _ in range(3)]
+        sizes = [{name: (s.self_size, s.size) for name, s in profile.stats.items()} for profile in profiles]
+        self.assertEqual(sizes[1], sizes[0])
+        self.assertEqual(sizes[2], sizes[0])
+
+    def test_peak(self):
+        temporary = rule.Rule(name='temporary')
+        temporary %= parser.Char('a')[lambda c: len([c] * 100000)]
+        result, profile = memory.profile_memory(temporary, 'a')
+        self.assertEqual((True, 100000), result)
+        stats = profile.stats['temporary']
+        self.assertLess(stats.size, 1000)
+        self.assertGreater(stats.peak, 800000)
+        self.assertGreater(profile.peak, 800000)
+
+    def test_peak_before_later_rules(self):
+        first = rule.Rule(name='first')
+        first %= parser.Char('a')[lambda c: len([c] * 200000)]
+        second = rule.Rule(name='second')
+        second %= parser.Char('b')
+        top = rule.Rule(name='top')
+        top %= first << second
+        result, profile = memory.profile_memory(top, 'ab')
+        self.assertTrue(result[0])
+        self.assertGreater(profile.stats['first'].peak, 1600000)
+        for stats in profile.stats.values():
+            self.assertGreaterEqual(profile.peak, stats.peak)
+
+    def test_recursion(self):
+        nested = rule.Rule(parser.AttrType.OBJECT, name='nested')
+        nested %= ('(' << nested << ')')[lambda n: [n] * 1000] | parser.Char('x')
+        result, profile = memory.profile_memory(nested, '(((x)))')
+        self.assertTrue(result[0])
+        stats = profile.stats['nested']
+        self.assertEqual(4, stats.calls)
+        self.assertLess(stats.size, stats.self_size + 1000)
+
+    def test_unnamed(self):
+        r = rule.Rule()
+        r %= parser.Char('a')
+        _, profile = memory.profile_memory(r, 'a')
+        name, = profile.stats
+        self.assertTrue(name.startswith('<Rule 0x'))
+
+    def test_tracing(self):
+        self.assertFalse(tracemalloc.is_tracing())
+        memory.profile_memory(self.items, 'abc')
+        self.assertFalse(tracemalloc.is_tracing())
+        tracemalloc.start()
+        try:
+            memory.profile_memory(self.items, 'abc')
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_state(self):
+        state = parser.ParserState('abc')
+        result, profile = memory.profile_memory(self.items, state)
+        self.assertTrue(result[0])
+        self.assertIsNone(state.profiler)
+        self.assertEqual(1, profile.stats['items'].calls)
+
+    def test_report(self):
+        _, profile = memory.profile_memory(self.items, 'abc, def,', ' ')
+        lines = profile.report().splitlines()
+        self.assertTrue(lines[0].startswith('peak '))
+        self.assertEqual('item', lines[2].split()[-1])
+        self.assertEqual(3, len(profile.report(1).splitlines()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,597 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from . import cache
+from . import parser
+from . import rule
+from .. import util
+
+INLINE_SIZE = 16
+
+
+def walk(grammar):
+    """Every parser and rule reachable from grammar, each once."""
+    seen = set()
+    stack = [grammar]
+    while stack:
+        parser = stack.pop()
+        if id(parser) in seen:
+            continue
+        seen.add(id(parser))
+        yield parser
+        if isinstance(parser, rule.Rule):
+            try:
+                stack.append(parser.parser)
+            except AttributeError:
+                pass
+        else:
+            stack.extend(reversed(parser.children))
+
+
+def size(parser):
+    """Number of distinct parsers making up parser, not counting the bodies of rules it uses."""
+    seen = set()
+    stack = [parser]
+    while stack:
+        parser = stack.pop()
+        if id(parser) not in seen:
+            seen.add(id(parser))
+            if not isinstance(parser, rule.Rule):
+                stack.extend(parser.children)
+    return len(seen)
+
+
+def _rule_references(body):
+    """Rules used directly by body, through calls or not."""
+    seen = set()
+    stack = [body]
+    while stack:
+        parser = stack.pop()
+        if id(parser) in seen:
+            continue
+        seen.add(id(parser))
+        if isinstance(parser, rule.Rule):
+            yield parser
+        else:
+            stack.extend(parser.children)
+
+
+def recursive_rules(grammar):
+    """Rules reachable from grammar that are part of a cycle of rules."""
+    rules = [p for p in walk(grammar) if isinstance(p, rule.Rule)]
+    edges = {}
+    for r in rules:
+        try:
+            edges[r] = list(_rule_references(r.parser))
+        except AttributeError:
+            edges[r] = []
+
+    # Tarjan's strongly connected components, without recursion.
+    index = {}
+    low = {}
+    on_stack = set()
+    component_stack = []
+    recursive = set()
+    for root in rules:
+        if root in index:
+            continue
+        work = [(root, iter(edges[root]))]
+        index[root] = low[root] = len(index)
+        component_stack.append(root)
+        on_stack.add(root)
+        while work:
+            current, successors = work[-1]
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    component_stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(edges[successor])))
+                    break
+                elif successor in on_stack:
+                    low[current] = min(low[current], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[current])
+                if low[current] == index[current]:
+                    component = []
+                    while True:
+                        member = component_stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member is current:
+                            break
+                    if len(component) > 1 or current in edges[current]:
+                        recursive.update(component)
+    return recursive
+
+
+class Transform:
+    """Copies a grammar, rewriting each parser after its children are rewritten.
+
+    Rules are copied too, so the original grammar is never changed and
+    recursive rules stay recursive in the copy.  Parsers shared by several
+    others stay shared.  Subclasses override rewrite and rewrite_rule.
+    """
+
+    def __init__(self):
+        self.__done = {}
+
+    def __call__(self, grammar):
+        return self.visit(grammar)
+
+    def visit(self, parser):
+        key = id(parser)
+        try:
+            return self.__done[key][1]
+        except KeyError:
+            pass
+        if isinstance(parser, rule.Rule):
+            result = self.rewrite_rule(parser)
+        else:
+            children = parser.children
+            visited = tuple(self.visit(child) for child in children)
+            if any(new is not old for new, old in zip(visited, children)):
+                parser = parser.with_children(visited)
+            result = self.rewrite(parser)
+        # The original is kept so its id is not reused while transforming.
+        self.__done[key] = (parser, result)
+        return result
+
+    def copy_rule(self, original):
+        """New rule with the same expected attribute type and a transformed copy of its body."""
+        copy = rule.Rule(original.expected_attr_type, original.name)
+        self.__done[id(original)] = (original, copy)
+        try:
+            body = original.parser
+        except AttributeError:
+            return copy
+        copy.parser = self.visit(body)
+        return copy
+
+    def rewrite_rule(self, original):
+        return self.copy_rule(original)
+
+    def rewrite(self, parser):
+        return parser
+
+
+class Inline(Transform):
+    """Replaces uses of rules by their bodies where that saves a rule invocation.
+
+    Rules are inlined when they are not recursive, are never called with
+    arguments and do not use their own scope.  Rules used once are always
+    inlined, others only when their body has at most max_size parsers.
+    Named rules are kept, so they still appear in profiles and errors,
+    unless inline_named is true.
+    """
+
+    def __init__(self, grammar, max_size=INLINE_SIZE, inline_named=False):
+        super(Inline, self).__init__()
+        self.__max_size = max_size
+        self.__inline_named = inline_named
+        self.__recursive = recursive_rules(grammar)
+        self.__uses = {grammar: 1}
+        self.__called = set()
+        for parser in walk(grammar):
+            if isinstance(parser, rule.RuleCall):
+                self.__called.add(parser.parser)
+            elif not isinstance(parser, rule.Rule):
+                for child in parser.children:
+                    if isinstance(child, rule.Rule):
+                        self.__uses[child] = self.__uses.get(child, 0) + 1
+
+    def __inlinable(self, original):
+        if original in self.__recursive or original in self.__called:
+            return False
+        if original.name is not None and not self.__inline_named:
+            return False
+        try:
+            return not original.parser.uses_scope
+        except AttributeError:
+            return False
+
+    def rewrite_rule(self, original):
+        if not self.__inlinable(original):
+            return self.copy_rule(original)
+        body = self.visit(original.parser)
+        if self.__uses.get(original, 0) <= 1 or size(body) <= self.__max_size:
+            return body
+        return self.copy_rule(original)
+
+
+def inline(grammar, max_size=INLINE_SIZE, inline_named=False):
+    """Copy of grammar with small and single use rules inlined (see Inline)."""
+    return Inline(grammar, max_size, inline_named)(grammar)
+
+
+def _branch(parser_):
+    """Actions wrapping an alternative, innermost first, and the sequence they wrap."""
+    actions = []
+    while isinstance(parser_, parser.SemanticAction):
+        actions.append(parser_)
+        parser_ = parser_.parser
+    actions.reverse()
+    if isinstance(parser_, parser.Seq):
+        return actions, parser_.parsers, True
+    return actions, (parser_,), False
+
+
+class Factored(parser.Alt):
+    """Alternatives that begin with the same prefix_length parsers, which are parsed once.
+
+    Each alternative is a sequence, possibly wrapped in semantic actions, and
+    has the same value as it would alone.  The shared parsers must have no
+    side effects, so that parsing them again after a later part of an
+    alternative fails could only give the same result.
+    """
+
+    def __init__(self, prefix_length, *parsers):
+        super(Factored, self).__init__(*parsers)
+        self.__prefix_length = prefix_length
+
+    @property
+    def prefix_length(self):
+        return self.__prefix_length
+
+    @util.calculated_property
+    def __plan(self):
+        length = self.__prefix_length
+        branches = []
+        for alternative in self.parsers:
+            actions, parsers, is_seq = _branch(alternative)
+            branches.append((actions, parsers[length:]))
+        return _branch(self.parsers[0])[1][:length], tuple(branches)
+
+    @util.calculated_property
+    def __keeps(self):
+        # Which values each sequence keeps, or None for a lone parser.  Only
+        # needed when attributes are, since recursive grammars may not have types.
+        keeps = []
+        for alternative in self.parsers:
+            _, parsers, is_seq = _branch(alternative)
+            keeps.append(tuple(p.attr_type != parser.AttrType.UNUSED for p in parsers)
+                         if is_seq else None)
+        return tuple(keeps)
+
+    def _parse(self, state):
+        prefix, branches = self.__plan
+        values = []
+        for p in prefix:
+            result, value = p.parse(state)
+            if not result:
+                return
+            values.append(value)
+
+        recognizing = state.recognizing
+        for index, (actions, suffix) in enumerate(branches):
+            with state.open_transaction():
+                branch_values = list(values)
+                for p in suffix:
+                    result, value = p.parse(state)
+                    if not result:
+                        break
+                    branch_values.append(value)
+                else:
+                    if recognizing:
+                        value = parser.UNUSED
+                    else:
+                        keep = self.__keeps[index]
+                        if keep is None:
+                            value = branch_values[0]
+                        else:
+                            kept = tuple(v for v, k in zip(branch_values, keep) if k)
+                            value = parser.UNUSED if not kept else kept[0] if len(kept) == 1 else kept
+                    state.commit(value)
+                    for action in actions:
+                        action._act(state)
+                    value = state.value
+                    break
+        else:
+            return
+        state.commit(value)
+
+
+class LeftFactor(Transform):
+    """Parses prefixes shared by consecutive alternatives only once.
+
+    Leading parsers are shared when they are built the same way and run no
+    semantic actions (see parser.runs_actions), and do not use the rule
+    scope.  Alternatives are grouped only with their neighbours, so the
+    order in which they are tried does not change, and never when wrapped in
+    actions that run even when recognizing.
+    """
+
+    def __init__(self):
+        super(LeftFactor, self).__init__()
+        self.__keys = {}
+
+    def __key(self, parser_):
+        """Fingerprint of parser_, or None if it may not be shared."""
+        key = id(parser_)
+        try:
+            return self.__keys[key][1]
+        except KeyError:
+            pass
+        if parser.runs_actions(parser_) or parser_.uses_scope:
+            fingerprint = None
+        else:
+            fingerprint = cache.fingerprint(parser_)
+        self.__keys[key] = (parser_, fingerprint)
+        return fingerprint
+
+    def __common_length(self, group):
+        branches = [_branch(p) for p in group]
+        if any(action.runs_when_recognizing for actions, _, _ in branches for action in actions):
+            # Their shared prefix would only be recognized.
+            return 0
+        sequences = [parsers for _, parsers, _ in branches]
+        length = 0
+        for parsers in zip(*sequences):
+            key = self.__key(parsers[0])
+            if key is None or any(self.__key(p) != key for p in parsers[1:]):
+                break
+            length += 1
+        return length
+
+    def rewrite(self, parser_):
+        if not isinstance(parser_, parser.Alt) or isinstance(parser_, Factored):
+            return parser_
+        alternatives = []
+        group = []
+        for alternative in parser_.parsers + (None,):
+            if group and alternative is not None and self.__common_length(group + [alternative]):
+                group.append(alternative)
+                continue
+            if len(group) > 1:
+                alternatives.append(Factored(self.__common_length(group), *group))
+            else:
+                alternatives.extend(group)
+            group = [alternative]
+        if len(alternatives) == len(parser_.parsers):
+            return parser_
+        elif len(alternatives) == 1:
+            return alternatives[0]
+        return parser.Alt(*alternatives)
+
+
+def left_factor(grammar):
+    """Copy of grammar with shared prefixes of alternatives factored out (see LeftFactor)."""
+    return LeftFactor()(grammar)
+
+
+def _attr_type(parser_):
+    """Attribute type of parser_, or None where a recursive rule leaves it unknown."""
+    try:
+        return parser_.attr_type
+    except (NotImplementedError, RecursionError):
+        return None
+
+
+def _is_directive(parser_, directive):
+    return isinstance(parser_, parser.FuncDirectiveParser) and parser_.func is directive.func
+
+
+def _literal(parser_):
+    """String matched by a String parser of a constant, else None."""
+    if type(parser_) is parser.String and isinstance(parser_.string, (str, bytes)):
+        return parser_.string
+    return None
+
+
+def _omitted_literal(parser_):
+    """String matched by lit(string), else None."""
+    if _is_directive(parser_, parser.omit):
+        return _literal(parser_.parser)
+    return None
+
+
+class Flatten(Transform):
+    """Splices sequences and alternatives into the ones that contain them.
+
+    Alternatives are always spliced.  Sequences are spliced only when they
+    keep at most one value, so the values of the outer sequence do not change.
+    """
+
+    def rewrite(self, parser_):
+        if type(parser_) is parser.Alt:
+            if any(type(p) is parser.Alt for p in parser_.parsers):
+                return parser.Alt(*(q for p in parser_.parsers
+                                    for q in (p.parsers if type(p) is parser.Alt else (p,))))
+        elif type(parser_) is parser.Seq:
+            if any(self.__splices(p) for p in parser_.parsers):
+                return parser.Seq(*(q for p in parser_.parsers
+                                    for q in (p.parsers if self.__splices(p) else (p,))))
+        return parser_
+
+    @staticmethod
+    def __splices(parser_):
+        if type(parser_) is not parser.Seq:
+            return False
+        types = [_attr_type(p) for p in parser_.parsers]
+        return None not in types and sum(t != parser.AttrType.UNUSED for t in types) <= 1
+
+
+def flatten(grammar):
+    """Copy of grammar with nested sequences and alternatives spliced (see Flatten)."""
+    return Flatten()(grammar)
+
+
+class CollapseOmit(Transform):
+    """Replaces omit[omit[p]] by omit[p]."""
+
+    def rewrite(self, parser_):
+        if _is_directive(parser_, parser.omit) and _is_directive(parser_.parser, parser.omit):
+            return parser_.parser
+        return parser_
+
+
+def collapse_omit(grammar):
+    """Copy of grammar without nested omit directives."""
+    return CollapseOmit()(grammar)
+
+
+class FuseLiterals(Transform):
+    """Joins adjacent lit() parsers in a sequence into one.
+
+    The skipper could match between literals, so unless skipping is false
+    they are only joined inside lexemes.  A failure to match joined literals
+    is reported where they start.
+    """
+
+    def __init__(self, skipping=True, copy_rules=True):
+        super(FuseLiterals, self).__init__()
+        self.__skipping = skipping
+        self.__copy_rules = copy_rules
+
+    def rewrite_rule(self, original):
+        if self.__copy_rules:
+            return self.copy_rule(original)
+        return original
+
+    def rewrite(self, parser_):
+        if self.__skipping:
+            if _is_directive(parser_, parser.object_lexeme):
+                # Rules used in the lexeme may be used with the skipper elsewhere.
+                body = FuseLiterals(skipping=False, copy_rules=False).visit(parser_.parser)
+                if body is not parser_.parser:
+                    return parser_.with_children((body,))
+            return parser_
+        elif type(parser_) is not parser.Seq:
+            return parser_
+
+        parsers = []
+        run = []
+        for p in parser_.parsers + (None,):
+            string = None if p is None else _omitted_literal(p)
+            if string is not None and run and type(string) is type(run[0][1]):
+                run.append((p, string))
+                continue
+            if len(run) > 1:
+                parsers.append(parser.lit(run[0][1][:0].join(string for _, string in run)))
+            else:
+                parsers.extend(p for p, _ in run)
+            run = [] if string is None else [(p, string)]
+            if string is None and p is not None:
+                parsers.append(p)
+        if len(parsers) == len(parser_.parsers):
+            return parser_
+        return parsers[0] if len(parsers) == 1 else parser.Seq(*parsers)
+
+
+def fuse_literals(grammar, skipping=True):
+    """Copy of grammar with adjacent literals joined (see FuseLiterals)."""
+    return FuseLiterals(skipping)(grammar)
+
+
+class LiteralSymbols(Transform):
+    """Replaces runs of alternatives that are String or lit() parsers by Symbols.
+
+    Symbols tries strings in sorted order, so a run is replaced only when no
+    string is preceded by a longer one it is a prefix of.
+    """
+
+    def rewrite(self, parser_):
+        if type(parser_) is not parser.Alt:
+            return parser_
+        alternatives = []
+        run = []
+        kind = None
+        for p in parser_.parsers + (None,):
+            string, omitted = _literal(p), False
+            if string is None and p is not None:
+                string, omitted = _omitted_literal(p), True
+            this_kind = None if string is None else (type(string), omitted)
+            if this_kind is not None and this_kind == kind:
+                run.append((p, string))
+                continue
+            alternatives.extend(self.__symbols(run, kind))
+            run = [] if this_kind is None else [(p, string)]
+            kind = this_kind
+            if this_kind is None and p is not None:
+                alternatives.append(p)
+        if len(alternatives) == len(parser_.parsers):
+            return parser_
+        return alternatives[0] if len(alternatives) == 1 else parser.Alt(*alternatives)
+
+    @staticmethod
+    def __symbols(run, kind):
+        strings = [string for _, string in run]
+        if len(run) < 2 or any(later != string and string.startswith(later)
+                               for index, string in enumerate(strings)
+                               for later in strings[index + 1:]):
+            return [p for p, _ in run]
+        symbols = parser.Symbols({string: string for string in strings})
+        return [parser.omit[symbols] if kind[1] else symbols]
+
+
+def literal_symbols(grammar):
+    """Copy of grammar with alternatives of literals replaced by Symbols (see LiteralSymbols)."""
+    return LiteralSymbols()(grammar)
+
+
+DEFAULT_PASSES = (
+    ('inline', inline),
+    ('flatten', flatten),
+    ('collapse_omit', collapse_omit),
+    ('fuse_literals', fuse_literals),
+    ('literal_symbols', literal_symbols),
+    ('left_factor', left_factor),
+)
+
+
+class Pipeline:
+    """Grammar rewrite passes applied in order.
+
+    Passes are named functions taking a grammar and returning an equivalent
+    copy.  Each can be disabled and enabled again by name.
+    """
+
+    def __init__(self, passes=DEFAULT_PASSES, disabled=()):
+        self.__passes = dict(passes)
+        self.__disabled = set()
+        for name in disabled:
+            self.disable(name)
+
+    @property
+    def names(self):
+        return tuple(self.__passes)
+
+    @property
+    def enabled(self):
+        return tuple(name for name in self.__passes if name not in self.__disabled)
+
+    def __check(self, name):
+        if name not in self.__passes:
+            raise KeyError('No optimizer pass named {!r}'.format(name))
+
+    def enable(self, name):
+        self.__check(name)
+        self.__disabled.discard(name)
+
+    def disable(self, name):
+        self.__check(name)
+        self.__disabled.add(name)
+
+    def __call__(self, grammar):
+        for name in self.enabled:
+            grammar = self.__passes[name](grammar)
+        return grammar
+
+
+def optimized(grammar, disabled=()):
+    """Copy of grammar rewritten by the default passes, less those disabled."""
+    return Pipeline(disabled=disabled)(grammar)
@@ -0,0 +1,381 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from booze import whiskey
+from booze.gin import chars
+from booze.gin import local_vars
+from booze.gin import optimize
+from booze.gin import parser
+from booze.gin import rule
+
+
+def rules_in(grammar):
+    return [p for p in optimize.walk(grammar) if isinstance(p, rule.Rule)]
+
+
+class WalkTestCase(unittest.TestCase):
+
+    def test_walk(self):
+        a = parser.Char('a')
+        r = rule.Rule()
+        r %= a << r
+        self.assertEqual([r, r.parser, a], list(optimize.walk(r)))
+
+    def test_size(self):
+        a = parser.Char('a')
+        r = rule.Rule()
+        r %= parser.Char('b') << r
+        self.assertEqual(3, optimize.size(a << a << r))
+        self.assertEqual(4, optimize.size(parser.Seq(a, parser.Seq(a, r))))
+
+    def test_recursive_rules(self):
+        a, b, c, d = rule.Rule(), rule.Rule(), rule.Rule(), rule.Rule()
+        a %= b << c
+        b %= parser.Char('b') << -a
+        c %= +d
+        d %= parser.Char('d') << -d
+        self.assertEqual({a, b, d}, optimize.recursive_rules(a))
+
+
+class TransformTestCase(unittest.TestCase):
+
+    def test_copy(self):
+        r = rule.Rule(parser.AttrType.TUPLE, name='r')
+        r %= parser.Char('a') << -r
+        copy = optimize.Transform()(r)
+        self.assertIsNot(r, copy)
+        self.assertIsInstance(copy, rule.Rule)
+        self.assertEqual(parser.AttrType.TUPLE, copy.expected_attr_type)
+        self.assertEqual('r', copy.name)
+        self.assertIs(copy, copy.parser.parsers[1].parser)
+        self.assertEqual(r.parse('aa'), copy.parse('aa'))
+
+    def test_rewrite(self):
+        class Upper(optimize.Transform):
+            def rewrite(self, p):
+                if isinstance(p, parser.String):
+                    return parser.String(p.string.upper())
+                return p
+
+        original = parser.String('a') << parser.Char('b')
+        rewritten = Upper()(original)
+        self.assertEqual((True, ('A', 'b')), rewritten.parse('Ab'))
+        self.assertEqual((True, ('a', 'b')), original.parse('ab'))
+
+    def test_shared(self):
+        a = parser.String('a')
+        copy = optimize.Transform()(a << a)
+        self.assertIs(copy.parsers[0], copy.parsers[1])
+
+
+class InlineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.name = rule.Rule()
+        self.name %= parser.lexeme[+chars.alpha]
+        self.item = rule.Rule(parser.AttrType.OBJECT)
+        self.group = rule.Rule()
+        self.group %= '(' << parser.Repeat()[self.item] << ')'
+        self.item %= self.name | self.group
+
+    def test_inline(self):
+        inlined = optimize.inline(self.item)
+        self.assertEqual(2, len(rules_in(inlined)))
+        self.assertEqual(self.item.parse('(a (b c))', ' '), inlined.parse('(a (b c))', ' '))
+        self.assertEqual(3, len(rules_in(self.item)))
+
+    def test_top_level(self):
+        top = rule.Rule()
+        top %= self.name
+        inlined = optimize.inline(top)
+        self.assertNotIsInstance(inlined, rule.Rule)
+        self.assertEqual((True, 'abc'), inlined.parse('abc'))
+
+    def test_attr_type(self):
+        r = rule.Rule(parser.AttrType.STRING)
+        r %= parser.Char('a')
+        inlined = optimize.inline(r << r)
+        self.assertEqual(parser.AttrType.TUPLE, inlined.attr_type)
+        self.assertEqual((True, ('a', 'a')), inlined.parse('aa'))
+
+    def test_size_threshold(self):
+        r = rule.Rule()
+        r %= parser.Char('a') << parser.Char('b') << parser.Char('c')
+        self.assertEqual(0, len(rules_in(optimize.inline(r << r, 4))))
+        self.assertEqual(1, len(rules_in(optimize.inline(r << r, 3))))
+        self.assertEqual(0, len(rules_in(optimize.inline(r << parser.Char('d'), 3))))
+
+    def test_named_not_inlined(self):
+        self.name.name = 'name'
+        inlined = optimize.inline(self.item)
+        self.assertIn('name', [r.name for r in rules_in(inlined)])
+        self.assertEqual(self.item.parse('(a (b c))', ' '), inlined.parse('(a (b c))', ' '))
+        inlined = optimize.inline(self.item, inline_named=True)
+        self.assertNotIn('name', [r.name for r in rules_in(inlined)])
+
+    def test_called_not_inlined(self):
+        r = rule.Rule()
+        r %= parser.String(whiskey.p[0])
+        inlined = optimize.inline(r('a') << r('b'))
+        self.assertEqual(1, len(rules_in(inlined)))
+        self.assertEqual((True, ('a', 'b')), inlined.parse('ab'))
+
+    def test_scope_not_inlined(self):
+        r = rule.Rule()
+        r %= parser.Char('a-z', ranges=True)[local_vars.l.c[whiskey.p[0]]] << parser.String(local_vars.l.c)
+        inlined = optimize.inline(r << r)
+        self.assertEqual(1, len(rules_in(inlined)))
+        self.assertEqual((True, (('a', 'a'), ('b', 'b'))), inlined.parse('aabb'))
+
+    def test_undefined_rule(self):
+        r = rule.Rule()
+        inlined = optimize.inline(parser.Char('a') << r)
+        self.assertEqual(1, len(rules_in(inlined)))
+
+
+class LeftFactorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.name = parser.lexeme[+chars.alpha]
+        self.tag = (('<' << self.name << '>')
+                    | ('<' << self.name << '/>')
+                    | ('<' << parser.omit[parser.lit('!')] << self.name << '>'))
+
+    def assertSameParse(self, original, factored, text, skipper=None):
+        self.assertEqual(original.parse(text, skipper), factored.parse(text, skipper))
+        self.assertEqual(original.recognize(text, skipper), factored.recognize(text, skipper))
+
+    def test_factor(self):
+        factored = optimize.left_factor(self.tag)
+        self.assertIsInstance(factored, optimize.Factored)
+        self.assertEqual(1, factored.prefix_length)
+        self.assertEqual(parser.AttrType.STRING, factored.attr_type)
+        for text in ['<a>', '<ab/>', '<!a>', '<a', '<>', '']:
+            self.assertSameParse(self.tag, factored, text)
+
+    def test_longest_prefix(self):
+        g = ('<' << self.name << '>') | ('<' << self.name << '/>')
+        factored = optimize.left_factor(g)
+        self.assertEqual(2, factored.prefix_length)
+        for text in ['<a>', '< ab />', '<a/', '< >']:
+            self.assertSameParse(g, factored, text, ' ')
+
+    def test_order_kept(self):
+        a, b, c = parser.Char('a'), parser.Char('b'), parser.Char('c')
+        g = (a << b) | c | (a << c) | a | (a << b << c)
+        factored = optimize.left_factor(g)
+        self.assertIsInstance(factored, parser.Alt)
+        self.assertEqual([False, False, True], [isinstance(p, optimize.Factored)
+                                                for p in factored.parsers])
+        for text in ['ab', 'c', 'ac', 'a', 'abc']:
+            self.assertSameParse(g, factored, text)
+
+    def test_lone_parser(self):
+        a, b = parser.Char('a'), parser.Char('b')
+        g = a | (a << b)
+        factored = optimize.left_factor(g)
+        self.assertIsInstance(factored, optimize.Factored)
+        self.assertEqual((True, 'a'), factored.parse('ab'))
+
+    def test_actions(self):
+        a, b, c = parser.Char('a'), parser.Char('b'), parser.Char('c')
+        g = (a << b)[lambda x, y: x + y + '!'] | (a << c)[lambda x, y: y + x][str.upper]
+        factored = optimize.left_factor(g)
+        self.assertIsInstance(factored, optimize.Factored)
+        self.assertEqual((True, 'ab!'), factored.parse('ab'))
+        self.assertEqual((True, 'CA'), factored.parse('ac'))
+        self.assertSameParse(g, factored, 'ad')
+
+    def test_actions_not_shared(self):
+        calls = []
+
+        def count(value):
+            calls.append(value)
+            return value
+
+        a, b, c = parser.Char('a'), parser.Char('b'), parser.Char('c')
+        prefix = a[count]
+        g = (prefix << b) | (prefix << c)
+        factored = optimize.left_factor(g)
+        self.assertNotIsInstance(factored, optimize.Factored)
+        self.assertEqual((True, ('a', 'c')), factored.parse('ac'))
+        self.assertEqual(['a', 'a'], calls)
+
+    def test_scope_not_shared(self):
+        prefix = parser.String(local_vars.l.s)
+        g = (prefix << parser.Char('b')) | (prefix << parser.Char('c'))
+        self.assertNotIsInstance(optimize.left_factor(g), optimize.Factored)
+
+    def test_in_rules(self):
+        r = rule.Rule(parser.AttrType.OBJECT)
+        r %= ('(' << r << ')') | ('(' << parser.Char('a') << ')') | parser.Char('b')
+        factored = optimize.left_factor(r)
+        self.assertIsInstance(factored.parser.parsers[0], optimize.Factored)
+        self.assertNotIsInstance(r.parser.parsers[0], optimize.Factored)
+        for text in ['((b))', '(a)', '((a)', 'b']:
+            self.assertSameParse(r, factored, text)
+
+
+    def test_recursive_closure(self):
+        def outer():
+            def action(value):
+                return action(value) if value != 'a' else value
+            return action
+        p = (parser.Char('a')[outer()] << 'b') | (parser.Char('a')[outer()] << 'c')
+        factored = optimize.left_factor(p)
+        self.assertSameParse(p, factored, 'ac')
+
+class FlattenTestCase(unittest.TestCase):
+
+    def test_alt(self):
+        a, b, c = parser.Char('a'), parser.Char('b'), parser.Char('c')
+        g = parser.Alt(a, parser.Alt(b, c))
+        flat = optimize.flatten(g)
+        self.assertEqual((a, b, c), flat.parsers)
+        self.assertEqual((True, 'c'), flat.parse('c'))
+
+    def test_seq(self):
+        a, b, c = parser.Char('a'), parser.Char('b'), parser.Char('c')
+        g = parser.Seq(a, b << parser.lit('-'), parser.lit('(') << c)
+        flat = optimize.flatten(g)
+        self.assertEqual(5, len(flat.parsers))
+        self.assertEqual(g.parse('ab-(c'), flat.parse('ab-(c'))
+
+    def test_seq_of_values_kept(self):
+        a, b = parser.Char('a'), parser.Char('b')
+        g = parser.Seq(a, a << b)
+        flat = optimize.flatten(g)
+        self.assertIs(g, flat)
+        self.assertEqual((True, ('a', ('a', 'b'))), flat.parse('aab'))
+
+    def test_untyped_recursion(self):
+        r = rule.Rule()
+        r %= parser.Char('b') | parser.Seq(parser.Char('a'), parser.Seq(r))
+        self.assertEqual((True, 3), optimize.flatten(r).recognize('aab'))
+
+
+class CollapseOmitTestCase(unittest.TestCase):
+
+    def test_collapse(self):
+        a = parser.Char('a')
+        g = parser.omit[parser.omit[parser.omit[a]]] << a
+        collapsed = optimize.collapse_omit(g)
+        self.assertIs(a, collapsed.parsers[0].parser)
+        self.assertEqual((True, 'a'), collapsed.parse('aa'))
+
+
+class FuseLiteralsTestCase(unittest.TestCase):
+
+    def test_skipping(self):
+        g = parser.lit('a') << parser.lit('b') << parser.lit('c')
+        self.assertIs(g, optimize.fuse_literals(g))
+        self.assertEqual((True, parser.UNUSED), optimize.fuse_literals(g).parse('a b c', ' '))
+
+    def test_not_skipping(self):
+        g = parser.lit('a') << parser.lit('b') << parser.Char('x') << parser.lit('c')
+        fused = optimize.fuse_literals(g, skipping=False)
+        self.assertEqual(3, len(fused.parsers))
+        self.assertEqual('ab', fused.parsers[0].parser.string)
+        self.assertEqual((True, 'x'), fused.parse('abxc'))
+        self.assertFalse(fused.parse('abyc')[0])
+
+    def test_single(self):
+        fused = optimize.fuse_literals(parser.lit(b'a') << parser.lit(b'b'), skipping=False)
+        self.assertEqual(b'ab', fused.parser.string)
+
+    def test_lexeme(self):
+        g = parser.lexeme['<' << parser.lit('!') << chars.alpha] << parser.lit('>') << parser.lit('>')
+        fused = optimize.fuse_literals(g)
+        self.assertEqual(3, len(g.parsers))
+        self.assertEqual(3, len(fused.parsers))
+        self.assertEqual((True, 'a'), fused.parse('<!a > >', ' '))
+        self.assertFalse(fused.parse('< !a>>', ' ')[0])
+
+    def test_rule_in_lexeme(self):
+        r = rule.Rule()
+        r %= parser.lit('a') << parser.lit('b')
+        g = parser.lexeme[r << 'c'] << r
+        fused = optimize.fuse_literals(g)
+        self.assertEqual((True, ''), fused.parse('abc a b', ' '))
+        self.assertFalse(fused.parse('a bc ab', ' ')[0])
+
+
+class LiteralSymbolsTestCase(unittest.TestCase):
+
+    def test_symbols(self):
+        g = parser.lit('if') | parser.lit('in') | parser.lit('else') | parser.Char('x')
+        symbols = optimize.literal_symbols(g)
+        self.assertEqual(2, len(symbols.parsers))
+        self.assertEqual(('else', 'if', 'in'), symbols.parsers[0].parser.symbols)
+        self.assertEqual(parser.AttrType.UNUSED, symbols.parsers[0].attr_type)
+        for text in ['if', 'in', 'else', 'x', 'i']:
+            self.assertEqual(g.parse(text), symbols.parse(text))
+
+    def test_strings(self):
+        g = parser.String('a') | parser.String('b')
+        symbols = optimize.literal_symbols(g)
+        self.assertIsInstance(symbols, parser.Symbols)
+        self.assertEqual((True, 'b'), symbols.parse('b'))
+
+    def test_order(self):
+        g = parser.lit('ab') | parser.lit('a')
+        self.assertIs(g, optimize.literal_symbols(g))
+        g = parser.lit('a') | parser.lit('ab')
+        self.assertIsInstance(optimize.literal_symbols(g).parser, parser.Symbols)
+
+    def test_mixed(self):
+        g = parser.lit('a') | parser.String('b') | parser.lit(b'c')
+        self.assertIs(g, optimize.literal_symbols(g))
+
+
+class PipelineTestCase(unittest.TestCase):
+
+    def test_names(self):
+        pipeline = optimize.Pipeline()
+        self.assertEqual(['inline', 'flatten', 'collapse_omit', 'fuse_literals',
+                          'literal_symbols', 'left_factor'], list(pipeline.names))
+        self.assertEqual(pipeline.names, pipeline.enabled)
+
+    def test_toggle(self):
+        calls = []
+        pipeline = optimize.Pipeline([('a', lambda g: calls.append('a') or g),
+                                      ('b', lambda g: calls.append('b') or g)])
+        pipeline.disable('a')
+        self.assertEqual(('b',), pipeline.enabled)
+        pipeline(None)
+        pipeline.enable('a')
+        pipeline(None)
+        self.assertEqual(['b', 'a', 'b'], calls)
+        self.assertRaises(KeyError, pipeline.disable, 'c')
+
+    def test_optimized(self):
+        keyword = rule.Rule()
+        keyword %= parser.lit('let') | parser.lit('var')
+        name = parser.lexeme[+chars.alpha]
+        statement = rule.Rule(parser.AttrType.OBJECT)
+        statement %= ((keyword << name << '=' << name << ';')
+                      | (keyword << name << ';')
+                      | ('{' << parser.Repeat()[statement] << '}'))
+        optimized = optimize.optimized(statement)
+        self.assertEqual(1, len(rules_in(optimized)))
+        self.assertIsInstance(optimized.parser.parsers[0], optimize.Factored)
+        for text in ['let a = b;', '{ var a; { let b = c; } }', '{ let a = ; }']:
+            self.assertEqual(statement.parse(text, ' '), optimized.parse(text, ' '))
+        self.assertEqual(2, len(rules_in(optimize.optimized(statement, disabled=['inline']))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+
+from . import aux
+from . import parser
+
+
+def _parser_input(text):
+    # Buffers such as mmaps are read through a memoryview, without copying.
+    return text if isinstance(text, str) else memoryview(text)
+
+
+def split_ranges(text, resync, count):
+    """Split text in to at most count (start, end) ranges.
+
+    Text is a str or a bytes-like object such as an mmap.  Every range but
+    the first starts immediately after a match of resync, which may be a
+    literal of the same kind as text or a parser.
+    """
+    length = len(text)
+    if isinstance(resync, (str, bytes)):
+        if not resync:
+            raise ValueError('Resync literal may not be empty')
+        if isinstance(resync, str) is not isinstance(text, str):
+            raise TypeError('Resync literal {!r} does not match the type of the text'.format(resync))
+        pattern = re.compile(re.escape(resync))
+
+        def find_boundary(position):
+            found = pattern.search(text, position)
+            return None if found is None else found.end()
+    elif isinstance(resync, parser.Parser):
+        state = parser.ParserState(_parser_input(text))
+
+        def find_boundary(position):
+            for candidate in range(position, length):
+                state.input.seek(candidate)
+                status, _ = resync.parse(state)
+                if status:
+                    return state.input.tell()
+            return None
+    else:
+        raise TypeError('Unexpected resync type: {}'.format(type(resync)))
+
+    ranges = []
+    start = 0
+    for index in range(1, count):
+        target = max(start, length * index // count)
+        boundary = find_boundary(target)
+        if boundary is None or boundary >= length:
+            break
+        if boundary > start:
+            ranges.append((start, boundary))
+            start = boundary
+    ranges.append((start, length))
+    return ranges
+
+
+_worker_parser = None
+_worker_skipper = None
+# Text being parsed, set before forking workers so they share it rather
+# than being sent their ranges.
+_worker_text = None
+
+
+def _range_parser(record):
+    # Seq applies the skipper ahead of every record, Repeat alone does not.
+    return parser.Repeat()[parser.Seq(record)] << aux.eoi
+
+
+def _init_worker(range_parser, skipper):
+    global _worker_parser, _worker_skipper
+    _worker_parser = range_parser
+    _worker_skipper = skipper
+
+
+def _parse_range(text):
+    # Only the status and value are sent back, failures refer to the grammar.
+    status, value = _worker_parser.parse(text, _worker_skipper)
+    return status, value
+
+
+def _parse_shared_range(bounds):
+    start, end = bounds
+    return _parse_range(_parser_input(_worker_text)[start:end])
+
+
+def _join(results):
+    results = list(results)
+    if not all(status for status, _ in results):
+        return False, None
+    if any(value is parser.UNUSED for _, value in results):
+        return True, parser.UNUSED
+    values = []
+    for _, value in results:
+        values.extend(value)
+    return True, tuple(values)
+
+
+def parse_parallel(record, text, resync, workers=None, skipper=None):
+    """Parse text as a sequence of records using worker processes.
+
+    The text, a str or a bytes-like object such as an mmap of a file, is
+    split at resync boundaries (see split_ranges) and every range is parsed
+    as *record up to its end.  Record values are concatenated in input order
+    and must be picklable, so values of bytes input should not be
+    memoryviews.  Returns (True, records) or (False, None) when any range
+    fails.
+    """
+    global _worker_text
+    workers = workers or os.cpu_count() or 1
+    range_parser = _range_parser(parser.as_parser(record))
+    ranges = split_ranges(text, resync, workers)
+    if len(ranges) == 1:
+        return _join([range_parser.parse(_parser_input(text), skipper)])
+
+    import concurrent.futures
+    import multiprocessing
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Forked workers inherit the grammar and text, so neither is
+        # pickled and each worker is sent only the bounds of its range.
+        context = multiprocessing.get_context('fork')
+        _worker_text = text
+        parse_range, arguments = _parse_shared_range, ranges
+    else:
+        context = multiprocessing.get_context()
+        parse_range = _parse_range
+        arguments = (text[start:end] if isinstance(text, str) else memoryview(text)[start:end].tobytes()
+                     for start, end in ranges)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(len(ranges),
+                                                    mp_context=context,
+                                                    initializer=_init_worker,
+                                                    initargs=(range_parser, skipper)) as executor:
+            return _join(executor.map(parse_range, arguments))
+    finally:
+        _worker_text = None
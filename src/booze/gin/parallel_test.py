@@ -0,0 +1,119 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+import tempfile
+import unittest
+
+from booze.gin import chars
+from booze.gin import parallel
+from booze.gin import parser
+
+
+class SplitRangesTestCase(unittest.TestCase):
+
+    def test_literal(self):
+        text = 'a\nbb\nccc\ndddd\n'
+        ranges = parallel.split_ranges(text, '\n', 4)
+        self.assertEqual([(0, 5), (5, 9), (9, 14)], ranges)
+        self.assertEqual(text, ''.join(text[start:end] for start, end in ranges))
+
+    def test_parser(self):
+        text = 'r1 x\nr2 y\nz\nr3 w'
+        resync = '\n' << ~parser.lit('r')
+        ranges = parallel.split_ranges(text, resync, 4)
+        self.assertEqual(['r1 x\n', 'r2 y\nz\n', 'r3 w'], [text[start:end] for start, end in ranges])
+
+    def test_bytes(self):
+        text = b'a\nbb\nccc\ndddd\n'
+        self.assertEqual([(0, 5), (5, 9), (9, 14)], parallel.split_ranges(text, b'\n', 4))
+        self.assertEqual([(0, 5), (5, 9), (9, 14)], parallel.split_ranges(bytearray(text), b'\n', 4))
+        resync = parser.lit(b'\n') << ~parser.lit(b'c')
+        self.assertEqual([(0, 5), (5, 14)], parallel.split_ranges(memoryview(text), resync, 4))
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as data:
+            data.write(b'a\nbb\nccc\ndddd\n')
+            data.flush()
+            with mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) as text:
+                self.assertEqual([(0, 5), (5, 9), (9, 14)], parallel.split_ranges(text, b'\n', 4))
+                self.assertEqual([(0, 5), (5, 9), (9, 14)],
+                                 parallel.split_ranges(text, parser.lit(b'\n'), 4))
+
+    def test_mismatched_literal(self):
+        with self.assertRaises(TypeError):
+            parallel.split_ranges(b'a\nb', '\n', 2)
+        with self.assertRaises(TypeError):
+            parallel.split_ranges('a\nb', b'\n', 2)
+
+    def test_no_boundary(self):
+        self.assertEqual([(0, 3)], parallel.split_ranges('abc', '\n', 4))
+
+    def test_empty_resync(self):
+        with self.assertRaises(ValueError):
+            parallel.split_ranges('abc', '', 2)
+
+    def test_bad_resync(self):
+        with self.assertRaises(TypeError):
+            parallel.split_ranges('abc', object(), 2)
+
+
+class ParseParallelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.record = parser.lexeme[+chars.digit][lambda digits: int(digits)] << ';'
+        self.text = ''.join('{};\n'.format(i) for i in range(200))
+
+    def test_parse(self):
+        self.assertEqual((True, tuple(range(200))),
+                         parallel.parse_parallel(self.record, self.text, '\n', workers=3, skipper=' \n'))
+
+    def test_single_worker(self):
+        self.assertEqual((True, tuple(range(200))),
+                         parallel.parse_parallel(self.record, self.text, '\n', workers=1, skipper=' \n'))
+
+    def test_bytes(self):
+        record = parser.as_string[+chars.digit][lambda digits: int(digits)] << b';'
+        text = self.text.encode()
+        for workers in (1, 3):
+            self.assertEqual((True, tuple(range(200))),
+                             parallel.parse_parallel(record, text, b'\n', workers=workers, skipper=' \n'))
+        self.assertIsNone(parallel._worker_text)
+
+    def test_mmap(self):
+        record = parser.as_string[+chars.digit][lambda digits: int(digits)] << b';'
+        with tempfile.TemporaryFile() as data:
+            data.write(self.text.encode())
+            data.flush()
+            with mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) as text:
+                self.assertEqual((True, tuple(range(200))),
+                                 parallel.parse_parallel(record, text, b'\n', workers=3, skipper=' \n'))
+
+    def test_parse_fail(self):
+        text = self.text + 'x;\n' + self.text
+        self.assertEqual((False, None), parallel.parse_parallel(self.record, text, '\n', workers=3, skipper=' \n'))
+
+    def test_unused_records(self):
+        self.assertEqual((True, parser.UNUSED),
+                         parallel.parse_parallel(parser.lit('a;'), 'a;\na;\na;\n', '\n', workers=2, skipper='\n'))
+
+    def test_unused_records_fail(self):
+        for workers in (1, 2):
+            self.assertEqual((False, None),
+                             parallel.parse_parallel(parser.lit('a;'), 'a;\na;\nx;\n', '\n',
+                                                     workers=workers, skipper='\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
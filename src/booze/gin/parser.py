@@ -12,11 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import contextlib
 import enum
-import inspect
+import functools
 import io
+import re
+import time
 
+from . import inputs
 from . import local_vars
 from .. import util
 from .. import whiskey
@@ -34,7 +38,7 @@ class UNUSED:
 
 
 def as_parser(value):
-    if isinstance(value, str):
+    if isinstance(value, (str, bytes)):
         return lit(value)
     elif isinstance(value, dict):
         return Symbols(value)
@@ -44,6 +48,108 @@ def as_parser(value):
         raise TypeError('Unexpected parser type: {}'.format(type(value)))
 
 
+def as_skipper(skipper):
+    if isinstance(skipper, (str, bytes)):
+        return Char(skipper)
+    elif isinstance(skipper, Parser) or skipper is None:
+        return skipper
+    else:
+        raise TypeError('Unexpected parser {}'.format(type(skipper)))
+
+
+class ParseLimitExceeded(Exception):
+    """Raised when a parse is stopped by its Limits, with the input position it had reached."""
+
+    reason = 'Parse stopped'
+
+    def __init__(self, position):
+        super(ParseLimitExceeded, self).__init__(position)
+        self.__position = position
+
+    @property
+    def position(self):
+        return self.__position
+
+    def __str__(self):
+        return '{} at position {}'.format(self.reason, self.__position)
+
+
+class StepLimitExceeded(ParseLimitExceeded):
+
+    reason = 'Step limit exceeded'
+
+
+class DeadlineExceeded(ParseLimitExceeded):
+
+    reason = 'Deadline exceeded'
+
+
+class ParseCancelled(ParseLimitExceeded):
+
+    reason = 'Parse cancelled'
+
+
+class CancellationToken:
+    """Flag another thread sets to stop the parses given it."""
+
+    def __init__(self):
+        self.__cancelled = False
+
+    @property
+    def cancelled(self):
+        return self.__cancelled
+
+    def cancel(self):
+        self.__cancelled = True
+
+
+class Limits:
+    """Bounds on the work of a parse.
+
+    steps is the most parser invocations allowed, timeout the most seconds
+    from the start of the parse and deadline a time.monotonic() time to stop
+    at.  The clock and cancel, a CancellationToken, are only looked at every
+    check_interval steps.  A parse that goes over raises the matching
+    ParseLimitExceeded.  Limits hold no state of their own, so one may be
+    used for any number of parses.
+    """
+
+    def __init__(self, steps=None, timeout=None, deadline=None, cancel=None, check_interval=256):
+        self.__steps = steps
+        self.__timeout = timeout
+        self.__deadline = deadline
+        self.__cancel = cancel
+        self.__check_interval = check_interval
+
+    @property
+    def steps(self):
+        return self.__steps
+
+    @property
+    def timeout(self):
+        return self.__timeout
+
+    @property
+    def deadline(self):
+        return self.__deadline
+
+    @property
+    def cancel(self):
+        return self.__cancel
+
+    @property
+    def check_interval(self):
+        return self.__check_interval
+
+    def start(self):
+        """Deadline of a parse starting now, or None."""
+        deadline = self.__deadline
+        if self.__timeout is not None:
+            timeout_deadline = time.monotonic() + self.__timeout
+            deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+        return deadline
+
+
 class ParserState:
 
     class __Tx:
@@ -55,12 +161,34 @@ class ParserState:
         def __init__(self, pos):
             self.pos = pos
 
-    def __init__(self, state_input, skipper=None):
+    def __init__(self, state_input, skipper=None, memo=None, recognize=False, tree=None, limits=None):
         if isinstance(state_input, str):
             self.__input = io.StringIO(state_input)
+            self.__text = state_input
+        elif isinstance(state_input, (bytes, bytearray, memoryview)):
+            self.__input = inputs.BufferInput(state_input)
+            self.__text = self.__input.buffer
         else:
             self.__input = state_input
+            self.__text = None
+        if memo is not None:
+            if tree is not None:
+                raise ValueError('Memoized parses cannot build trees')
+            self.__input = inputs.TrackedInput(self.__input)
         self.skipper = skipper
+        self.__memo = memo
+        self.__recognizing = recognize
+        self.__tree = tree
+        self.deferred = False
+        self.tracking = True
+        self.profiler = None
+        self.limits = limits
+        self.__steps = 0
+        if limits is not None:
+            self.__deadline = limits.start()
+            self.__next_check = self.__check_after(0)
+        self.__failure_position = -1
+        self.__expected = []
         self.__tx = None
         self.__scope = None
 
@@ -68,18 +196,83 @@ class ParserState:
     def input(self):
         return self.__input
 
+    @property
+    def memo(self):
+        return self.__memo
+
+    @property
+    def tree(self):
+        """Tree builder receiving nodes from node[] directives, if any."""
+        return self.__tree
+
+    @property
+    def recognizing(self):
+        """True when only matching input, without attributes or semantic actions."""
+        return self.__recognizing
+
+    @property
+    def text(self):
+        """Entire input as a str or memoryview when parsing a string or buffer, otherwise None."""
+        return self.__text
+
     @property
     def skipper(self):
         return self.__skipper
 
+    @property
+    def failure(self):
+        """Farthest position at which a leaf parser failed and the parsers expected there, or None."""
+        if self.__failure_position < 0:
+            return None
+        return Failure(self.__failure_position, self.__expected)
+
+    def fail(self, parser, position):
+        """Record that parser failed to match at position."""
+        if position >= self.__failure_position and self.tracking:
+            if position > self.__failure_position:
+                self.__failure_position = position
+                self.__expected = [parser]
+            else:
+                self.__expected.append(parser)
+
+    def reset_failure(self):
+        self.__failure_position = -1
+        self.__expected = []
+
+    @property
+    def steps(self):
+        """Parser invocations counted against the limits of the parse."""
+        return self.__steps
+
+    def step(self):
+        """Count a parser invocation, raising ParseLimitExceeded when over the limits."""
+        self.__steps += 1
+        if self.__steps >= self.__next_check:
+            self.__check_limits()
+
+    def __check_after(self, steps):
+        limits = self.limits
+        next_check = steps + limits.check_interval
+        if limits.steps is not None:
+            if self.__deadline is None and limits.cancel is None:
+                return limits.steps + 1
+            next_check = min(next_check, limits.steps + 1)
+        return next_check
+
+    def __check_limits(self):
+        limits = self.limits
+        steps = self.__steps
+        if limits.steps is not None and steps > limits.steps:
+            raise StepLimitExceeded(self.__input.tell())
+        elif limits.cancel is not None and limits.cancel.cancelled:
+            raise ParseCancelled(self.__input.tell())
+        elif self.__deadline is not None and time.monotonic() >= self.__deadline:
+            raise DeadlineExceeded(self.__input.tell())
+        self.__next_check = self.__check_after(steps)
+
     @skipper.setter
     def skipper(self, skipper):
-        if isinstance(skipper, str):
-            self.__skipper = Char(skipper)
-        elif isinstance(skipper, Parser) or skipper is None:
-            self.__skipper = skipper
-        else:
-            raise TypeError('Unexpected parser {}'.format(type(skipper)))
+        self.__skipper = as_skipper(skipper)
 
     @property
     def _tx(self):
@@ -101,6 +294,10 @@ class ParserState:
     def scope(self):
         return self.__scope
 
+    @scope.setter
+    def scope(self, scope):
+        self.__scope = scope
+
     @value.setter
     def value(self, value):
         self._tx.value = value
@@ -109,6 +306,12 @@ class ParserState:
     def read(self, *args, **kwargs):
         return self.__input.read(*args, **kwargs)
 
+    def advance(self, position, examined):
+        """Move to position after examining text directly up to examined."""
+        self.__input.seek(position)
+        if self.__memo is not None:
+            self.__input.extent = max(self.__input.extent, examined)
+
     def commit(self, value=UNUSED):
         self.value = value
         self._tx.commit = True
@@ -134,23 +337,103 @@ class ParserState:
         finally:
             self.__scope = previous_scope
 
+    @contextlib.contextmanager
+    def open_recognition(self):
+        """Recognize input only, without attributes or semantic actions, until closed."""
+        recognizing = self.__recognizing
+        self.__recognizing = True
+        try:
+            yield self
+        finally:
+            self.__recognizing = recognizing
+
+    @contextlib.contextmanager
+    def open_synthesis(self):
+        """Synthesize attributes and run semantic actions, even when recognizing, until closed."""
+        recognizing = self.__recognizing
+        self.__recognizing = False
+        try:
+            yield self
+        finally:
+            self.__recognizing = recognizing
+
     @contextlib.contextmanager
     def open_transaction(self):
         tx = self._tx
+        tree = self.__tree
+        mark = None if tree is None else tree.size
         self.__tx = ParserState.__Tx(self.__input.tell())
         try:
             yield self
         finally:
             if not self.committed:
                 self.__input.seek(self._tx.pos)
+                if tree is not None:
+                    tree.truncate(mark)
             self.__tx = tx
 
     def invoke(self, value):
+        """Invoke value in the current scope, resolving any deferred actions in its result.
+
+        The result is used to parse, so it cannot wait for the final parse.
+        """
+        if not isinstance(value, whiskey.Action):
+            return value
         scope = self.__scope
-        args = scope.args if scope else ()
-        kwargs = scope.kwargs if scope else {}
-        vars = scope.vars if scope else local_vars.Vars()
-        return whiskey.invoke(value, *args, vars=vars, **kwargs)
+        if scope is None:
+            value = whiskey.invoke(value, vars=local_vars.Vars())
+        else:
+            value = scope.invoke(value)
+        return _resolve(value) if self.deferred else value
+
+
+class Failure:
+    """Farthest position a parse reached and the leaf parsers expected there."""
+
+    def __init__(self, position, expected):
+        self.__position = position
+        self.__expected = tuple(dict.fromkeys(expected))
+
+    @property
+    def position(self):
+        return self.__position
+
+    @property
+    def expected(self):
+        return self.__expected
+
+    def __str__(self):
+        return 'Expected {} at position {}'.format(' or '.join(_describe(p) for p in self.__expected),
+                                                   self.__position)
+
+
+class ParseResult(tuple):
+    """(status, value) pair of a parse, carrying the Failure of a failed one.
+
+    rest is the input parse_async read past the end of the parse, otherwise
+    None.
+    """
+
+    def __new__(cls, status, value, failure=None, rest=None):
+        result = super(ParseResult, cls).__new__(cls, (status, value))
+        result.failure = failure
+        result.rest = rest
+        return result
+
+    def __reduce__(self):
+        return ParseResult, (self[0], self[1], self.failure, self.rest)
+
+
+def _describe(parser):
+    if isinstance(parser, String):
+        return repr(parser.string)
+    elif isinstance(parser, Symbols):
+        return ' or '.join(repr(symbol) for symbol in parser.symbols)
+    elif isinstance(parser, Char) and parser.ranges:
+        return '[{}{}]'.format('^' if parser.negated else '',
+                               ''.join(chr(low) if low == high else '{}-{}'.format(chr(low), chr(high))
+                                       for low, high in parser.ranges))
+    return type(parser).__name__
 
 
 class AttrType(enum.Enum):
@@ -163,7 +446,7 @@ class AttrType(enum.Enum):
     def compatible(self, value):
         if self in (AttrType.UNUSED, AttrType.OBJECT):
             return True
-        elif isinstance(value, str) and self == AttrType.STRING:
+        elif isinstance(value, (str, bytes)) and self == AttrType.STRING:
             return True
         elif isinstance(value, tuple) and self == AttrType.TUPLE:
             return True
@@ -178,7 +461,7 @@ class AttrType(enum.Enum):
     def type_for(value):
         if value is UNUSED:
             return AttrType.UNUSED
-        if isinstance(value, str):
+        if isinstance(value, (str, bytes)):
             return AttrType.STRING
         elif isinstance(value, tuple):
             return AttrType.TUPLE
@@ -186,23 +469,126 @@ class AttrType(enum.Enum):
             return AttrType.OBJECT
 
 
+ASYNC_READ_SIZE = 64 * 1024
+
+
+class FrozenGrammarError(AttributeError):
+    """Raised when changing a parser of a frozen grammar."""
+
+
+def _copy(parser):
+    import copy
+    result = copy.copy(parser)
+    # The copy is about to change, and calculated properties may depend on
+    # what is replaced.
+    attributes = vars(result)
+    attributes.pop('_Parser__frozen', None)
+    for name in [name for name in attributes if name.startswith('_cached_')]:
+        del attributes[name]
+    return result
+
+
+def freeze(grammar):
+    """Make grammar and every parser and rule it uses immutable, and return it.
+
+    Cached values such as attribute types are calculated up front, so a
+    frozen grammar is never changed by parsing and may be used by any number
+    of threads at once.  All state of a parse is in its ParserState.
+    Changing a frozen parser, including redefining a rule, raises
+    FrozenGrammarError.  Copies made by with_children are not frozen.
+    """
+    seen = set()
+    stack = [grammar]
+    while stack:
+        parser = stack.pop()
+        if id(parser) in seen or parser.frozen:
+            continue
+        seen.add(id(parser))
+        stack.extend(parser._freeze())
+    return grammar
+
+
 class Parser:
     """Base class for parsers."""
 
+    __frozen = False
+
+    @property
+    def frozen(self):
+        return self.__frozen
+
+    def __setattr__(self, name, value):
+        if self.__frozen:
+            raise FrozenGrammarError('Cannot change {} of a frozen {}'.format(name, type(self).__name__))
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if self.__frozen:
+            raise FrozenGrammarError('Cannot change {} of a frozen {}'.format(name, type(self).__name__))
+        object.__delattr__(self, name)
+
+    def _precompute(self):
+        """Calculate the cached values parsing would otherwise calculate on first use."""
+        for name in util.calculated_properties(type(self)):
+            try:
+                getattr(self, name)
+            except (NotImplementedError, RecursionError):
+                # Recursive rules may have no attribute type, and then
+                # nothing depending on it is ever calculated.
+                pass
+
+    def _freeze(self):
+        """Calculate cached values and forbid changes, returning the parsers to freeze next."""
+        self._precompute()
+        object.__setattr__(self, '_Parser__frozen', True)
+        return self.children
+
     @property
     def attr_type(self):
         raise NotImplementedError
 
-    def parse(self, parser_input, skipper=None):
-        if skipper is not None and isinstance(parser_input, ParserState):
-            raise TypeError('May not provide ParserState and new skipper')
-        if not isinstance(parser_input, ParserState):
-            parser_input = ParserState(parser_input, skipper)
+    @property
+    def uses_scope(self):
+        """Whether parsing may use the arguments or variables of the enclosing rule.
+
+        Rules without arguments open a scope only when their parser uses it.
+        Parsers are assumed to use it unless they say otherwise.
+        """
+        return True
+
+    @property
+    def children(self):
+        """Parsers this parser is made of, in order."""
+        return ()
+
+    def with_children(self, children):
+        """Copy of this parser made of children in place of its own."""
+        return self
+
+    def parse(self, parser_input, skipper=None, limits=None):
+        """Parse input, returning (True, value) or (False, None).
+
+        limits bounds the work of the parse (see Limits), and may only be
+        given with a new input, not a ParserState.
+        """
+        if isinstance(parser_input, ParserState):
+            if skipper is not None or limits is not None:
+                raise TypeError('May not provide ParserState and new skipper or limits')
+        else:
+            parser_input = ParserState(parser_input, skipper, limits=limits)
+        outermost = parser_input._tx is None
+        if outermost:
+            parser_input.reset_failure()
         with parser_input.open_transaction() as state:
+            if state.limits is not None:
+                state.step()
             if state.skipper:
                 status = True
                 skipper = state.skipper
+                tracking = state.tracking
                 state.skipper = None
+                # Where the skipper stops is not a failure of the grammar.
+                state.tracking = False
                 try:
                     while status:
                         with state.open_transaction():
@@ -211,8 +597,80 @@ class Parser:
                                 state.commit()
                 finally:
                     state.skipper = skipper
+                    state.tracking = tracking
             self._parse(state)
-            return state.successful, state.value if state.successful else None
+            if not state.successful:
+                if outermost:
+                    return ParseResult(False, None, state.failure)
+                return False, None
+            elif outermost and state.deferred:
+                state.value = _resolve(state.value)
+            return True, state.value
+
+    def recognize(self, parser_input, skipper=None, limits=None):
+        """Match input without synthesizing attributes or running semantic actions.
+
+        Returns (True, end position) or (False, None), as a ParseResult when
+        the parse fails.  Semantic actions that may set variables of the rule
+        scope still run, with the attributes of their parsers, since later
+        parsers may read them.
+        """
+        if not isinstance(parser_input, ParserState):
+            parser_input = ParserState(parser_input, skipper, recognize=True, limits=limits)
+            skipper = None
+        elif limits is not None:
+            raise TypeError('May not provide ParserState and new limits')
+        elif not parser_input.recognizing:
+            raise ValueError('ParserState is not recognizing')
+        result = self.parse(parser_input, skipper)
+        return (True, parser_input.input.tell()) if result[0] else result
+
+    async def parse_async(self, reader, skipper=None, encoding='utf-8'):
+        """Parse input read from an asyncio.StreamReader.
+
+        The first attempt parses whatever the first read returns.  When the
+        parser needs input that has not arrived yet, the attempt is abandoned
+        and restarted once the input read has doubled, so total work stays
+        linear in the length of the input.  Attempts on more than
+        ASYNC_READ_SIZE characters run in the default executor rather than on
+        the event loop.
+
+        Returns a ParseResult whose rest is the bytes read from reader past
+        the end of the parse.
+        """
+        import asyncio
+        import codecs
+
+        loop = asyncio.get_running_loop()
+        decoder = codecs.getincrementaldecoder(encoding)()
+        parser_input = inputs.ChunkedInput()
+        target = 1
+        while True:
+            while parser_input.end < target and not parser_input.closed:
+                data = await reader.read(ASYNC_READ_SIZE)
+                if data:
+                    parser_input.feed(decoder.decode(data))
+                else:
+                    parser_input.feed(decoder.decode(b'', final=True))
+                    parser_input.close()
+            parser_input.seek(0)
+            state = ParserState(parser_input, skipper)
+            try:
+                if parser_input.end > ASYNC_READ_SIZE:
+                    result = await loop.run_in_executor(None, self.parse, state)
+                else:
+                    result = self.parse(state)
+                break
+            except inputs.IncompleteInput:
+                target = 2 * parser_input.end
+        status, value = result
+        end = parser_input.tell() if status else 0
+        parser_input.seek(end)
+        rest = parser_input.read(parser_input.end - end).encode(encoding) + decoder.getstate()[0]
+        return ParseResult(status, value, getattr(result, 'failure', None), rest)
+
+    def push_parser(self, skipper=None, encoding=None):
+        return PushParser(self, skipper, encoding)
 
     def _parse(self, state):
         pass
@@ -247,33 +705,250 @@ class Parser:
     def __invert__(self):
         return predicate[self]
 
+    def __mod__(self, other):
+        return List(self, other)
 
-class Char(Parser):
 
-    def __init__(self, chars=None):
-        if chars is None:
-            self.__chars = None
-        elif isinstance(chars, whiskey.Action):
-            self.__chars = chars
+class PushParser:
+    """Parses a stream of top level items from input pushed in with feed().
+
+    feed() and close() return the values of every item completed so far.  An
+    item that needs more input than has been fed is restarted from its
+    beginning once the input buffered for it has doubled, or on close(), so
+    an item arriving in many small chunks is parsed a logarithmic number of
+    times.  Input before completed items is released.
+    """
+
+    def __init__(self, parser, skipper=None, encoding=None):
+        self.__parser = parser
+        self.__skipper = skipper
+        self.__input = inputs.ChunkedInput()
+        # Buffered input needed before an incomplete item is parsed again.
+        self.__retry_end = 0
+        if encoding:
+            import codecs
+            self.__decoder = codecs.getincrementaldecoder(encoding)()
         else:
-            self.__chars = set(chars)
+            self.__decoder = None
+
+    @property
+    def parser(self):
+        return self.__parser
+
+    def feed(self, data):
+        if self.__decoder:
+            data = self.__decoder.decode(data)
+        self.__input.feed(data)
+        return self.__parse_available()
+
+    def close(self):
+        if self.__decoder:
+            self.__input.feed(self.__decoder.decode(b'', final=True))
+        self.__input.close()
+        return self.__parse_available()
+
+    def __at_end(self, position):
+        # The empty sequence applies the skipper and nothing else.
+        Seq().parse(ParserState(self.__input, self.__skipper))
+        at_end = self.__input.read(1) in ('', b'')
+        self.__input.seek(position)
+        return at_end
+
+    def __parse_available(self):
+        results = []
+        if self.__input.end < self.__retry_end and not self.__input.closed:
+            return results
+        while True:
+            position = self.__input.tell()
+            try:
+                if self.__at_end(position):
+                    break
+                result = self.__parser.parse(ParserState(self.__input, self.__skipper))
+            except inputs.IncompleteInput:
+                self.__input.seek(position)
+                self.__retry_end = position + 2 * max(self.__input.end - position, 1)
+                break
+            status, value = result
+            if not status or self.__input.tell() == position:
+                self.__input.seek(position)
+                if results:
+                    break
+                message = 'Unable to parse input at position {}'.format(position)
+                if not status and result.failure is not None:
+                    message = '{}: {}'.format(message, result.failure)
+                raise ValueError(message)
+            results.append(value)
+            self.__input.discard(self.__input.tell())
+        return results
+
+
+def _char_set(chars):
+    if isinstance(chars, (bytes, bytearray)):
+        chars = chars.decode('latin-1')
+    return chars if isinstance(chars, set) else set(chars)
+
+
+def _char_ranges(chars, ranges=False):
+    """Sorted, merged (low, high) code ranges of the characters in chars.
+
+    With ranges, a string may contain ranges such as 'a-z'.  A '-' at either
+    end is literal, and a backslash makes the character after it literal, as
+    in '+\\-*'.  Otherwise, and for other iterables, every character is
+    taken as it is.
+    """
+    if isinstance(chars, (bytes, bytearray)):
+        chars = chars.decode('latin-1')
+    found = []
+    if ranges and isinstance(chars, str):
+        literals = []
+        index = 0
+        while index < len(chars):
+            if chars[index] == '\\' and index + 1 < len(chars):
+                index += 1
+                literals.append((chars[index], True))
+            else:
+                literals.append((chars[index], chars[index] != '-'))
+            index += 1
+        index = 0
+        while index < len(literals):
+            c = literals[index][0]
+            if index + 2 < len(literals) and literals[index + 1] == ('-', False):
+                high = literals[index + 2][0]
+                if c > high:
+                    raise ValueError('Invalid character range {}-{}'.format(c, high))
+                found.append((ord(c), ord(high)))
+                index += 3
+            else:
+                found.append((ord(c), ord(c)))
+                index += 1
+    else:
+        found.extend((ord(c), ord(c)) for c in chars)
+
+    merged = []
+    for low, high in sorted(found):
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(high, merged[-1][1]))
+        else:
+            merged.append((low, high))
+    return tuple(merged)
+
+
+class CharParser(Parser):
+    """Base class for parsers of exactly one character."""
 
     @property
     def attr_type(self):
         return AttrType.STRING
 
+    @property
+    def uses_scope(self):
+        return False
+
+    def _scan(self, text, start, stop):
+        """End of the run of matching characters in text[start:stop], or None if it cannot be scanned."""
+        return None
+
+
+def _class_pattern(negated, ranges, binary):
+    if binary:
+        ranges = [(low, min(high, 0xff)) for low, high in ranges if low <= 0xff]
+        escape = '\\x{:02x}'.format
+    else:
+        escape = lambda code: re.escape(chr(code))
+    items = ''.join(escape(low) if low == high else escape(low) + '-' + escape(high) for low, high in ranges)
+    if items:
+        pattern = '[{}{}]*'.format('^' if negated else '', items)
+    else:
+        pattern = '(?s:.)*' if negated else ''
+    return re.compile(pattern.encode('latin-1') if binary else pattern)
+
+
+class Char(CharParser):
+    """Parses one character of a class.
+
+    Every character of chars is in the class.  With ranges=True a string may
+    also contain ranges such as 'a-z' (see _char_ranges), and negated=True
+    matches every character not in the class.  Static classes are compiled
+    in to an ASCII lookup table plus sorted ranges for the remaining
+    characters.  A whiskey.Action is instead evaluated on every character.
+
+    Against bytes input every byte is matched as the latin-1 character of the
+    same value, so Char('abc') and Char(b'abc') are equivalent.
+    """
+
+    def __init__(self, chars=None, negated=False, ranges=False):
+        self.__action = None
+        if chars is None:
+            self.__negated, self.__ranges = True, ()
+        elif isinstance(chars, whiskey.Action):
+            if negated:
+                raise ValueError('Classes given by actions may not be negated')
+            self.__negated, self.__ranges = False, ()
+            self.__action = chars
+        else:
+            self.__negated, self.__ranges = negated, _char_ranges(chars, ranges)
+        self.__ascii = bytes(any(low <= code <= high for low, high in self.__ranges) for code in range(128))
+        self.__lows = [low for low, _ in self.__ranges]
+        self.__highs = [high for _, high in self.__ranges]
+
     @property
     def chars(self):
-        return self.__chars
+        """Characters of the class, the action giving them, or None when it is negated.
+
+        The set is made on every call, as a class of ranges may hold every
+        code point; parsing uses only the ranges.
+        """
+        if self.__action is not None:
+            return self.__action
+        elif self.__negated:
+            return None
+        return {chr(code) for low, high in self.__ranges for code in range(low, high + 1)}
+
+    @property
+    def negated(self):
+        return self.__negated
+
+    @property
+    def uses_scope(self):
+        return local_vars.uses_scope(self.__action)
+
+    @property
+    def ranges(self):
+        return self.__ranges
 
     def _parse(self, state):
         c = state.read(1)
-        if c != '':
-            local_chars = state.invoke(self.__chars)
-            if local_chars is not None and not isinstance(local_chars, set):
-                local_chars = set(local_chars)
-            if local_chars is None or c in local_chars:
-                state.commit(c)
+        if c:
+            if self.__action is not None:
+                local_chars = state.invoke(self.__action)
+                if local_chars is None or (c if isinstance(c, str) else c.decode('latin-1')) in _char_set(local_chars):
+                    state.commit(c)
+                    return
+            else:
+                code = ord(c)
+                if code < 128:
+                    matched = self.__ascii[code]
+                else:
+                    index = bisect.bisect_right(self.__lows, code) - 1
+                    matched = index >= 0 and code <= self.__highs[index]
+                if bool(matched) is not self.__negated:
+                    state.commit(c)
+                    return
+        state.fail(self, state.input.tell() - len(c))
+
+    @util.calculated_property
+    def _str_pattern(self):
+        return _class_pattern(self.__negated, self.__ranges, False)
+
+    @util.calculated_property
+    def _bytes_pattern(self):
+        return _class_pattern(self.__negated, self.__ranges, True)
+
+    def _scan(self, text, start, stop):
+        if self.__action is not None:
+            return None
+        pattern = self._str_pattern if isinstance(text, str) else self._bytes_pattern
+        return pattern.match(text, start, stop).end()
 
 
 class String(Parser):
@@ -289,11 +964,17 @@ class String(Parser):
     def string(self):
         return self.__string
 
+    @property
+    def uses_scope(self):
+        return local_vars.uses_scope(self.__string)
+
     def _parse(self, state):
         value = state.invoke(self.__string)
         string = state.read(len(value))
         if string == value:
             state.commit(string)
+        else:
+            state.fail(self, state.input.tell() - len(string))
 
 
 class AggregateParser(Parser):
@@ -305,6 +986,19 @@ class AggregateParser(Parser):
     def parsers(self):
         return self.__parsers
 
+    @property
+    def uses_scope(self):
+        return any(p.uses_scope for p in self.__parsers)
+
+    @property
+    def children(self):
+        return self.__parsers
+
+    def with_children(self, children):
+        result = _copy(self)
+        result.__parsers = tuple(children)
+        return result
+
 
 class Seq(AggregateParser):
 
@@ -326,21 +1020,43 @@ class Seq(AggregateParser):
         else:
             return all_types
 
-    def _parse(self, state):
-        values = []
-        for parser in self.parsers:
-            # TODO: Each value can be an action.
-            result, value = parser.parse(state)
-            if not result:
-                return
-            elif parser.attr_type != AttrType.UNUSED:
-                values.append(value)
+    @util.calculated_property
+    def __plan(self):
+        # Each parser paired with whether its value is kept, and the number kept.
+        keep = tuple(p.attr_type != AttrType.UNUSED for p in self.parsers)
+        return tuple(zip(self.parsers, keep)), sum(keep)
 
-        if len(values) == 0:
+    def _parse(self, state):
+        if state.recognizing:
+            # Attribute types are not needed, and recursive grammars may not have them.
+            for parser in self.parsers:
+                if not parser.parse(state)[0]:
+                    return
             state.commit(UNUSED)
-        elif len(values) == 1:
-            state.commit(values[0])
+            return
+        steps, kept = self.__plan
+        if kept == 0:
+            for parser, _ in steps:
+                if not parser.parse(state)[0]:
+                    return
+            state.commit(UNUSED)
+        elif kept == 1:
+            for parser, keep in steps:
+                result, value = parser.parse(state)
+                if not result:
+                    return
+                elif keep:
+                    kept_value = value
+            state.commit(kept_value)
         else:
+            values = []
+            for parser, keep in steps:
+                # TODO: Each value can be an action.
+                result, value = parser.parse(state)
+                if not result:
+                    return
+                elif keep:
+                    values.append(value)
             state.commit(tuple(values))
 
     def __lshift__(self, other):
@@ -389,6 +1105,19 @@ class Unary(Parser):
     def parser(self):
         return self.__parser
 
+    @property
+    def uses_scope(self):
+        return self.__parser.uses_scope
+
+    @property
+    def children(self):
+        return (self.__parser,)
+
+    def with_children(self, children):
+        result = _copy(self)
+        result.__parser, = children
+        return result
+
     def _parse(self, state):
         self.parser._parse(state)
 
@@ -408,32 +1137,143 @@ class SemanticAction(Unary):
     def func(self):
         return self.__func
 
+    @property
+    def uses_scope(self):
+        return self.parser.uses_scope or self.runs_when_recognizing
+
+    @util.calculated_property
+    def runs_when_recognizing(self):
+        """Whether the action may use the rule scope, so must run even when recognizing."""
+        func = self.__func
+        if isinstance(func, deferred):
+            func = func.func
+        if isinstance(func, whiskey.Action):
+            return local_vars.uses_scope(func, arguments=False)
+        sig = self.__signature
+        return sig is not None and any(p.name == 'vars' or p.kind == p.VAR_KEYWORD
+                                       for p in sig.parameters.values())
+
+    @util.calculated_property
+    def __signature(self):
+        import inspect
+        func = self.__func
+        if isinstance(func, deferred):
+            func = func.func
+        if isinstance(func, whiskey.Action):
+            func = func.invoke
+        try:
+            return inspect.signature(func)
+        except (TypeError, ValueError):
+            # Builtins without a signature, such as int, take the values alone.
+            return None
+
     def _parse(self, state):
+        if state.recognizing and self.runs_when_recognizing:
+            # Later parsers may read the variables it sets.
+            with state.open_synthesis():
+                self._parse(state)
+            if state.successful:
+                state.value = UNUSED
+            return
         super(SemanticAction, self)._parse(state)
         if state.successful:
+            self._act(state)
+
+    def _act(self, state):
+        """Replace the successful value of the wrapped parser with the action's result."""
+        if state.recognizing:
+            state.value = UNUSED
+        else:
             if self.parser.attr_type == AttrType.UNUSED:
                 params = ()
             else:
                 params = state.value if isinstance(state.value, tuple) else (state.value,)
 
-
-            if isinstance(self.__func, whiskey.Action):
-                func = self.__func.invoke
+            func = self.__func
+            is_deferred = isinstance(func, deferred)
+            if is_deferred:
+                func = func.func
+            elif state.deferred:
+                # Immediate actions need the values of any deferred ones below them.
+                params = _resolve(params)
+            if isinstance(func, whiskey.Action):
+                func = func.invoke
+
+            sig = self.__signature
+            if sig is None:
+                args, kwargs = params, {}
             else:
-                func = self.__func
+                binding = None
+                if state.scope:
+                    try:
+                        binding = sig.bind(*params, vars=state.scope.vars)
+                    except TypeError:
+                        pass
+
+                if not binding:
+                    binding = sig.bind(*params)
+                args, kwargs = binding.args, binding.kwargs
+
+            if is_deferred:
+                state.value = Pending(func, args, kwargs)
+                state.deferred = True
+            else:
+                state.value = func(*args, **kwargs)
 
-            sig = inspect.signature(func)
-            binding = None
-            if state.scope:
-                try:
-                    binding = sig.bind(*params, vars=state.scope.vars)
-                except TypeError:
-                    pass
 
-            if not binding:
-                binding = sig.bind(*params)
+class deferred:
+    """Marks a semantic action to run only if its match is part of the final parse.
 
-            state.value = func(*binding.args, **binding.kwargs)
+    The action is recorded with its arguments as a Pending value instead of
+    being called.  Pending values are resolved, innermost first and each only
+    once, when the outermost parse succeeds or at a resolve[] directive.
+    Values of abandoned alternatives are simply dropped.  Actions that take
+    vars see them as they are when resolved.
+    """
+
+    def __init__(self, func):
+        self.__func = func
+
+    @property
+    def func(self):
+        return self.__func
+
+
+class Pending:
+    """A deferred semantic action awaiting its final result."""
+
+    __slots__ = ('__func', '__args', '__kwargs', '__value')
+
+    def __init__(self, func, args, kwargs):
+        self.__func = func
+        self.__args = args
+        self.__kwargs = kwargs
+
+    def resolve(self):
+        try:
+            return self.__value
+        except AttributeError:
+            args = [_resolve(arg) for arg in self.__args]
+            kwargs = {name: _resolve(value) for name, value in self.__kwargs.items()}
+            self.__value = self.__func(*args, **kwargs)
+            return self.__value
+
+
+def _is_pending(value):
+    if isinstance(value, Pending):
+        return True
+    elif isinstance(value, tuple):
+        return any(_is_pending(v) for v in value)
+    return False
+
+
+def _resolve(value):
+    if isinstance(value, Pending):
+        return value.resolve()
+    elif isinstance(value, tuple):
+        resolved = tuple(_resolve(v) for v in value)
+        return value if all(r is v for r, v in zip(resolved, value)) else resolved
+    return value
 
 
 class Symbols(Parser):
@@ -441,6 +1281,8 @@ class Symbols(Parser):
     def __init__(self, symbols, attr_type=None):
         if not symbols:
             raise ValueError('Must provide some symbols')
+        if any(isinstance(value, (deferred, Pending)) for value in symbols.values()):
+            raise TypeError('Symbol values may not be deferred')
         if attr_type:
             self.__attr_type = attr_type
             for value in symbols.values():
@@ -458,20 +1300,29 @@ class Symbols(Parser):
                     break
             self.__attr_type = attr_type
 
-        self.__symbols = []
-        for symbol, value in sorted(symbols.items()):
-            self.__symbols.append((String(symbol), value))
+        self.__symbols = tuple((String(symbol), value) for symbol, value in sorted(symbols.items()))
 
     @property
     def attr_type(self):
         return self.__attr_type
 
+    @property
+    def symbols(self):
+        return tuple(parser.string for parser, _ in self.__symbols)
+
+    @property
+    def uses_scope(self):
+        return False
+
     def _parse(self, state):
+        start = state.input.tell()
         for parser, value in self.__symbols:
-            status, _ = parser.parse(state)
-            if status:
+            string = parser.string
+            if state.read(len(string)) == string:
                 state.commit(value)
-                break
+                return
+            state.input.seek(start)
+        state.fail(self, start)
 
 
 def directive_class(unary_parser):
@@ -486,6 +1337,14 @@ def directive_class(unary_parser):
 
         def __getitem__(self, parser):
             return unary_parser(parser, *self.__args, **self.__kwargs)
+
+    # The directive takes the place of the parser class in its module, so
+    # both are named for where pickle can find them.
+    Directive.__name__ = unary_parser.__name__
+    Directive.__qualname__ = unary_parser.__qualname__
+    Directive.__module__ = unary_parser.__module__
+    Directive.__doc__ = unary_parser.__doc__
+    unary_parser.__qualname__ += '.__parser_type__'
     return Directive
 
 
@@ -495,6 +1354,12 @@ class DirectiveParser(Unary):
         raise NotImplementedError
 
     def _parse(self, state):
+        if state.profiler is not None:
+            state.profiler.call(self, self.__parse_directed, state)
+        else:
+            self.__parse_directed(state)
+
+    def __parse_directed(self, state):
         with self._direct(state):
             super(DirectiveParser, self)._parse(state)
 
@@ -514,6 +1379,10 @@ class FuncDirectiveParser(DirectiveParser):
     def func(self):
         return self.__func
 
+    @property
+    def uses_scope(self):
+        return self.__func not in _SCOPELESS_DIRECTIVES or self.parser.uses_scope
+
     def _direct(self, state):
         return self.func(state)
 
@@ -538,6 +1407,8 @@ class FuncDirective:
 
 def func_directive(attr_type=None):
     def func_directive_decorator(func):
+        # The directive replaces func by name, so pickle finds func through it.
+        func.__qualname__ += '.func'
         return FuncDirective(func, attr_type)
     return func_directive_decorator
 
@@ -546,6 +1417,7 @@ def post_directive(attr_type=None):
     def post_directive_decorator(post_func):
         @func_directive(attr_type)
         @contextlib.contextmanager
+        @functools.wraps(post_func)
         def directive(state):
             yield
             if state.successful:
@@ -581,21 +1453,107 @@ class Repeat(Unary):
     def maximum(self):
         return self.__maximum
 
+    @util.calculated_property
+    def __collects(self):
+        return self.parser.attr_type != AttrType.UNUSED
+
+    @util.calculated_property
+    def __records_runs(self):
+        # Iterations that do not use the scope depend only on the input.
+        return self.__maximum is None and not self.parser.uses_scope
+
     def _parse(self, state):
+        parser = self.parser
+        if isinstance(parser, CharParser):
+            text = state.text
+            if text is not None and self.__parse_run(state, text):
+                return
+        maximum = self.__maximum
+        values = None if state.recognizing or not self.__collects else []
+        limited = state.limits is not None
+        parser_input = state.input
+        memo = state.memo
+        runs = None
+        if memo is not None and memo.runs and self.__records_runs:
+            runs = memo.open_runs(state, self, values is not None)
         count = 0
-        values = []
-        while self.__maximum is None or count < self.__maximum:
+        while maximum is None or count < maximum:
+            if runs is not None:
+                skipped = runs.skip()
+                if skipped is not None:
+                    run_count, run_values = skipped
+                    count += run_count
+                    if values is not None:
+                        values.extend(run_values)
+                    continue
+                runs.begin()
+            if limited:
+                state.step()
+            position = parser_input.tell()
             with state.open_transaction() as next_state:
-                super(Repeat.__parser_type__, self)._parse(next_state)
-                if next_state.successful:
-                    values.append(next_state.value)
-                else:
+                parser._parse(next_state)
+                if not next_state.successful:
                     break
+                empty = parser_input.tell() == position
+                if empty and count >= self.__minimum:
+                    # Every further iteration would match the same empty input.
+                    next_state.rollback()
+                    break
+                elif values is not None:
+                    values.append(next_state.value)
+                if runs is not None:
+                    if empty or not next_state.committed:
+                        # Runs only record iterations that move on through the input.
+                        runs.close()
+                        runs = None
+                    else:
+                        runs.add(next_state.value)
             count += 1
-        if self.is_optional:
+            if empty:
+                # The remaining required iterations would match the same empty input.
+                if values is not None:
+                    values.extend([values[-1]] * (self.__minimum - count))
+                count = max(count, self.__minimum)
+                break
+        if runs is not None:
+            runs.close()
+        if values is None:
+            if count >= self.__minimum:
+                state.commit(UNUSED)
+        elif self.is_optional:
             state.commit(values[0] if values else UNUSED)
         elif count >= self.__minimum:
-            state.commit(UNUSED if self.attr_type == AttrType.UNUSED else tuple(values))
+            state.commit(tuple(values))
+
+    def __parse_run(self, state, text):
+        # Consumes a run of characters in one scan rather than one transaction each.
+        start = state.input.tell()
+        if self.__maximum is None:
+            stop = len(text)
+        else:
+            stop = min(len(text), start + self.__maximum)
+        end = self.parser._scan(text, start, stop)
+        if end is None:
+            return False
+        limited = self.__maximum is not None and end == start + self.__maximum
+        state.advance(end, end if limited else end + 1)
+        if not limited:
+            state.fail(self.parser, end)
+        if state.recognizing:
+            if end - start >= self.__minimum:
+                state.commit(UNUSED)
+            return True
+        run = text[start:end]
+        if not isinstance(run, str):
+            run = bytes(run)
+        if self.is_optional:
+            state.commit(run if run else UNUSED)
+        elif end - start >= self.__minimum:
+            if isinstance(run, str):
+                state.commit(tuple(run))
+            else:
+                state.commit(tuple(run[index:index + 1] for index in range(len(run))))
+        return True
 
     def __neg__(self):
         if self.__minimum == 1:
@@ -604,6 +1562,190 @@ class Repeat(Unary):
             return super(Repeat.__parser_type__, self).__neg__()
 
 
+class List(Parser):
+    """One or more items separated by a separator, as written item % separator.
+
+    Item values are collected in to a single flat tuple; separator values are
+    discarded.
+    """
+
+    def __init__(self, item, separator):
+        self.__item = as_parser(item)
+        self.__separator = as_parser(separator)
+
+    @util.calculated_property
+    def attr_type(self):
+        return AttrType.UNUSED if self.__item.attr_type == AttrType.UNUSED else AttrType.TUPLE
+
+    @property
+    def item(self):
+        return self.__item
+
+    @property
+    def separator(self):
+        return self.__separator
+
+    @property
+    def uses_scope(self):
+        return self.__item.uses_scope or self.__separator.uses_scope
+
+    @property
+    def children(self):
+        return (self.__item, self.__separator)
+
+    def with_children(self, children):
+        result = _copy(self)
+        result.__item, result.__separator = children
+        return result
+
+    def _parse(self, state):
+        item = self.__item
+        separator = self.__separator
+        status, value = item.parse(state)
+        if not status:
+            return
+        values = None if state.recognizing or self.attr_type == AttrType.UNUSED else [value]
+        parser_input = state.input
+        while True:
+            position = parser_input.tell()
+            with state.open_transaction():
+                status, _ = separator.parse(state)
+                if status:
+                    status, value = item.parse(state)
+                    # Stops rather than matching the same empty input forever.
+                    status = status and parser_input.tell() != position
+                    if status:
+                        state.commit()
+            if not status:
+                break
+            if values is not None:
+                values.append(value)
+        state.commit(UNUSED if values is None else tuple(values))
+
+
+class Span:
+    """Location of matched input, sliced only when its value is asked for."""
+
+    __slots__ = ('__source', '__start', '__end', '__base')
+
+    def __init__(self, source, start, end, base=0):
+        self.__source = source
+        self.__start = start
+        self.__end = end
+        self.__base = base
+
+    @property
+    def start(self):
+        return self.__start
+
+    @property
+    def end(self):
+        return self.__end
+
+    @property
+    def value(self):
+        """Matched input as a str, or a memoryview for buffer input."""
+        return self.__source[self.__start - self.__base:self.__end - self.__base]
+
+    def __len__(self):
+        return self.__end - self.__start
+
+    def __eq__(self, other):
+        if not isinstance(other, Span):
+            return NotImplemented
+        return (self.__start, self.__end, self.value) == (other.__start, other.__end, other.value)
+
+    def __hash__(self):
+        return hash((self.__start, self.__end))
+
+    def __repr__(self):
+        return 'Span({}, {})'.format(self.__start, self.__end)
+
+
+def runs_actions(parser):
+    """Whether parsing may run semantic actions or otherwise depend on attributes.
+
+    Parsers for which this is false match the same input wherever they are
+    used and have no effects beyond the parse tree.
+    """
+    if isinstance(parser, (CharParser, String, Symbols)):
+        return False
+    elif isinstance(parser, FuncDirectiveParser) and parser.func not in _SCOPELESS_DIRECTIVES:
+        return True
+    elif isinstance(parser, (AggregateParser, Unary, List)) and not isinstance(parser, SemanticAction):
+        return any(runs_actions(child) for child in parser.children)
+    return True
+
+
+def _is_verbatim(parser):
+    """Whether the string value of parser is exactly the input it matches."""
+    if isinstance(parser, (CharParser, String)):
+        return True
+    elif isinstance(parser, FuncDirectiveParser):
+        return parser.func in _VERBATIM_DIRECTIVES and _is_verbatim(parser.parser)
+    elif isinstance(parser, (AggregateParser, Repeat.__parser_type__, Raw.__parser_type__)):
+        return all(_is_verbatim(child) for child in parser.children)
+    return False
+
+
+@directive_class
+class Raw(Unary):
+    """Matched input as a slice of the input rather than the attribute of its parser.
+
+    String input is sliced as a str and buffer input as a memoryview over the
+    same memory.  With span=True the value is a Span.  Other input is read
+    back from the start of the match.  The parser is only recognized, unless it
+    contains semantic actions.
+    """
+
+    def __init__(self, parser, span=False):
+        super(Raw.__parser_type__, self).__init__(as_parser(parser))
+        self.__span = span
+
+    @property
+    def attr_type(self):
+        return AttrType.OBJECT if self.__span else AttrType.STRING
+
+    @property
+    def span(self):
+        return self.__span
+
+    @util.calculated_property
+    def __recognize_only(self):
+        return not runs_actions(self.parser)
+
+    def _parse(self, state):
+        start = state.input.tell()
+        if state.recognizing:
+            self.parser._parse(state)
+            return
+        elif self.__recognize_only:
+            with state.open_recognition():
+                self.parser._parse(state)
+        else:
+            self.parser._parse(state)
+        if not state.successful:
+            return
+
+        end = state.input.tell()
+        text = state.text
+        if text is not None:
+            value = Span(text, start, end) if self.__span else text[start:end]
+        else:
+            state.input.seek(start)
+            value = state.read(end - start)
+            state.input.seek(end)
+            if self.__span:
+                value = Span(value, start, end, start)
+        if state.committed:
+            state.commit(value)
+        else:
+            state.succeed(value)
+
+raw = Raw()
+span = Raw(span=True)
+
+
 @post_directive(AttrType.UNUSED)
 def omit(state):
     state.value = UNUSED
@@ -611,15 +1753,34 @@ def omit(state):
 
 def _as_string(value):
     if value is UNUSED:
-        value = ''
+        return ''
     elif isinstance(value, tuple):
-        value = ''.join(_as_string(v) for v in value)
+        try:
+            return ''.join(value)
+        except TypeError:
+            parts = [part for part in map(_as_string, value) if part]
+            return parts[0][:0].join(parts) if parts else ''
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
     return str(value)
 
 
+@post_directive()
+def resolve(state):
+    """Cut point at which deferred actions in the attribute are run."""
+    if state.deferred:
+        state.value = _resolve(state.value)
+
+
 @post_directive(AttrType.STRING)
 def as_string(state):
-    state.value = _as_string(state.value)
+    if not state.recognizing:
+        value = state.value
+        if state.deferred and _is_pending(value):
+            # Joined once the deferred actions it contains are resolved.
+            state.value = Pending(_as_string, (value,), {})
+        else:
+            state.value = _as_string(value)
 
 
 def lit(string):
@@ -641,6 +1802,10 @@ def object_lexeme(state):
 class lexeme:
 
     def __getitem__(self, parser):
+        parser = as_parser(parser)
+        if _is_verbatim(parser):
+            # Input matched by a verbatim parser is its string value.
+            parser = raw[parser]
         return as_string[object_lexeme[parser]]
 
 
@@ -660,3 +1825,6 @@ def not_predicate(state):
         state.succeed()
 
 not_ = not_predicate
+
+_VERBATIM_DIRECTIVES = (as_string.func, object_lexeme.func, resolve.func, predicate.func, not_predicate.func)
+_SCOPELESS_DIRECTIVES = _VERBATIM_DIRECTIVES + (omit.func,)
@@ -12,11 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import contextlib
 import io
+import pickle
+import subprocess
+import sys
+import threading
+import time
 import unittest
 
+import booze.gin
 from booze import whiskey
+from booze.gin import aux
+from booze.gin import inputs
 from booze.gin import local_vars
 from booze.gin import parser
 
@@ -57,6 +66,10 @@ class AsParserTestCase(unittest.TestCase):
         p = parser.as_parser({'a': 1, 'b': 2})
         self.assertEqual((True, 1), p.parse('a'))
 
+    def test_bytes(self):
+        p = parser.as_parser(b'parser')
+        self.assertEqual((True, parser.UNUSED), p.parse(b'parser'))
+
     def test_non_parser(self):
         with self.assertRaises(TypeError):
             parser.as_parser(object())
@@ -84,6 +97,15 @@ class ParserStateTestCase(unittest.TestCase):
         with self.assertRaises(AttributeError):
             self.state.value
 
+    def test_bytes_in_constructor(self):
+        for state_input in (b'input', bytearray(b'input'), memoryview(b'input')):
+            self.state = parser.ParserState(state_input)
+            self.assertIsInstance(self.state.input, inputs.BufferInput)
+            self.assertEqual(b'input', self.state.read())
+
+    def test_bytes_skipper(self):
+        self.assertEqual({' '}, parser.ParserState(b'', b' ').skipper.chars)
+
     def test_string_in_constructor(self):
         self.state = parser.ParserState('input')
         self.assertEqual('input', self.state.read())
@@ -187,6 +209,7 @@ class AttrTypeTestCase(unittest.TestCase):
         self.assertTrue(parser.AttrType.UNUSED.compatible(object()))
         self.assertTrue(parser.AttrType.OBJECT.compatible(object()))
         self.assertTrue(parser.AttrType.STRING.compatible('a string'))
+        self.assertTrue(parser.AttrType.STRING.compatible(b'a string'))
         self.assertTrue(parser.AttrType.TUPLE.compatible(('a', 'tuple')))
 
     def test_not_compatible(self):
@@ -209,6 +232,7 @@ class AttrTypeTestCase(unittest.TestCase):
         self.assertEqual(parser.AttrType.UNUSED, parser.AttrType.type_for(parser.UNUSED))
         self.assertEqual(parser.AttrType.OBJECT, parser.AttrType.type_for(10))
         self.assertEqual(parser.AttrType.STRING, parser.AttrType.type_for('a string'))
+        self.assertEqual(parser.AttrType.STRING, parser.AttrType.type_for(b'a string'))
         self.assertEqual(parser.AttrType.TUPLE, parser.AttrType.type_for(('a', 'string')))
 
 
@@ -321,6 +345,246 @@ class ParserTestCase(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             parser.Parser().attr_type
 
+    def test_recognize(self):
+        calls = []
+
+        def record(value):
+            calls.append(value)
+            return value
+
+        item = parser.as_string[+parser.Char('a-z', ranges=True)][record]
+        p = '[' << (item % ',') << ']' << -(parser.String('x') << parser.String('y'))
+        self.assertEqual((True, 11), p.recognize('[ab, cd] xy', ' '))
+        self.assertEqual((True, 7), p.recognize('[ab,cd]z'))
+        self.assertEqual((False, None), p.recognize('[ab,]'))
+        self.assertEqual([], calls)
+        self.assertEqual((True, ('ab', 'cd')), (item % ',').parse('ab,cd'))
+        self.assertEqual(['ab', 'cd'], calls)
+
+    def test_recognize_state(self):
+        s = parser.ParserState('aaab', recognize=True)
+        self.assertTrue(s.recognizing)
+        self.assertEqual((True, 3), (+parser.Char('a')).recognize(s))
+        self.assertEqual((True, 'b'), parser.Char('b').parse(s))
+        with self.assertRaises(TypeError):
+            parser.Char('a').recognize(s, ' ')
+        with self.assertRaises(ValueError):
+            parser.Char('a').recognize(parser.ParserState('a'))
+
+    def test_recognize_predicate(self):
+        self.assertEqual((True, 0), (~parser.String('ab')).recognize('ab'))
+
+    def parse_async(self, p, chunks, skipper=None):
+        async def feed(reader):
+            for chunk in chunks:
+                await asyncio.sleep(0)
+                reader.feed_data(chunk)
+            reader.feed_eof()
+
+        async def run():
+            reader = asyncio.StreamReader()
+            feeder = asyncio.ensure_future(feed(reader))
+            result = await p.parse_async(reader, skipper)
+            await feeder
+            return result, await reader.read()
+        return asyncio.run(run())
+
+    def test_parse_async(self):
+        p = parser.String('abc') << parser.String('def')
+        self.assertEqual(((True, ('abc', 'def')), b''), self.parse_async(p, [b'a', b'bc ', b'd', b'ef'], ' '))
+
+    def test_parse_async_fail(self):
+        p = parser.String('abc') << parser.String('def')
+        self.assertEqual(((False, None), b''), self.parse_async(p, [b'a', b'bcdxf']))
+
+    def test_parse_async_partial_utf8(self):
+        p = +parser.Char('\u00e9')
+        self.assertEqual(((True, ('\u00e9', '\u00e9')), b''), self.parse_async(p, [b'\xc3', b'\xa9\xc3', b'\xa9']))
+
+    def test_parse_async_read_size(self):
+        original_size = parser.ASYNC_READ_SIZE
+        parser.ASYNC_READ_SIZE = 2
+        try:
+            p = parser.String('abc') << parser.String('def')
+            self.assertEqual(((True, ('abc', 'def')), b''), self.parse_async(p, [b'ab', b'cd', b'ef']))
+            # Attempts on more than ASYNC_READ_SIZE characters run in the executor.
+            p = +parser.String('ab')
+            self.assertEqual(((True, ('ab',) * 5), b''), self.parse_async(p, [b'ab'] * 5))
+        finally:
+            parser.ASYNC_READ_SIZE = original_size
+
+    def test_parse_async_rest(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'abc d\xc3')
+            # No end of input, the first read is parsed as soon as it arrives.
+            result = await asyncio.wait_for(parser.String('abc').parse_async(reader), 5)
+            self.assertEqual((True, 'abc'), result)
+            self.assertIsNone(result.failure)
+            self.assertEqual(b' d\xc3', result.rest)
+
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'xyz')
+            reader.feed_eof()
+            result = await parser.String('abc').parse_async(reader)
+            self.assertEqual((False, None), result)
+            self.assertIsNotNone(result.failure)
+            self.assertEqual(b'xyz', result.rest)
+        asyncio.run(run())
+
+
+class UsesScopeTestCase(unittest.TestCase):
+
+    def test_leaves(self):
+        self.assertFalse(parser.Char('a').uses_scope)
+        self.assertFalse(parser.String('a').uses_scope)
+        self.assertFalse(parser.Symbols({'a': 1}).uses_scope)
+        self.assertTrue(parser.Char(local_vars.l.chars).uses_scope)
+        self.assertTrue(parser.String(whiskey.p[0]).uses_scope)
+        self.assertTrue(parser.Parser().uses_scope)
+
+    def test_composites(self):
+        self.assertFalse(parser.lexeme[+parser.Char('a') << parser.lit('b')].uses_scope)
+        self.assertFalse((parser.Char('a') % ',').uses_scope)
+        self.assertTrue((parser.Char('a') << parser.String(whiskey.p[0])).uses_scope)
+        self.assertTrue(parser.Repeat()[parser.String(whiskey.p[0])].uses_scope)
+
+    def test_semantic_actions(self):
+        self.assertFalse(parser.Char('a')[lambda c: c].uses_scope)
+        self.assertFalse(parser.Char('a')[int].uses_scope)
+        self.assertFalse(parser.Char('a')[whiskey.p[0] + whiskey.p[0]].uses_scope)
+        self.assertTrue(parser.Char('a')[lambda c, vars: c].uses_scope)
+        self.assertTrue(parser.Char('a')[lambda *args, **kwargs: args].uses_scope)
+        self.assertTrue(parser.Char('a')[local_vars.l.a[whiskey.p[0]]].uses_scope)
+        self.assertTrue(parser.Char('a')[parser.deferred(lambda c, vars: c)].uses_scope)
+
+    def test_func_directives(self):
+        @parser.func_directive()
+        @contextlib.contextmanager
+        def custom(state):
+            yield
+        self.assertTrue(custom[parser.Char('a')].uses_scope)
+        self.assertFalse(parser.omit[parser.Char('a')].uses_scope)
+
+
+class FailureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.digits = parser.Char('0-9', ranges=True)
+        self.semi = parser.String(';')
+        self.keyword = parser.Symbols({'let': 1, 'var': 2})
+
+    def test_farthest(self):
+        p = self.keyword << +self.digits << self.semi
+        result = p.parse('let 12 x', ' ')
+        self.assertEqual((False, None), result)
+        self.assertEqual(7, result.failure.position)
+        self.assertEqual((self.semi,), result.failure.expected)
+
+    def test_expected_alternatives(self):
+        p = +self.digits << (self.semi | parser.String(','))
+        result = p.parse('12x')
+        self.assertEqual(2, result.failure.position)
+        self.assertEqual((self.digits, self.semi), result.failure.expected[:2])
+        self.assertEqual("Expected [0-9] or ';' or ',' at position 2", str(result.failure))
+
+    def test_symbols(self):
+        result = self.keyword.parse('  set', ' ')
+        self.assertEqual(2, result.failure.position)
+        self.assertEqual((self.keyword,), result.failure.expected)
+        self.assertEqual("Expected 'let' or 'var' at position 2", str(result.failure))
+
+    def test_skipper_not_expected(self):
+        result = (self.semi << self.semi).parse('; x', ' ')
+        self.assertEqual((2, (self.semi,)), (result.failure.position, result.failure.expected))
+
+    def test_end_of_input(self):
+        result = parser.String('ab').parse('a')
+        self.assertEqual(0, result.failure.position)
+
+    def test_success(self):
+        result = self.digits.parse('1')
+        self.assertNotIsInstance(result, parser.ParseResult)
+        self.assertIsNone(parser.ParserState('1').failure)
+
+    def test_reset_between_parses(self):
+        s = parser.ParserState('1;x')
+        self.assertFalse((self.digits << self.digits).parse(s)[0])
+        s.input.seek(2)
+        result = self.semi.parse(s)
+        self.assertEqual(2, result.failure.position)
+
+    def test_recognize(self):
+        result = (+self.digits << self.semi).recognize('12')
+        self.assertEqual((False, None), result)
+        self.assertEqual(2, result.failure.position)
+
+    def test_push_parser_message(self):
+        push_parser = (+self.digits << self.semi).push_parser()
+        with self.assertRaisesRegex(ValueError, r"position 0: Expected \[0-9\] or ';' at position 2"):
+            push_parser.feed('12x')
+
+    def test_pickle(self):
+        result = pickle.loads(pickle.dumps(parser.ParseResult(False, None)))
+        self.assertEqual((False, None), result)
+        self.assertIsNone(result.failure)
+
+
+class PushParserTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = (parser.String('abc') | parser.String('ab')) << ';'
+        self.push_parser = self.parser.push_parser(' ')
+
+    def test_parser(self):
+        self.assertIs(self.parser, self.push_parser.parser)
+
+    def test_feed(self):
+        self.assertEqual([], self.push_parser.feed('a'))
+        self.assertEqual([], self.push_parser.feed('b'))
+        self.assertEqual(['ab', 'abc'], self.push_parser.feed(';  abc;ab'))
+        # The last item is parsed again once its input has doubled.
+        self.assertEqual([], self.push_parser.feed(';'))
+        self.assertEqual(['ab'], self.push_parser.feed(' '))
+        self.assertEqual([], self.push_parser.close())
+
+    def test_close_parses_pending(self):
+        self.assertEqual(['abc'], self.push_parser.feed('abc;ab'))
+        self.assertEqual([], self.push_parser.feed(';'))
+        self.assertEqual(['ab'], self.push_parser.close())
+
+    def test_small_chunks(self):
+        calls = []
+        push_parser = (+parser.Char('a')[lambda c: calls.append(c) or c] << ';').push_parser()
+        for _ in range(1000):
+            self.assertEqual([], push_parser.feed('a'))
+        push_parser.feed(';')
+        self.assertEqual([('a',) * 1000], push_parser.close())
+        self.assertLess(len(calls), 4000)
+
+    def test_close(self):
+        self.assertEqual(['ab'], self.push_parser.feed('ab;abc'))
+        with self.assertRaises(ValueError):
+            self.push_parser.close()
+
+    def test_fail(self):
+        self.assertEqual(['ab'], self.push_parser.feed('ab;x'))
+        with self.assertRaisesRegex(ValueError, 'position 3'):
+            self.push_parser.feed('yz')
+
+    def test_feed_after_close(self):
+        self.push_parser.close()
+        with self.assertRaises(ValueError):
+            self.push_parser.feed('ab;')
+
+    def test_encoding(self):
+        push_parser = (+parser.Char('\u00e9') << ';').push_parser(encoding='utf-8')
+        self.assertEqual([], push_parser.feed(b'\xc3'))
+        self.assertEqual([('\u00e9',)], push_parser.feed(b'\xa9;\xc3'))
+        self.assertEqual([], push_parser.feed(b'\xa9'))
+        self.assertEqual([('\u00e9',)], push_parser.feed(b';'))
+        self.assertEqual([], push_parser.close())
+
 
 class CharTestCase(unittest.TestCase):
 
@@ -353,9 +617,90 @@ class CharTestCase(unittest.TestCase):
             self.assertEqual((False, None), p.parse(s))
             self.assertEqual(3, s.input.tell())
 
+    def test_parse_bytes(self):
+        p = parser.Char('ab\u00e9')
+        s = parser.ParserState(b'ab\xe9c')
+        self.assertEqual((True, b'a'), p.parse(s))
+        self.assertEqual((True, b'b'), p.parse(s))
+        self.assertEqual((True, b'\xe9'), p.parse(s))
+        self.assertEqual((False, None), p.parse(s))
+        self.assertEqual((True, b'a'), parser.Char(b'a').parse(b'a'))
+
+    def test_parse_ranges(self):
+        p = parser.Char('a-cX-Z_', ranges=True)
+        for c in 'abcXYZ_':
+            self.assertEqual((True, c), p.parse(c))
+        for c in 'dWz-':
+            self.assertEqual((False, None), p.parse(c))
+        self.assertEqual(((ord('X'), ord('Z')), (ord('_'), ord('_')), (ord('a'), ord('c'))), p.ranges)
+
+    def test_parse_literal_dash(self):
+        self.assertEqual((True, '-'), parser.Char('-a', ranges=True).parse('-'))
+        self.assertEqual((True, '-'), parser.Char('a-', ranges=True).parse('-'))
+        self.assertEqual((False, None), parser.Char('a-c', ranges=True).parse('-'))
+
+    def test_parse_escapes(self):
+        p = parser.Char('+\\-*', ranges=True)
+        for c in '+-*':
+            self.assertEqual((True, c), p.parse(c))
+        self.assertEqual((False, None), p.parse(','))
+        self.assertEqual((True, '\\'), parser.Char('\\\\a', ranges=True).parse('\\'))
+        self.assertEqual((True, 'b'), parser.Char('\\a-c', ranges=True).parse('b'))
+
+    def test_parse_negated(self):
+        p = parser.Char('a-c', negated=True, ranges=True)
+        self.assertTrue(p.negated)
+        self.assertEqual((True, 'd'), p.parse('d'))
+        self.assertEqual((True, '\u00e9'), p.parse('\u00e9'))
+        self.assertEqual((False, None), p.parse('b'))
+        self.assertEqual((False, None), p.parse(''))
+        self.assertEqual((True, '^'), parser.Char('^').parse('^'))
+        self.assertFalse(parser.Char('^').negated)
+        self.assertEqual((True, '-'), parser.Char('abc', negated=True).parse('-'))
+
+    def test_plain_strings(self):
+        # Without ranges=True every character is in the class, as it always was.
+        p = parser.Char('+-*')
+        for c in '+-*':
+            self.assertEqual((True, c), p.parse(c))
+        self.assertEqual((False, None), p.parse(','))
+        p = parser.Char('^a')
+        self.assertFalse(p.negated)
+        self.assertEqual((True, '^'), p.parse('^'))
+        self.assertEqual((False, None), p.parse('b'))
+        self.assertEqual(set('a-c'), parser.Char('a-c').chars)
+        self.assertEqual((False, None), parser.Char('a-c').parse('b'))
+        self.assertEqual((True, '\\'), parser.Char('\\-').parse('\\'))
+
+    def test_negated_action(self):
+        with self.assertRaises(ValueError):
+            parser.Char(whiskey.p[0], negated=True)
+
+    def test_parse_wide_ranges(self):
+        p = parser.Char('a\u00e0-\u00ff\u4e00-\u9fff', ranges=True)
+        for c in 'a\u00e0\u00e9\u00ff\u4e00\u6c34\u9fff':
+            self.assertEqual((True, c), p.parse(c))
+        for c in '\u00df\u0100\u4dff\ua000':
+            self.assertEqual((False, None), p.parse(c))
+
+    def test_parse_set(self):
+        p = parser.Char({'a', '-', 'c'})
+        self.assertEqual((True, '-'), p.parse('-'))
+        self.assertEqual((False, None), p.parse('b'))
+
+    def test_invalid_range(self):
+        with self.assertRaisesRegex(ValueError, 'Invalid character range z-a'):
+            parser.Char('z-a', ranges=True)
+
+    def test_merged_ranges(self):
+        self.assertEqual(((ord('a'), ord('f')),), parser.Char('a-cd-fb', ranges=True).ranges)
+
     def test_chars(self):
+        self.assertEqual(set('abcxyz'), parser.Char('a-cx-z', ranges=True).chars)
+        self.assertEqual({'a', 'b', 'c'}, parser.Char(b'abc').chars)
         self.assertEqual({'a', 'b', 'c'}, parser.Char('abc').chars)
         self.assertEqual(None, parser.Char().chars)
+        self.assertEqual(None, parser.Char('abc', negated=True).chars)
         a = TestAction()
         self.assertEqual(a, parser.Char(a).chars)
 
@@ -379,6 +724,12 @@ class StringTestCase(unittest.TestCase):
             self.assertEqual((False, None), p.parse(s))
             self.assertEqual(3, s.input.tell())
 
+    def test_parse_bytes(self):
+        p = parser.String(b'abc')
+        self.assertEqual((True, b'abc'), p.parse(b'abcdef'))
+        self.assertEqual((True, b'abc'), p.parse(memoryview(b'abcdef')))
+        self.assertEqual((False, None), p.parse(b'abd'))
+
     def test_string(self):
         self.assertEqual('abc', parser.String('abc').string)
 
@@ -392,8 +743,43 @@ class AggregateParserTestCase(unittest.TestCase):
         self.assertEqual((p1, p2, p3), parser.AggregateParser(p1, p2, p3).parsers)
 
 
+class CountingAttrType(parser.Parser):
+    """Parser matching one character that counts how often its attribute type is asked for."""
+
+    def __init__(self, attr_type):
+        self.__attr_type = attr_type
+        self.count = 0
+
+    @property
+    def attr_type(self):
+        self.count += 1
+        return self.__attr_type
+
+    def _parse(self, state):
+        c = state.read(1)
+        if c:
+            state.commit(c if self.__attr_type != parser.AttrType.UNUSED else parser.UNUSED)
+
+
 class SeqTestCase(unittest.TestCase):
 
+    def test_attr_types_planned_once(self):
+        used = CountingAttrType(parser.AttrType.STRING)
+        unused = CountingAttrType(parser.AttrType.UNUSED)
+        p = parser.Seq(used, unused, used)
+        for _ in range(3):
+            self.assertEqual((True, ('a', 'c')), p.parse('abc'))
+        self.assertEqual((2, 1), (used.count, unused.count))
+
+    def test_single_value(self):
+        p = parser.Seq(parser.lit('<'), parser.Char('a'), parser.lit('>'))
+        self.assertEqual((True, 'a'), p.parse('<a>'))
+        self.assertEqual((False, None), p.parse('<a'))
+
+    def test_unused(self):
+        p = parser.Seq(parser.lit('<'), parser.lit('>'))
+        self.assertEqual((True, parser.UNUSED), p.parse('<>'))
+
     def test_parse(self):
         p = parser.Seq(parser.Char('abc'),
                        parser.Char('def'),
@@ -612,6 +998,42 @@ class SemanticActionTestCase(unittest.TestCase):
         p = (parser.Char('a') << parser.Char('b'))[lambda a, b: a.upper() + b]
         self.assertEqual((True, 'Ab'), p.parse('ab'))
 
+    def test_parse_builtin(self):
+        p = parser.as_string[+parser.Char('0-9', ranges=True)][int]
+        self.assertEqual((True, 12), p.parse('12'))
+
+    def test_signature_cached(self):
+        p = parser.Char('abc')[lambda v: v + v]
+        self.assertEqual((True, 'aa'), p.parse('a'))
+        self.assertEqual((True, 'bb'), p.parse('b'))
+        self.assertIn('_cached___signature', vars(p))
+
+    def test_import_defers_inspect(self):
+        script = 'import sys, booze.gin; print("inspect" in sys.modules)'
+        output = subprocess.run([sys.executable, '-c', script], check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        self.assertEqual('False', output.strip())
+
+    def test_import_defers_features(self):
+        script = ('import sys, booze.gin; print(sorted(m for m in sys.modules if m in {}))'
+                  .format(['booze.gin.' + m for m in booze.gin._LAZY_NAMES]))
+        output = subprocess.run([sys.executable, '-c', script], check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        self.assertEqual('[]', output.strip())
+
+    def test_lazy_names(self):
+        for module_name, names in booze.gin._LAZY_NAMES.items():
+            module = getattr(booze.gin, module_name)
+            public = {name for name, value in vars(module).items()
+                      if not name.startswith('_') and getattr(value, '__module__', module.__name__) == module.__name__
+                      and not isinstance(value, type(module))}
+            self.assertEqual(public, set(names), module_name)
+            for name in names:
+                self.assertIs(getattr(module, name), getattr(booze.gin, name))
+        self.assertIn('optimized', dir(booze.gin))
+        with self.assertRaises(AttributeError):
+            booze.gin.not_a_name
+
     def test_func(self):
         def f(v): return v + v
         p = parser.SemanticAction(parser.Char('abc'), f)
@@ -623,13 +1045,110 @@ class SemanticActionTestCase(unittest.TestCase):
         self.assertEqual(parser.AttrType.STRING, p.attr_type)
 
 
+class DeferredTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+        def build(*values):
+            self.calls.append(values)
+            return ''.join(values).upper()
+        self.build = parser.deferred(build)
+
+    def test_parse(self):
+        p = parser.Char('abc')[self.build]
+        self.assertEqual((True, 'B'), p.parse('b'))
+        self.assertEqual([('b',)], self.calls)
+
+    def test_parse_fail(self):
+        p = parser.Char('abc')[self.build] << 'x'
+        self.assertEqual((False, None), p.parse('by'))
+        self.assertEqual([], self.calls)
+
+    def test_abandoned_alternative(self):
+        p = (parser.Char('abc')[self.build] << 'x') | (parser.Char('abc')[self.build] << 'y')
+        self.assertEqual((True, 'B'), p.parse('by'))
+        self.assertEqual([('b',)], self.calls)
+
+    def test_nested(self):
+        p = (parser.Char('a')[self.build] << parser.Char('b'))[self.build]
+        self.assertEqual((True, 'AB'), p.parse('ab'))
+        self.assertEqual([('a',), ('A', 'b')], self.calls)
+
+    def test_repeat(self):
+        p = +parser.Char('abc')[self.build]
+        self.assertEqual((True, ('A', 'B', 'C')), p.parse('abc'))
+        self.assertEqual([('a',), ('b',), ('c',)], self.calls)
+
+    def test_immediate_action_resolves_arguments(self):
+        p = parser.Char('abc')[self.build][lambda v: v * 2]
+        self.assertEqual((True, 'BB'), p.parse('b'))
+        self.assertEqual([('b',)], self.calls)
+
+    def test_resolve(self):
+        p = parser.resolve[parser.Char('abc')[self.build]]
+        s = parser.ParserState('b')
+        with s.open_transaction():
+            self.assertEqual((True, 'B'), p.parse(s))
+        self.assertEqual([('b',)], self.calls)
+
+    def test_unresolved_inside_transaction(self):
+        p = parser.Char('abc')[self.build]
+        s = parser.ParserState('b')
+        with s.open_transaction():
+            status, value = p.parse(s)
+            self.assertTrue(status)
+            self.assertIsInstance(value, parser.Pending)
+        self.assertEqual([], self.calls)
+
+    def test_pending_resolves_once(self):
+        pending = parser.Pending(lambda v: self.calls.append(v) or v, ('a',), {})
+        self.assertEqual('a', pending.resolve())
+        self.assertEqual('a', pending.resolve())
+        self.assertEqual(['a'], self.calls)
+
+    def test_recognize(self):
+        p = parser.Char('abc')[self.build]
+        self.assertEqual((True, 1), p.recognize('b'))
+        self.assertEqual([], self.calls)
+
+    def test_as_string(self):
+        p = parser.as_string[parser.Char('a')[self.build] << parser.Char('b')]
+        self.assertEqual((True, 'Ab'), p.parse('ab'))
+        self.assertEqual((True, 'AbA'), parser.as_string[p << parser.Char('a')[self.build]].parse('aba'))
+
+    def test_as_string_abandoned(self):
+        p = (parser.as_string[parser.Char('a')[self.build] << 'b'] << 'x') | parser.String('ab')
+        self.assertEqual((True, 'ab'), p.parse('ab'))
+        self.assertEqual([], self.calls)
+
+    def test_lexeme(self):
+        p = parser.lexeme[parser.Char('a')[self.build] << parser.Char('b')]
+        self.assertEqual((True, 'Ab'), p.parse('ab'))
+
+    def test_invoke_resolves(self):
+        state = parser.ParserState('A')
+        state.scope = local_vars.LocalScope(parser.Pending(str.upper, ('a',), {}))
+        state.deferred = True
+        self.assertEqual('A', state.invoke(whiskey.p[0]))
+        self.assertEqual((True, 'A'), parser.String(whiskey.p[0]).parse(state))
+
+
 class SymbolsTestCase(unittest.TestCase):
 
+    def test_deferred(self):
+        with self.assertRaises(TypeError):
+            parser.Symbols({'a': parser.deferred(str)})
+
     def test_parse(self):
         symbols = parser.Symbols({'animal': 1, 'book': 2})
         self.assertEqual((True, 1), symbols.parse('animal'))
         self.assertEqual((True, 2), symbols.parse('book'))
 
+    def test_parse_bytes(self):
+        symbols = parser.Symbols({b'animal': 1, b'book': 2})
+        self.assertEqual((True, 2), symbols.parse(b'book'))
+
     def test_parse_fail(self):
         symbols = parser.Symbols({'animal': 1, 'book': 2})
         s = io.StringIO('planet')
@@ -814,6 +1333,19 @@ class PostDirectiveTestCase(unittest.TestCase):
 
 class RepeatTestCase(unittest.TestCase):
 
+    def test_attr_type_planned_once(self):
+        item = CountingAttrType(parser.AttrType.STRING)
+        p = parser.Repeat()[item]
+        for _ in range(3):
+            self.assertEqual((True, ('a', 'b')), p.parse('ab'))
+        self.assertEqual(1, item.count)
+
+    def test_unused_items(self):
+        p = parser.Repeat(2)[parser.lit('a')]
+        self.assertEqual((True, parser.UNUSED), p.parse('aaa'))
+        self.assertEqual((False, None), p.parse('a'))
+        self.assertEqual((True, parser.UNUSED), (-parser.lit('a')).parse('a'))
+
     def test_parse_zero_or_more(self):
         p = parser.Repeat()[parser.Char('abc')]
         s = io.StringIO('abcabcdef')
@@ -891,10 +1423,84 @@ class RepeatTestCase(unittest.TestCase):
     def test_attr_type_opt_optimization(self):
         self.assertEqual(parser.AttrType.STRING, (-parser.String('a')).attr_type)
 
+    def test_parse_run(self):
+        p = parser.Repeat(2, 4)[parser.Char('a-c', ranges=True)]
+        for text, expected, position in (('abcabc', (True, tuple('abca')), 4),
+                                         ('abd', (True, tuple('ab')), 2),
+                                         ('ad', (False, None), 0),
+                                         ('', (False, None), 0)):
+            state = parser.ParserState(text)
+            self.assertEqual(expected, p.parse(state))
+            self.assertEqual(position, state.input.tell())
+            self.assertEqual(expected, p.parse(io.StringIO(text)))
+
+    def test_parse_run_bytes(self):
+        self.assertEqual((True, (b'a', b'b')), (+parser.Char('a-c', ranges=True)).parse(b'abd'))
+        self.assertEqual((True, (b'\xe9',)), (+parser.Char('a-c', negated=True, ranges=True)).parse(b'\xe9a'))
+        self.assertEqual((True, b'a'), (-parser.Char('a')).parse(memoryview(b'ab')))
+
+    def test_parse_run_optional(self):
+        self.assertEqual((True, 'a'), (-parser.Char('a')).parse('aa'))
+        self.assertEqual((True, parser.UNUSED), (-parser.Char('a')).parse('b'))
+
+    def test_parse_run_any(self):
+        self.assertEqual((True, tuple('a\nb')), (+parser.Char()).parse('a\nb'))
+
+    def test_parse_run_action(self):
+        p = +parser.Char(whiskey.p[0])
+        s = parser.ParserState('abcd')
+        with s.open_scope('ab'):
+            self.assertEqual((True, ('a', 'b')), p.parse(s))
+
     def test_value_opt_optimization(self):
         self.assertEqual((True, 'a'), (-parser.String('a')).parse('a'))
         self.assertEqual((True, parser.UNUSED), (-parser.String('a')).parse('b'))
 
+    def test_empty_below_minimum(self):
+        unused = (parser.UNUSED, parser.UNUSED)
+        self.assertEqual((True, unused), parser.Repeat(2, 2)[-parser.Char('x')].parse(''))
+        self.assertEqual((True, unused), parser.Repeat(2, 2)[-parser.String('x')].parse('y'))
+        self.assertEqual((True, ('x', parser.UNUSED, parser.UNUSED)),
+                         parser.Repeat(3)[-parser.String('x')].parse('xy'))
+        self.assertEqual((True, parser.UNUSED), parser.Repeat(2, 2)[aux.eps].parse(''))
+
+
+class ListTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = parser.String('ab') % ','
+
+    def test_parse(self):
+        s = io.StringIO('ab,ab , ab,')
+        self.assertEqual((True, ('ab', 'ab', 'ab')), self.parser.parse(s, ' '))
+        self.assertEqual(10, s.tell())
+
+    def test_parse_one(self):
+        s = io.StringIO('ab,ac')
+        self.assertEqual((True, ('ab',)), self.parser.parse(s))
+        self.assertEqual(2, s.tell())
+
+    def test_parse_fail(self):
+        s = io.StringIO(',ab')
+        self.assertEqual((False, None), self.parser.parse(s))
+        self.assertEqual(0, s.tell())
+
+    def test_tuple_items(self):
+        p = (parser.Char('a') << parser.Char('b')) % parser.String(';')
+        self.assertEqual((True, (('a', 'b'), ('a', 'b'))), p.parse('ab;ab'))
+
+    def test_unused(self):
+        p = parser.lit('a') % ','
+        self.assertEqual(parser.AttrType.UNUSED, p.attr_type)
+        self.assertEqual((True, parser.UNUSED), p.parse('a,a'))
+
+    def test_attr_type(self):
+        self.assertEqual(parser.AttrType.TUPLE, self.parser.attr_type)
+
+    def test_properties(self):
+        self.assertIsInstance(self.parser.item, parser.String)
+        self.assertEqual(parser.AttrType.UNUSED, self.parser.separator.attr_type)
+
 
 class OmitTestCase(unittest.TestCase):
 
@@ -935,6 +1541,11 @@ class AsStringTestCase(unittest.TestCase):
         s = io.StringIO('aaaa')
         self.assertEqual((True, 'aaaa'), p.parse(s))
 
+    def test_parse_bytes(self):
+        p = parser.as_string[b'<' << +parser.Char('a') << -parser.String(b'b') << b'>']
+        self.assertEqual((True, b'aab'), p.parse(b'<aab>'))
+        self.assertEqual((True, b'a'), p.parse(b'<a>'))
+
     def test_parse_tuple_recursive(self):
         p = parser.as_string[+parser.Char('a') << +parser.Char('b')]
         s = io.StringIO('aaaabbbb')
@@ -999,6 +1610,98 @@ class LexemeTestCase(unittest.TestCase):
         self.assertEqual(parser.AttrType.STRING, parser.lexeme[parser.Char('a')].attr_type)
         self.assertEqual(parser.AttrType.STRING, parser.lexeme[parser.lit('a')].attr_type)
 
+    def test_verbatim_uses_raw(self):
+        p = parser.lexeme[+parser.Char('a-z', ranges=True) << parser.Char('0-9', ranges=True)]
+        self.assertIsInstance(p.parser.parser, parser.Raw.__parser_type__)
+        self.assertNotIsInstance(self.parser.parser.parser, parser.Raw.__parser_type__)
+
+    def test_parse_bytes(self):
+        p = parser.lexeme[+parser.Char('a-z', ranges=True) << parser.Char('0-9', ranges=True)]
+        self.assertEqual((True, b'tag1'), p.parse(b' tag1', ' '))
+
+    def test_parse_stream(self):
+        self.assertEqual((True, 'tag'), parser.lexeme[+parser.Char('a-z', ranges=True)].parse(io.StringIO(' tag '), ' '))
+
+    def test_parse_omitted(self):
+        p = parser.lexeme['<' << +parser.Char('a-z', ranges=True) << '>']
+        self.assertEqual((True, 'tag'), p.parse('<tag>'))
+
+    def test_parse_action(self):
+        p = parser.lexeme[+parser.Char('a-z', ranges=True)[lambda c: c.upper()]]
+        self.assertEqual((True, 'TAG'), p.parse('tag'))
+
+
+class RawTestCase(unittest.TestCase):
+
+    def test_parse(self):
+        p = parser.raw[+parser.Char('a-z', ranges=True) << parser.lit(':') << +parser.Char('0-9', ranges=True)]
+        s = parser.ParserState('key:42 rest')
+        self.assertEqual((True, 'key:42'), p.parse(s))
+        self.assertEqual(6, s.input.tell())
+
+    def test_parse_fail(self):
+        p = parser.raw[+parser.Char('a-z', ranges=True) << parser.lit(':')]
+        s = io.StringIO('key')
+        self.assertEqual((False, None), p.parse(s))
+        self.assertEqual(0, s.tell())
+
+    def test_skipper(self):
+        p = parser.raw[+parser.Char('a-z', ranges=True) << +parser.Char('0-9', ranges=True)]
+        self.assertEqual((True, 'ab 12'), p.parse('  ab 12', ' '))
+
+    def test_parse_bytes(self):
+        data = bytearray(b'abc123')
+        status, value = parser.raw[+parser.Char('a-z', ranges=True)].parse(data)
+        self.assertTrue(status)
+        self.assertIsInstance(value, memoryview)
+        self.assertEqual(b'abc', value)
+        data[0] = ord('x')
+        self.assertEqual(b'xbc', value)
+
+    def test_parse_stream(self):
+        p = parser.raw[+parser.Char('a-z', ranges=True)] << parser.Char('0-9', ranges=True)
+        s = io.StringIO('abc1')
+        self.assertEqual((True, ('abc', '1')), p.parse(s))
+        self.assertEqual(4, s.tell())
+
+    def test_actions(self):
+        values = []
+        p = parser.raw[+parser.Char('a-z', ranges=True)[values.append]]
+        self.assertEqual((True, 'ab'), p.parse('ab'))
+        self.assertEqual(['a', 'b'], values)
+
+    def test_recognize(self):
+        self.assertEqual((True, 2), parser.raw[+parser.Char('a-z', ranges=True)].recognize('ab1'))
+
+    def test_attr_type(self):
+        self.assertEqual(parser.AttrType.STRING, parser.raw[parser.lit('a')].attr_type)
+        self.assertEqual(parser.AttrType.OBJECT, parser.span[parser.lit('a')].attr_type)
+
+
+class SpanTestCase(unittest.TestCase):
+
+    def test_parse(self):
+        p = parser.lit('x') << parser.span[+parser.Char('a-z', ranges=True)]
+        status, value = p.parse('xabc1')
+        self.assertTrue(status)
+        self.assertEqual((1, 4, 3), (value.start, value.end, len(value)))
+        self.assertEqual('abc', value.value)
+
+    def test_parse_stream(self):
+        p = parser.lit('x') << parser.span[+parser.Char('a-z', ranges=True)]
+        status, value = p.parse(io.StringIO('xabc1'))
+        self.assertEqual((1, 4, 'abc'), (value.start, value.end, value.value))
+
+    def test_parse_bytes(self):
+        status, value = parser.span[+parser.Char('a-z', ranges=True)].parse(b'abc1')
+        self.assertIsInstance(value.value, memoryview)
+        self.assertEqual(b'abc', value.value)
+
+    def test_eq(self):
+        self.assertEqual(parser.Span('abc', 1, 2), parser.Span('xb', 1, 2, 0))
+        self.assertEqual(parser.Span('abc', 1, 2), parser.Span('b', 1, 2, 1))
+        self.assertNotEqual(parser.Span('abc', 1, 2), parser.Span('abc', 1, 3))
+
 
 class PredicateTestCase(unittest.TestCase):
 
@@ -1042,5 +1745,133 @@ class NotPredicateTestCase(unittest.TestCase):
         self.assertEqual(0, s.tell())
 
 
+class FreezeTestCase(unittest.TestCase):
+
+    def test_freeze(self):
+        a = parser.Char('a')
+        p = (a << parser.String('b'))[lambda x, y: x + y] | a
+        self.assertIs(p, parser.freeze(p))
+        self.assertTrue(p.frozen)
+        self.assertTrue(a.frozen)
+        self.assertIn('_cached_attr_type', vars(p))
+        self.assertEqual((True, 'ab'), p.parse('ab'))
+
+    def test_changes_refused(self):
+        a = parser.freeze(parser.Char('a'))
+        with self.assertRaises(parser.FrozenGrammarError):
+            a.x = 1
+        with self.assertRaises(AttributeError):
+            del a._cached__str_pattern
+
+    def test_large_class(self):
+        c = parser.freeze(parser.Char('\x00-\U0010ffff', ranges=True))
+        self.assertFalse([name for name in vars(c) if 'chars' in name])
+        self.assertEqual((True, '\U0010ffff'), c.parse('\U0010ffff'))
+
+    def test_with_children(self):
+        p = parser.freeze(parser.Char('a') << parser.Char('b'))
+        copy = p.with_children((parser.Char('c'), parser.Char('d')))
+        self.assertFalse(copy.frozen)
+        self.assertEqual((True, ('c', 'd')), copy.parse('cd'))
+        self.assertEqual((True, ('a', 'b')), p.parse('ab'))
+
+    def test_pickle(self):
+        p = pickle.loads(pickle.dumps(parser.freeze(parser.Char('a') << parser.Char('b'))))
+        self.assertTrue(p.frozen)
+        self.assertEqual((True, ('a', 'b')), p.parse('ab'))
+
+
+class LimitsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Parses each nested group twice before giving up on it, so takes
+        # exponential time on a run of a's.
+        a = parser.Char('a')
+        self.slow = a
+        for _ in range(30):
+            self.slow = (a << self.slow << 'b') | (a << self.slow << 'c') | a
+
+    def test_within_limits(self):
+        p = +parser.Char('a')
+        state = parser.ParserState('aaa', limits=parser.Limits(steps=10))
+        self.assertEqual((True, ('a', 'a', 'a')), p.parse(state))
+        self.assertEqual(1, state.steps)
+        self.assertEqual((True, 'a'), (parser.Char('a') << 'b').parse('ab', limits=parser.Limits(steps=3)))
+
+    def test_steps(self):
+        p = parser.Char('a') << parser.Char('b') << parser.Char('c')
+        with self.assertRaises(parser.StepLimitExceeded) as raised:
+            p.parse('abc', limits=parser.Limits(steps=3))
+        self.assertEqual(2, raised.exception.position)
+        self.assertEqual('Step limit exceeded at position 2', str(raised.exception))
+
+    def test_steps_backtracking(self):
+        with self.assertRaises(parser.StepLimitExceeded):
+            self.slow.parse('a' * 30, limits=parser.Limits(steps=10000))
+
+    def test_recognize(self):
+        with self.assertRaises(parser.StepLimitExceeded):
+            self.slow.recognize('a' * 30, limits=parser.Limits(steps=10000))
+
+    def test_timeout(self):
+        start = time.monotonic()
+        with self.assertRaises(parser.DeadlineExceeded) as raised:
+            self.slow.parse('a' * 30, limits=parser.Limits(timeout=0.05))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertGreater(raised.exception.position, 0)
+
+    def test_deadline(self):
+        limits = parser.Limits(deadline=time.monotonic() - 1, check_interval=1)
+        with self.assertRaises(parser.DeadlineExceeded):
+            parser.Char('a').parse('a', limits=limits)
+
+    def test_cancel(self):
+        token = parser.CancellationToken()
+        limits = parser.Limits(cancel=token)
+        self.assertEqual((True, 'a'), parser.Char('a').parse('a', limits=limits))
+        timer = threading.Timer(0.05, token.cancel)
+        timer.start()
+        try:
+            with self.assertRaises(parser.ParseCancelled):
+                self.slow.parse('a' * 30, limits=limits)
+        finally:
+            timer.cancel()
+        self.assertTrue(token.cancelled)
+
+    def test_empty_repeat(self):
+        limits = parser.Limits(steps=1000, timeout=1)
+        self.assertEqual((True, parser.UNUSED), parser.Repeat()[aux.eps].parse('', limits=limits))
+        self.assertEqual((True, parser.UNUSED), parser.Repeat()[aux.eps].parse('b'))
+        self.assertEqual((True, ('a',)), (+(parser.String('a') | parser.String(''))).parse('ab'))
+        self.assertEqual((True, ('',)), (+(parser.String('a') | parser.String(''))).parse('b'))
+
+    def test_repeat_steps(self):
+        state = parser.ParserState('aaa', limits=parser.Limits(steps=10))
+        self.assertEqual((True, ('a', 'a', 'a')), (+parser.String('a')).parse(state))
+        # One for the repeat and one for each iteration, including the last that fails.
+        self.assertEqual(5, state.steps)
+
+    def test_empty_list(self):
+        p = parser.List(-parser.String('a'), -parser.String(','))
+        self.assertEqual((True, ('a', 'a')), p.parse('a,ab'))
+
+    def test_limits_reused(self):
+        limits = parser.Limits(steps=5)
+        p = parser.Char('a') << parser.Char('b')
+        for _ in range(3):
+            self.assertEqual((True, ('a', 'b')), p.parse('ab', limits=limits))
+
+    def test_state_and_limits(self):
+        state = parser.ParserState('a')
+        self.assertRaises(TypeError, parser.Char('a').parse, state, limits=parser.Limits(steps=1))
+        state = parser.ParserState('a', recognize=True)
+        self.assertRaises(TypeError, parser.Char('a').recognize, state, limits=parser.Limits(steps=1))
+
+    def test_pickle(self):
+        error = pickle.loads(pickle.dumps(parser.DeadlineExceeded(5)))
+        self.assertIsInstance(error, parser.DeadlineExceeded)
+        self.assertEqual(5, error.position)
+
+
 if __name__ == '__main__':
     unittest.main()
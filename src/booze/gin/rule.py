@@ -11,13 +11,16 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from . import local_vars
 from . import parser
+from .. import util
 
 
 class Rule(parser.Parser):
 
-    def __init__(self, expected_attr_type=None):
+    def __init__(self, expected_attr_type=None, name=None):
         self.__expected_attr_type = expected_attr_type
+        self.__name = name
 
     @property
     def attr_type(self):
@@ -31,6 +34,18 @@ class Rule(parser.Parser):
             else:
                 return inner_parser.attr_type
 
+    @property
+    def expected_attr_type(self):
+        return self.__expected_attr_type
+
+    @property
+    def name(self):
+        return self.__name
+
+    @name.setter
+    def name(self, value):
+        self.__name = value
+
     @property
     def parser(self):
         return self.__parser
@@ -40,10 +55,55 @@ class Rule(parser.Parser):
         if self.__expected_attr_type and self.__expected_attr_type != value.attr_type:
             raise ValueError('Unexpected attribute type')
         self.__parser = parser.as_parser(value)
+        vars(self).pop('_cached___framed', None)
+
+    @property
+    def uses_scope(self):
+        # Rules open their own scope when they need one.
+        return False
+
+    @util.calculated_property
+    def __framed(self):
+        try:
+            body = self.__parser
+        except AttributeError:
+            return False
+        return body.uses_scope
+
+    def _freeze(self):
+        try:
+            body = self.__parser
+        except AttributeError:
+            return super(Rule, self)._freeze()
+        super(Rule, self)._freeze()
+        return (body,)
 
     def _parse(self, state, *args, **kwargs):
-        with state.open_scope(*args, **kwargs):
+        if state.limits is not None:
+            state.step()
+        if state.profiler is not None:
+            state.profiler.call(self, self.__parse_memo, state, *args, **kwargs)
+        else:
+            self.__parse_memo(state, *args, **kwargs)
+
+    def __parse_memo(self, state, *args, **kwargs):
+        memo = state.memo
+        if memo is not None and not args and not kwargs:
+            memo.parse(state, self, self.__parse_body)
+        else:
+            self.__parse_body(state, *args, **kwargs)
+
+    def __parse_body(self, state, *args, **kwargs):
+        if not (self.__framed or args or kwargs):
+            # Nothing in the rule reads its scope, so none is opened.
+            self.__parser._parse(state)
+            return
+        scope = state.scope
+        state.scope = local_vars.LocalScope(*args, **kwargs)
+        try:
             self.__parser._parse(state)
+        finally:
+            state.scope = scope
 
     def __imod__(self, other):
         self.parser = other
@@ -53,6 +113,13 @@ class Rule(parser.Parser):
         return RuleCall(self, *args, **kwargs)
 
 
+def name_rules(namespace):
+    """Name each unnamed rule in namespace, such as globals(), after its key."""
+    for name, value in namespace.items():
+        if isinstance(value, Rule) and value.name is None:
+            value.name = name
+
+
 class RuleCall(parser.Unary):
 
     def __init__(self, rule, *args, **kwargs):
@@ -70,6 +137,11 @@ class RuleCall(parser.Unary):
     def kwargs(self):
         return dict(self.__kwargs)
 
+    @property
+    def uses_scope(self):
+        return (any(local_vars.uses_scope(a) for a in self.__args)
+                or any(local_vars.uses_scope(v) for v in self.__kwargs.values()))
+
     def _parse(self, state):
         args = [state.invoke(a) for a in self.__args]
         kwargs = {k: state.invoke(v) for k, v in self.__kwargs.items()}
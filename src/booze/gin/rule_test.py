@@ -12,10 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
+import sys
+import threading
 import unittest
 
 import booze.gin
 from booze import whiskey
+from booze.gin import local_vars
+from booze.gin import optimize
 from booze.gin import parser
 from booze.gin import rule
 
@@ -32,6 +37,18 @@ class RuleTestCase(unittest.TestCase):
         r %= 'hello'
         self.assertEqual((True, parser.UNUSED), r.parse('hello'))
 
+    def test_name(self):
+        self.assertIsNone(rule.Rule().name)
+        self.assertEqual('greeting', rule.Rule(name='greeting').name)
+
+    def test_name_rules(self):
+        greeting = rule.Rule()
+        named = rule.Rule(name='kept')
+        namespace = {'greeting': greeting, 'other': named, 'value': 1}
+        rule.name_rules(namespace)
+        self.assertEqual('greeting', greeting.name)
+        self.assertEqual('kept', named.name)
+
     def test_set_parser(self):
         p = parser.Parser()
         r = rule.Rule()
@@ -69,12 +86,68 @@ class RuleTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             r %= p
 
+    def test_frameless(self):
+        scopes = []
+        r = rule.Rule()
+        r %= parser.Char('a') << parser.predicate[parser.Char('a')[lambda c: scopes.append(c)]]
+        self.assertFalse(r.parser.uses_scope)
+        s = parser.ParserState('aa')
+        self.assertEqual((True, 'a'), r.parse(s))
+        self.assertIsNone(s.scope)
+
+    def test_framed_by_vars_action(self):
+        r = rule.Rule()
+        r %= parser.Char('a')[local_vars.l.c[whiskey.p[0]]] << parser.String(local_vars.l.c)
+        self.assertTrue(r.parser.uses_scope)
+        self.assertEqual((True, ('a', 'a')), r.parse('aa'))
+        self.assertEqual((False, None), r.parse('ab'))
+
+    def test_framed_by_vars_parameter(self):
+        r = rule.Rule()
+        r %= parser.Char('a')[lambda c, vars: str(vars)]
+        self.assertTrue(r.parser.uses_scope)
+        self.assertEqual((True, '<Vars>'), r.parse('a'))
+
+    def test_frameless_rule_inside_framed(self):
+        inner = rule.Rule()
+        inner %= parser.Char('b')
+        outer = rule.Rule()
+        outer %= parser.Char('a')[local_vars.l.c[whiskey.p[0]]] << inner << parser.String(local_vars.l.c)
+        self.assertEqual((True, ('a', 'b', 'a')), outer.parse('aba'))
+
+    def test_reassigned(self):
+        r = rule.Rule()
+        r %= parser.Char('a')
+        self.assertEqual((True, 'a'), r.parse('a'))
+        r %= parser.Char('a')[local_vars.l.c[whiskey.p[0]]] << parser.String(local_vars.l.c)
+        self.assertEqual((True, ('a', 'a')), r.parse('aa'))
+
+    def test_uses_scope(self):
+        self.assertFalse(rule.Rule().uses_scope)
+
     def test_call(self):
         rule_call = rule.Rule()(1, 2, 3, a='a', b='b', c='c')
         self.assertIsInstance(rule_call, rule.RuleCall)
         self.assertSequenceEqual((1, 2, 3), rule_call.args)
         self.assertDictEqual({'a': 'a', 'b': 'b', 'c': 'c'}, rule_call.kwargs)
 
+    def test_repeat_optional_rule(self):
+        r = rule.Rule()
+        r %= -parser.Char('a')
+        limits = parser.Limits(steps=1000, timeout=1)
+        self.assertEqual((True, ()), parser.Repeat()[r].parse('b', limits=limits))
+        self.assertEqual((True, ('a', 'a')), parser.Repeat()[r].parse('aab'))
+        self.assertEqual((True, (parser.UNUSED, parser.UNUSED)), parser.Repeat(2, 2)[r].parse('b'))
+
+    def test_steps(self):
+        r = rule.Rule()
+        r %= parser.Char('a')
+        p = parser.Seq(r, r, r)
+        state = parser.ParserState('aaa', limits=parser.Limits(steps=100))
+        self.assertEqual((True, ('a', 'a', 'a')), p.parse(state))
+        # One for the sequence and two for each rule, as it is parsed and as it runs its body.
+        self.assertEqual(7, state.steps)
+
 
 class RuleCallTestCase(unittest.TestCase):
 
@@ -117,5 +190,91 @@ class RuleCallTestCase(unittest.TestCase):
         self.rule_call.kwargs['a'] = 'd'
         self.assertSequenceEqual({'a': 'a', 'b': 'b', 'c': 'c'}, self.rule_call.kwargs)
 
+    def test_uses_scope(self):
+        self.assertFalse(self.rule_call.uses_scope)
+        self.assertTrue(self.rule(whiskey.p[0]).uses_scope)
+        self.assertTrue(self.rule(a=local_vars.l.a).uses_scope)
+
+
+class FreezeTestCase(unittest.TestCase):
+
+    @staticmethod
+    def grammar():
+        """Nested lists of numbers, summed by deferred and immediate actions."""
+        number = parser.as_string[+parser.Char('0-9', ranges=True)][int]
+        item = rule.Rule(parser.AttrType.OBJECT)
+        group = rule.Rule()
+        close = rule.Rule()
+        close %= parser.String(whiskey.p[0])
+        group %= ((parser.Char('([')[local_vars.l.open[whiskey.p[0]]]
+                   << parser.Repeat()[item]
+                   << close(whiskey.func({'(': ')', '[': ']'}.get)(local_vars.l.open)))
+                  [parser.deferred(lambda _, items, _close: sum(items))])
+        item %= number | group
+        return item
+
+    def test_freeze(self):
+        r = rule.Rule()
+        r %= parser.Char('a')
+        parser.freeze(r << r)
+        self.assertTrue(r.frozen)
+        with self.assertRaises(parser.FrozenGrammarError):
+            r %= parser.Char('b')
+        self.assertEqual((True, 'a'), r.parse('a'))
+
+    def test_undefined(self):
+        r = rule.Rule()
+        parser.freeze(r)
+        self.assertTrue(r.frozen)
+
+    def test_untyped_recursion(self):
+        r = rule.Rule()
+        r %= (parser.Char('a') << r) | parser.Char('b')
+        parser.freeze(r)
+        self.assertEqual((True, 3), r.recognize('aab'))
+
+    def test_recognize_scope(self):
+        calls = []
+        close = rule.Rule()
+        close %= parser.omit['</' << parser.String(whiskey.p[0]) << '>']
+        name = parser.as_string[+parser.Char('a-z', ranges=True)]
+        element = rule.Rule()
+        element %= (('<' << name[local_vars.l.name[whiskey.p[0]]] << '>' << -+element
+                     << close(local_vars.l.name))[lambda *values: calls.append(values)])
+        self.assertEqual((True, 16), element.recognize('<a><bc></bc></a>x'))
+        self.assertEqual((False, None), element.recognize('<a><bc></b></a>'))
+        self.assertEqual([], calls)
+
+        r = rule.Rule()
+        r %= ((('a' << parser.Char('bc'))[local_vars.l.x[whiskey.p[0]]]
+               | ('a' << parser.Char('d'))[local_vars.l.x[whiskey.p[0]]])
+              << parser.String(local_vars.l.x))
+        for grammar in (r, optimize.left_factor(r)):
+            self.assertEqual((True, 3), grammar.recognize('abb'))
+            self.assertEqual((True, 3), grammar.recognize('add'))
+            self.assertEqual((False, None), grammar.recognize('abc'))
+
+    def test_concurrent_parses(self):
+        texts = ['[1 (2 3) [4 [5 6]] 7]', '(1 2', '[(1)(2)]', '12', '[1 2)', '([([([1])])])']
+        expected = [self.grammar().parse(text, ' ') for text in texts]
+        grammar = parser.freeze(self.grammar())
+        start = threading.Barrier(8)
+
+        def parse_all(_):
+            start.wait()
+            return [[grammar.parse(text, ' ') for text in texts] for _ in range(25)]
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(parse_all, range(8)))
+        finally:
+            sys.setswitchinterval(interval)
+        for thread_results in results:
+            for parsed in thread_results:
+                self.assertEqual(expected, parsed)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,249 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import array
+
+from . import parser
+
+
+class TreeBuilder:
+    """Collects nodes matched by node[] directives in to array columns.
+
+    Nodes are added as they complete, so children always precede their parent.
+    Nodes added inside a transaction that is not committed are truncated
+    away with it.
+    """
+
+    def __init__(self):
+        self.__kind_ids = {}
+        self.__kinds = []
+        self.__kind = array.array('i')
+        self.__parent = array.array('i')
+        self.__first_child = array.array('i')
+        self.__next_sibling = array.array('i')
+        self.__start = array.array('q')
+        self.__end = array.array('q')
+        # Index of the first node in the subtree of each node.
+        self.__first = array.array('i')
+
+    @property
+    def size(self):
+        return len(self.__kind)
+
+    def truncate(self, size):
+        if size < len(self.__kind):
+            for column in (self.__kind, self.__parent, self.__first_child,
+                           self.__next_sibling, self.__start, self.__end, self.__first):
+                del column[size:]
+
+    def __link(self, parent, mark):
+        """Link the unparented nodes from mark onwards as children of parent."""
+        next_sibling = -1
+        index = len(self.__kind) - 1
+        while index >= mark:
+            self.__parent[index] = parent
+            self.__next_sibling[index] = next_sibling
+            next_sibling = index
+            index = self.__first[index] - 1
+        return next_sibling
+
+    def add(self, kind, start, end, mark):
+        """Add a node spanning start to end whose children were added from mark onwards."""
+        kind_id = self.__kind_ids.get(kind)
+        if kind_id is None:
+            kind_id = self.__kind_ids[kind] = len(self.__kinds)
+            self.__kinds.append(kind)
+        first_child = self.__link(len(self.__kind), mark)
+        self.__kind.append(kind_id)
+        self.__parent.append(-1)
+        self.__first_child.append(first_child)
+        self.__next_sibling.append(-1)
+        self.__start.append(start)
+        self.__end.append(end)
+        self.__first.append(mark)
+
+    def finish(self, source=None):
+        """Link the top level nodes and return the finished Tree."""
+        first_root = self.__link(-1, 0)
+        return Tree(tuple(self.__kinds), self.__kind, self.__parent, self.__first_child,
+                    self.__next_sibling, self.__start, self.__end, first_root, source)
+
+
+class Tree:
+    """Parse tree stored in parallel arrays, indexed by node.
+
+    Node indices are in post-order.  Missing parents, children and siblings
+    are stored as -1.
+    """
+
+    def __init__(self, kinds, kind, parent, first_child, next_sibling, start, end, first_root, source=None):
+        self.__kinds = kinds
+        self.__kind = kind
+        self.__parent = parent
+        self.__first_child = first_child
+        self.__next_sibling = next_sibling
+        self.__start = start
+        self.__end = end
+        self.__first_root = first_root
+        self.__source = source
+
+    @property
+    def kinds(self):
+        """Node kinds, indexed by kind id."""
+        return self.__kinds
+
+    @property
+    def kind(self):
+        return self.__kind
+
+    @property
+    def parent(self):
+        return self.__parent
+
+    @property
+    def first_child(self):
+        return self.__first_child
+
+    @property
+    def next_sibling(self):
+        return self.__next_sibling
+
+    @property
+    def start(self):
+        return self.__start
+
+    @property
+    def end(self):
+        return self.__end
+
+    @property
+    def source(self):
+        """Parsed str or memoryview, when available."""
+        return self.__source
+
+    def __len__(self):
+        return len(self.__kind)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError('Node index out of range')
+        return Node(self, index % len(self))
+
+    def __siblings(self, index):
+        next_sibling = self.__next_sibling
+        while index >= 0:
+            yield Node(self, index)
+            index = next_sibling[index]
+
+    @property
+    def roots(self):
+        """Top level nodes in input order."""
+        return self.__siblings(self.__first_root)
+
+    def children(self, index):
+        return self.__siblings(self.__first_child[index])
+
+
+class Node:
+    """View of a single node of a Tree."""
+
+    __slots__ = ('__tree', '__index')
+
+    def __init__(self, tree, index):
+        self.__tree = tree
+        self.__index = index
+
+    @property
+    def tree(self):
+        return self.__tree
+
+    @property
+    def index(self):
+        return self.__index
+
+    @property
+    def kind(self):
+        tree = self.__tree
+        return tree.kinds[tree.kind[self.__index]]
+
+    @property
+    def start(self):
+        return self.__tree.start[self.__index]
+
+    @property
+    def end(self):
+        return self.__tree.end[self.__index]
+
+    @property
+    def text(self):
+        source = self.__tree.source
+        if source is None:
+            raise ValueError('Tree was not parsed from a string or buffer')
+        return source[self.start:self.end]
+
+    @property
+    def parent(self):
+        parent = self.__tree.parent[self.__index]
+        return None if parent < 0 else Node(self.__tree, parent)
+
+    @property
+    def children(self):
+        return self.__tree.children(self.__index)
+
+    def __eq__(self, other):
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self.__tree is other.__tree and self.__index == other.__index
+
+    def __hash__(self):
+        return hash((id(self.__tree), self.__index))
+
+    def __repr__(self):
+        return 'Node({!r}, {}, {})'.format(self.kind, self.start, self.end)
+
+
+@parser.directive_class
+class node(parser.Unary):
+    """Adds a node of kind spanning the input matched by its parser to the tree being built."""
+
+    def __init__(self, child, kind):
+        super(node.__parser_type__, self).__init__(parser.as_parser(child))
+        self.__kind = kind
+
+    @property
+    def kind(self):
+        return self.__kind
+
+    def _parse(self, state):
+        builder = state.tree
+        if builder is None:
+            self.parser._parse(state)
+            return
+        start = state.input.tell()
+        mark = builder.size
+        self.parser._parse(state)
+        if state.successful:
+            builder.add(self.__kind, start, state.input.tell(), mark)
+
+
+def build_tree(grammar, parser_input, skipper=None, recognize=False):
+    """Parse input with grammar, returning the Tree of its node[] directives or None on failure.
+
+    With recognize=True the input is only recognized, so no attributes are
+    built and only the semantic actions that may set rule variables run.
+    """
+    builder = TreeBuilder()
+    state = parser.ParserState(parser_input, skipper, recognize=recognize, tree=builder)
+    status, _ = grammar.parse(state)
+    return builder.finish(state.text) if status else None
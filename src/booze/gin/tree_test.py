@@ -0,0 +1,114 @@
+# Copyright 2015 Rafe Kaplan
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import runpy
+import unittest
+
+from booze.gin import chars
+from booze.gin import memo
+from booze.gin import parser
+from booze.gin import rule
+from booze.gin import tree
+
+
+class BuildTreeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Nested lists of names, such as (a (b c) d).
+        self.item = rule.Rule(parser.AttrType.UNUSED)
+        name = tree.node('name')[parser.lexeme[+chars.alpha]]
+        group = tree.node('group')['(' << parser.Repeat()[self.item] << ')']
+        self.item %= parser.omit[name | group]
+
+    def test_build(self):
+        t = tree.build_tree(self.item, '(a (bc d) e)', ' ')
+        self.assertEqual(6, len(t))
+        self.assertEqual(('name', 'group'), t.kinds)
+        root, = t.roots
+        self.assertEqual(('group', 0, 12), (root.kind, root.start, root.end))
+        self.assertIsNone(root.parent)
+        self.assertEqual(['a', '(bc d)', 'e'], [child.text for child in root.children])
+        inner = list(root.children)[1]
+        self.assertEqual(['bc', 'd'], [child.text for child in inner.children])
+        self.assertEqual(root, inner.parent)
+
+    def test_post_order(self):
+        t = tree.build_tree(self.item, '(a (b))', ' ')
+        self.assertEqual(['name', 'name', 'group', 'group'], [t[i].kind for i in range(len(t))])
+        self.assertEqual([3, 2, 3, -1], list(t.parent))
+        self.assertEqual([-1, -1, 1, 0], list(t.first_child))
+        self.assertEqual([2, -1, -1, -1], list(t.next_sibling))
+
+    def test_abandoned_nodes_removed(self):
+        a = tree.node('a')[parser.Char('a')]
+        p = (a << parser.Char('x')) | (a << parser.Char('y'))
+        t = tree.build_tree(p, 'ay')
+        self.assertEqual(1, len(t))
+        self.assertEqual([(0, 1)], [(n.start, n.end) for n in t.roots])
+
+    def test_lookahead_nodes_removed(self):
+        a = tree.node('a')[parser.Char('a')]
+        t = tree.build_tree(parser.predicate[a] << a, 'a')
+        self.assertEqual(1, len(t))
+
+    def test_simplexml(self):
+        path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'examples', 'simplexml.py')
+        simplexml = runpy.run_path(path, run_name='tree_test')
+        xml = simplexml['xml']
+        xml.parser = tree.node('element')[xml.parser]
+        text = '<doc><a/><b><c/></b></doc>'
+        for recognize in (False, True):
+            t = tree.build_tree(simplexml['document'], text, ' ', recognize=recognize)
+            root, = t.roots
+            self.assertEqual(text, root.text)
+            self.assertEqual(['<a/>', '<b><c/></b>'], [child.text for child in root.children])
+        self.assertIsNone(tree.build_tree(simplexml['document'], '<doc><a/></b>', ' '))
+
+    def test_multiple_roots(self):
+        t = tree.build_tree(+tree.node('a')[parser.Char('a')], 'aaa')
+        self.assertEqual([0, 1, 2], [n.index for n in t.roots])
+
+    def test_failure(self):
+        self.assertIsNone(tree.build_tree(self.item, '(a', ' '))
+
+    def test_bytes(self):
+        t = tree.build_tree(tree.node('word')[+chars.alpha], b' ab', ' ')
+        self.assertEqual(b'ab', t[0].text)
+
+    def test_stream(self):
+        t = tree.build_tree(self.item, io.StringIO('(ab)'), ' ')
+        self.assertEqual((1, 3), (t[0].start, t[0].end))
+        with self.assertRaises(ValueError):
+            t[0].text
+
+    def test_index(self):
+        t = tree.build_tree(self.item, '(a)', ' ')
+        self.assertEqual(t[1], t[-1])
+        with self.assertRaises(IndexError):
+            t[2]
+
+    def test_without_builder(self):
+        p = tree.node('a')[parser.Char('a')]
+        self.assertEqual((True, 'a'), p.parse('a'))
+        self.assertEqual('a', p.kind)
+
+    def test_memo(self):
+        with self.assertRaises(ValueError):
+            parser.ParserState('a', memo=memo.Memo(), tree=tree.TreeBuilder())
+
+
+if __name__ == '__main__':
+    unittest.main()
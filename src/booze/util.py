@@ -16,19 +16,36 @@ import functools
 
 
 def singleton(cls):
+    # Singletons replace their class in the module, so pickle them by name.
+    cls.__reduce__ = lambda self: cls.__name__
     return cls()
 
 
 def calculated_property(method):
     cached_value_name = '_cached_' + method.__name__
 
-    @property
     @functools.wraps(method)
     def calculated_wrapper(self):
         try:
             return getattr(self, cached_value_name)
         except AttributeError:
             value = method(self)
-            setattr(self, cached_value_name, value)
+            try:
+                setattr(self, cached_value_name, value)
+            except AttributeError:
+                # Objects that may not change calculate the value on every use.
+                pass
             return value
-    return calculated_wrapper
+    calculated_wrapper.calculated = True
+    return property(calculated_wrapper)
+
+
+def calculated_properties(cls):
+    """Names of the calculated properties of cls, including inherited ones."""
+    names = []
+    for base in cls.__mro__:
+        for name, value in vars(base).items():
+            if (isinstance(value, property) and getattr(value.fget, 'calculated', False)
+                    and name not in names):
+                names.append(name)
+    return names
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pickle
 import unittest
 
 from booze import util
@@ -26,6 +27,14 @@ class SingletonTestCase(unittest.TestCase):
         singleton = util.singleton(Cls)
         self.assertIsInstance(singleton, Cls)
 
+    def test_pickle(self):
+        self.assertIs(util_test_singleton, pickle.loads(pickle.dumps(util_test_singleton)))
+
+
+@util.singleton
+class util_test_singleton:
+    pass
+
 
 class CalculatedPropertyTestCase(unittest.TestCase):
 
@@ -45,6 +54,42 @@ class CalculatedPropertyTestCase(unittest.TestCase):
         self.assertEqual(100, instance.prop)
         self.assertEqual(1, instance.call_count)
 
+    def test_not_cached_when_immutable(self):
+        calls = []
+
+        class Cls:
+
+            __slots__ = ()
+
+            @util.calculated_property
+            def prop(self):
+                calls.append(1)
+                return 100
+
+        instance = Cls()
+        self.assertEqual(100, instance.prop)
+        self.assertEqual(100, instance.prop)
+        self.assertEqual(2, len(calls))
+
+    def test_calculated_properties(self):
+        class Base:
+
+            @util.calculated_property
+            def a(self):
+                return 1
+
+            @property
+            def b(self):
+                return 2
+
+        class Cls(Base):
+
+            @util.calculated_property
+            def __c(self):
+                return 3
+
+        self.assertEqual(['_Cls__c', 'a'], util.calculated_properties(Cls))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -13,3 +13,9 @@
 # limitations under the License.
 
 from .action import *
+from . import action as _action
+
+
+def __getattr__(name):
+    # Operator actions are made on first use, see action.__getattr__.
+    return getattr(_action, name)
@@ -13,6 +13,8 @@
 # limitations under the License.
 
 import operator
+import sys
+import _thread
 
 from .. import util
 
@@ -26,106 +28,106 @@ class Action:
         return Call(self, *args, **kwargs)
 
     def __pos__(self):
-        return pos_(self)
+        return _operator_action('pos_')(self)
 
     def __neg__(self):
-        return neg_(self)
+        return _operator_action('neg_')(self)
 
     def __invert__(self):
-        return invert_(self)
+        return _operator_action('invert_')(self)
 
     # Comparison operators
     def __lt__(self, other):
-        return lt_(self, other)
+        return _operator_action('lt_')(self, other)
 
     def __le__(self, other):
-        return le_(self, other)
+        return _operator_action('le_')(self, other)
 
     def __eq__(self, other):
-        return eq_(self, other)
+        return _operator_action('eq_')(self, other)
 
     def __ne__(self, other):
-        return ne_(self, other)
+        return _operator_action('ne_')(self, other)
 
     def __ge__(self, other):
-        return ge_(self, other)
+        return _operator_action('ge_')(self, other)
 
     def __gt__(self, other):
-        return gt_(self, other)
+        return _operator_action('gt_')(self, other)
 
     # Mathmatical operators
     def __add__(self, other):
-        return add_(self, other)
+        return _operator_action('add_')(self, other)
 
     def __iadd__(self, other):
-        return iadd_(self, other)
+        return _operator_action('iadd_')(self, other)
 
     def __sub__(self, other):
-        return sub_(self, other)
+        return _operator_action('sub_')(self, other)
 
     def __isub__(self, other):
-        return isub_(self, other)
+        return _operator_action('isub_')(self, other)
 
     def __mul__(self, other):
-        return mul_(self, other)
+        return _operator_action('mul_')(self, other)
 
     def __imul__(self, other):
-        return imul_(self, other)
+        return _operator_action('imul_')(self, other)
 
     def __floordiv__(self, other):
-        return floordiv_(self, other)
+        return _operator_action('floordiv_')(self, other)
 
     def __ifloordiv__(self, other):
-        return ifloordiv_(self, other)
+        return _operator_action('ifloordiv_')(self, other)
 
     def __mod__(self, other):
-        return mod_(self, other)
+        return _operator_action('mod_')(self, other)
 
     def __imod__(self, other):
-        return imod_(self, other)
+        return _operator_action('imod_')(self, other)
 
     def __pow__(self, other):
-        return pow_(self, other)
+        return _operator_action('pow_')(self, other)
 
     def __ipow__(self, other):
-        return ipow_(self, other)
+        return _operator_action('ipow_')(self, other)
 
     def __truediv__(self, other):
-        return truediv_(self, other)
+        return _operator_action('truediv_')(self, other)
 
     def __itruediv__(self, other):
-        return itruediv_(self, other)
+        return _operator_action('itruediv_')(self, other)
 
     # Bitwise functions
     def __and__(self, other):
-        return and__(self, other)
+        return _operator_action('and__')(self, other)
 
     def __iand__(self, other):
-        return iand_(self, other)
+        return _operator_action('iand_')(self, other)
 
     def __or__(self, other):
-        return or__(self, other)
+        return _operator_action('or__')(self, other)
 
     def __ior__(self, other):
-        return ior_(self, other)
+        return _operator_action('ior_')(self, other)
 
     def __lshift__(self, other):
-        return lshift_(self, other)
+        return _operator_action('lshift_')(self, other)
 
     def __ilshift__(self, other):
-        return ilshift_(self, other)
+        return _operator_action('ilshift_')(self, other)
 
     def __rshift__(self, other):
-        return rshift_(self, other)
+        return _operator_action('rshift_')(self, other)
 
     def __irshift__(self, other):
-        return irshift_(self, other)
+        return _operator_action('irshift_')(self, other)
 
     def __xor__(self, other):
-        return xor_(self, other)
+        return _operator_action('xor_')(self, other)
 
     def __ixor__(self, other):
-        return ixor_(self, other)
+        return _operator_action('ixor_')(self, other)
 
 
 def invoke(value, *args, **kwargs):
@@ -199,6 +201,14 @@ class Call(Action):
     def kwargs(self):
         return dict(self.__kwargs)
 
+    def __reduce__(self):
+        # Classes made by func() are local, so are made again when restored
+        # unless the module holds them under the name of the function.
+        wrapper = type(self)
+        if hasattr(wrapper, '__func__') and _reachable(wrapper):
+            return _restore_func, (wrapper, self.__args, self.__kwargs)
+        return _restore_call, (self.__func, self.__args, self.__kwargs, hasattr(wrapper, '__func__'))
+
     def invoke(self, *args, **kwargs):
         real_func = invoke(self.__func, *args, **kwargs)
         args = [invoke(a, *args, **kwargs) for a in self.args]
@@ -206,6 +216,25 @@ class Call(Action):
         return real_func(*args, **kwargs)
 
 
+def _restore_call(real_func, args, kwargs, is_func):
+    if is_func:
+        return func(real_func)(*args, **kwargs)
+    return Call(real_func, *args, **kwargs)
+
+
+def _restore_func(wrapper, args, kwargs):
+    return wrapper(*args, **kwargs)
+
+
+def _reachable(wrapper):
+    """Whether wrapper can be found again as its module attribute."""
+    module = sys.modules.get(wrapper.__module__)
+    found = module
+    for name in wrapper.__qualname__.split('.'):
+        found = getattr(found, name, None)
+    return module is not None and found is wrapper
+
+
 def func(real_func):
     class Func(Call):
 
@@ -213,47 +242,80 @@ def func(real_func):
 
         def __init__(self, *args, **kwargs):
             super(Func, self).__init__(real_func, *args, **kwargs)
+
+    # Decorated functions are replaced by their wrapper, which pickles by name.
+    for attribute in ('__module__', '__name__', '__qualname__'):
+        try:
+            setattr(Func, attribute, getattr(real_func, attribute))
+        except (AttributeError, TypeError):
+            pass
     return Func
 
 
-# Unary functions
-pos_ = func(operator.pos)
-neg_ = func(operator.neg)
-invert_ = func(operator.invert)
-abs_ = func(operator.abs)
-
-# Comparison functions
-lt_ = func(operator.lt)
-le_ = func(operator.le)
-eq_ = func(operator.eq)
-ne_ = func(operator.ne)
-ge_ = func(operator.ge)
-gt_ = func(operator.gt)
-
-# Mathematical functions
-add_ = func(operator.add)
-iadd_ = func(operator.iadd)
-sub_ = func(operator.sub)
-isub_ = func(operator.isub)
-mul_ = func(operator.mul)
-imul_ = func(operator.imul)
-floordiv_ = func(operator.floordiv)
-ifloordiv_ = func(operator.ifloordiv)
-mod_ = func(operator.mod)
-imod_ = func(operator.imod)
-pow_ = func(operator.pow)
-ipow_ = func(operator.ipow)
-truediv_ = func(operator.truediv)
-itruediv_ = func(operator.itruediv)
-
-# Bitwise functions
-and__ = func(operator.and_)
-iand_ = func(operator.iand)
-or__ = func(operator.or_)
-ior_ = func(operator.ior)
-lshift_ = func(operator.lshift)
-ilshift_ = func(operator.ilshift)
-rshift_ = func(operator.rshift)
-irshift_ = func(operator.irshift)
-xor_ = func(operator.xor)
-ixor_ = func(operator.ixor)
+# Operator action classes are made on first use rather than at import.
+_OPERATORS = {
+    # Unary functions
+    'pos_': operator.pos,
+    'neg_': operator.neg,
+    'invert_': operator.invert,
+    'abs_': operator.abs,
+
+    # Comparison functions
+    'lt_': operator.lt,
+    'le_': operator.le,
+    'eq_': operator.eq,
+    'ne_': operator.ne,
+    'ge_': operator.ge,
+    'gt_': operator.gt,
+
+    # Mathematical functions
+    'add_': operator.add,
+    'iadd_': operator.iadd,
+    'sub_': operator.sub,
+    'isub_': operator.isub,
+    'mul_': operator.mul,
+    'imul_': operator.imul,
+    'floordiv_': operator.floordiv,
+    'ifloordiv_': operator.ifloordiv,
+    'mod_': operator.mod,
+    'imod_': operator.imod,
+    'pow_': operator.pow,
+    'ipow_': operator.ipow,
+    'truediv_': operator.truediv,
+    'itruediv_': operator.itruediv,
+
+    # Bitwise functions
+    'and__': operator.and_,
+    'iand_': operator.iand,
+    'or__': operator.or_,
+    'ior_': operator.ior,
+    'lshift_': operator.lshift,
+    'ilshift_': operator.ilshift,
+    'rshift_': operator.rshift,
+    'irshift_': operator.irshift,
+    'xor_': operator.xor,
+    'ixor_': operator.ixor,
+}
+
+
+def _operator_action(name):
+    try:
+        return globals()[name]
+    except KeyError:
+        return __getattr__(name)
+
+
+_operator_lock = _thread.allocate_lock()
+
+
+def __getattr__(name):
+    try:
+        real_func = _OPERATORS[name]
+    except KeyError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    with _operator_lock:
+        # Another thread may have made the class while this one waited.
+        action_class = globals().get(name)
+        if action_class is None:
+            action_class = globals()[name] = func(real_func)
+    return action_class
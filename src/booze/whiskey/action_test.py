@@ -12,12 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
 import operator
+import pickle
+import threading
 import unittest
 
 from booze.whiskey import action
 
 
+@action.func
+def pair(first, second):
+    return first, second
+
+
 class MyFuncAction(action.Action):
     def __init__(self, value):
         self.value = value
@@ -130,6 +138,11 @@ class InvokeTest(unittest.TestCase):
         self.assertEqual((1, 2, 3), invoke_me.args)
         self.assertEqual({'a': 'a', 'b': 'b', 'c': 'c'}, invoke_me.kwargs)
 
+    def test_pickle_decorated(self):
+        call = pickle.loads(pickle.dumps(pair(action.p[0], 2)))
+        self.assertIs(pair, type(call))
+        self.assertEqual((1, 2), call.invoke(1))
+
     def test_invoke_constants(self):
         self.assertEqual('constant', action.invoke('constant', 1, 2, 3, a='a', b='b', c='c'))
 
@@ -217,6 +230,35 @@ class CallTestCase(unittest.TestCase):
         call.kwargs['a'] = 'aa'
         self.assertEqual('a', call.kwargs['a'])
 
+    def test_operator_actions_lazy(self):
+        vars(action).pop('ixor_', None)
+        self.assertIs(action.ixor_, action.ixor_)
+        self.assertIn('ixor_', vars(action))
+        self.assertEqual(operator.ixor, action.ixor_.__func__)
+        with self.assertRaises(AttributeError):
+            action.not_an_operator_
+
+    def test_operator_actions_concurrent(self):
+        vars(action).pop('ior_', None)
+        barrier = threading.Barrier(8)
+
+        def get():
+            barrier.wait()
+            return action.ior_
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            classes = list(executor.map(lambda _: get(), range(8)))
+        self.assertEqual(1, len(set(map(id, classes))))
+        self.assertIs(action.ior_, classes[0])
+
+    def test_pickle(self):
+        call = pickle.loads(pickle.dumps(action.Call(max, action.p[0], 2, key=abs)))
+        self.assertEqual(-3, call.invoke(-3))
+
+    def test_pickle_func(self):
+        call = pickle.loads(pickle.dumps(action.add_(action.p[0], 1)))
+        self.assertEqual(operator.add, type(call).__func__)
+        self.assertEqual(3, call.invoke(2))
+
     def test_invoke_constants(self):
         def f(p, a): return p, a
         call = action.Call(f, 1, a='a')